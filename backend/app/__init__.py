@@ -39,6 +39,13 @@ def create_app(config_name='default'):
         app.logger.error("Failed to initialize database")
         # Continue running but log the error
     
+    # Map (building if needed) the reference data shared across workers
+    from .utils.reference_data import init_shared_store
+    try:
+        init_shared_store(app.config.get('REFERENCE_STORE_PATH'))
+    except Exception as e:
+        app.logger.error(f"Failed to initialize reference store: {e}")
+    
     # Register blueprints
     app.register_blueprint(auth_bp)
     # Template management endpoints
@@ -44,10 +44,25 @@ class Config:
     MONGODB_URI = os.environ.get('MONGODB_URI')
     MONGODB_DB = 'streamlineer'
     
+    # Pre-fork server layout. Each worker process opens its own MongoDB
+    # pool, sized for its request threads plus a few background threads
+    # and capped so all workers together stay within MONGODB_MAX_CONNECTIONS.
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))  # worker processes (also read by gunicorn)
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 8))  # threads per worker
+    MONGODB_MAX_CONNECTIONS = int(os.environ.get('MONGODB_MAX_CONNECTIONS', 500))
+    MONGODB_MAX_POOL_SIZE = int(os.environ.get('MONGODB_MAX_POOL_SIZE', 0)) or max(
+        4, min(WEB_THREADS + 4, MONGODB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+    )
+    MONGODB_MIN_POOL_SIZE = int(os.environ.get('MONGODB_MIN_POOL_SIZE', 0))
+    # Build indexes in create_app; production runs `python manage_indexes.py` on deploy
+    ENSURE_INDEXES_ON_START = os.environ.get('ENSURE_INDEXES_ON_START', 'false').lower() == 'true'
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 3600)))
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES', 604800)))
+    # How often each worker pulls new revocations (logout elsewhere) from MongoDB
+    REVOCATION_SYNC_INTERVAL = float(os.environ.get('REVOCATION_SYNC_INTERVAL', 2.0))
     
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
@@ -57,6 +72,37 @@ class Config:
     MAX_LOGIN_ATTEMPTS = int(os.environ.get('MAX_LOGIN_ATTEMPTS', 5))
     ACCOUNT_LOCKOUT_DURATION = int(os.environ.get('ACCOUNT_LOCKOUT_DURATION', 900))  # 15 minutes
     
+    # Argon2 cost (pick with benchmark_argon2.py); existing hashes are upgraded on login
+    ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 3))
+    ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 65536))  # KiB
+    ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 4))
+    
+    # Password hashing pool: processes per web worker, queued jobs before 503, seconds to wait.
+    # By default all web workers' pools together use half the cores.
+    PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', 0)) or max(
+        1, (os.cpu_count() or 2) // (2 * max(1, WEB_CONCURRENCY))
+    )
+    PASSWORD_POOL_MAX_PENDING = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 0)) or None  # default 4 per process
+    PASSWORD_POOL_TIMEOUT = float(os.environ.get('PASSWORD_POOL_TIMEOUT', 5))
+    
+    # Per-worker user profile cache (names/roles for enrichment lookups)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 2000))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))  # seconds
+    
+    # Audit log buffer: entries are written in the background in batches
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))  # entries beyond this are dropped
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))  # seconds
+    
+    # Audit retention: 0 keeps entries forever. Time-series storage applies
+    # only when the audit collections are first created.
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 0))
+    AUDIT_TIMESERIES = os.environ.get('AUDIT_TIMESERIES', 'false').lower() == 'true'
+    AUDIT_ARCHIVE_HOOK = os.environ.get('AUDIT_ARCHIVE_HOOK')  # "package.module:function"
+    
+    # Shared reference data (mmap'd by every worker); defaults to aql_output/reference_store.bin
+    REFERENCE_STORE_PATH = os.environ.get('REFERENCE_STORE_PATH')
+    
     # Rate Limiting
     RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '200 per day')
     RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'memory://')
@@ -64,6 +110,7 @@ class Config:
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    ENSURE_INDEXES_ON_START = os.environ.get('ENSURE_INDEXES_ON_START', 'true').lower() == 'true'
 
 class ProductionConfig(Config):
     """Production configuration"""
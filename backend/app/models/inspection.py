@@ -17,8 +17,15 @@ class Inspection:  # pylint: disable=too-many-instance-attributes
         self._id = kwargs.get("_id")
         # Foreign keys
         self.template_id = kwargs.get("template_id")  # ObjectId of template
+        # Content hash of the immutable template version this inspection uses
+        self.template_version = kwargs.get("template_version")
         self.inspector_id = kwargs.get("inspector_id")  # ObjectId of inspector user
         self.manager_id = kwargs.get("manager_id")  # ObjectId of manager user (creator)
+        # Optional supplier/factory label; keys the switching-rule state together
+        # with the template's organization
+        self.supplier = kwargs.get("supplier")
+        # Seed for reproducible sample-unit selection (see utils.sampling)
+        self.sampling_seed = kwargs.get("sampling_seed")
 
         # Scheduling meta
         # Optional – when the manager wants the inspection performed.
@@ -41,6 +48,9 @@ class Inspection:  # pylint: disable=too-many-instance-attributes
         })
         self.aql_passed = kwargs.get("aql_passed", True)
         self.aql_rejection_reasons = kwargs.get("aql_rejection_reasons", [])
+        # Running per-severity tally kept current while answers stream in:
+        # {"critical", "major", "minor", "units_inspected", "aql_config"}
+        self.live_tally = kwargs.get("live_tally")
 
         # Audit
         self.created_at = kwargs.get("created_at", datetime.utcnow())
@@ -56,6 +66,9 @@ class Inspection:  # pylint: disable=too-many-instance-attributes
             "template_id": ObjectId(self.template_id) if not isinstance(self.template_id, ObjectId) else self.template_id,
             "inspector_id": ObjectId(self.inspector_id) if not isinstance(self.inspector_id, ObjectId) else self.inspector_id,
             "manager_id": ObjectId(self.manager_id) if not isinstance(self.manager_id, ObjectId) else self.manager_id,
+            "template_version": self.template_version,
+            "supplier": self.supplier,
+            "sampling_seed": self.sampling_seed,
             "scheduled_date": self.scheduled_date,
             "status": self.status,
             "responses": self.responses,
@@ -65,6 +78,7 @@ class Inspection:  # pylint: disable=too-many-instance-attributes
             "defect_counts": self.defect_counts,
             "aql_passed": self.aql_passed,
             "aql_rejection_reasons": self.aql_rejection_reasons,
+            "live_tally": self.live_tally,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
         }
@@ -88,6 +102,9 @@ class Inspection:  # pylint: disable=too-many-instance-attributes
             "template_id": str(self.template_id) if isinstance(self.template_id, ObjectId) else self.template_id,
             "inspector_id": str(self.inspector_id) if isinstance(self.inspector_id, ObjectId) else self.inspector_id,
             "manager_id": str(self.manager_id) if isinstance(self.manager_id, ObjectId) else self.manager_id,
+            "template_version": self.template_version,
+            "supplier": self.supplier,
+            "sampling_seed": self.sampling_seed,
             "scheduled_date": self.scheduled_date.isoformat() if self.scheduled_date else None,
             "status": self.status,
             "responses": self.responses,
@@ -97,6 +114,7 @@ class Inspection:  # pylint: disable=too-many-instance-attributes
             "defect_counts": self.defect_counts,
             "aql_passed": self.aql_passed,
             "aql_rejection_reasons": self.aql_rejection_reasons,
+            "live_tally": self.live_tally,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
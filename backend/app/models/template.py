@@ -58,6 +58,10 @@ class Template:
         self.organization = kwargs.get("organization")
         self.location = kwargs.get("location")
         self.status = kwargs.get("status", "draft")
+        # Bumped on every content write; PATCH edits are checked against it
+        self.revision = kwargs.get("revision", 0)
+        # Content hash of the last published version (see utils.template_versions)
+        self.current_version = kwargs.get("current_version")
 
         # AQL Configuration
         self.aql_level = kwargs.get("aql_level", 2.5)  # Default AQL level
@@ -104,6 +108,8 @@ class Template:
             "organization": self.organization,
             "location": self.location,
             "status": self.status,
+            "revision": self.revision,
+            "current_version": self.current_version,
             "aql_level": self.aql_level,
             "aql_level_critical": self.aql_level_critical,
             "aql_level_major": self.aql_level_major,
@@ -150,6 +156,8 @@ class Template:
             "organization": self.organization,
             "location": self.location,
             "status": self.status,
+            "revision": self.revision,
+            "current_version": self.current_version,
             "aql_level": self.aql_level,
             "aql_level_critical": self.aql_level_critical,
             "aql_level_major": self.aql_level_major,
@@ -169,5 +177,54 @@ class Template:
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
+    # ------------------------------------------------------------------
+    # List summary (never materialises ``pages``)
+    # ------------------------------------------------------------------
+
+    # Aggregation $project stage for list endpoints: the question count is
+    # computed inside MongoDB so the pages array never leaves the server.
+    SUMMARY_PROJECTION = {
+        "title": 1,
+        "status": 1,
+        "manager_id": 1,
+        "manager_firstName": 1,
+        "manager_lastName": 1,
+        "organization": 1,
+        "location": 1,
+        "created_at": 1,
+        "updated_at": 1,
+        "page_count": {"$size": {"$ifNull": ["$pages", []]}},
+        "question_count": {
+            "$sum": {
+                "$map": {
+                    "input": {"$ifNull": ["$pages", []]},
+                    "as": "p",
+                    "in": {"$size": {"$ifNull": ["$$p.questions", []]}},
+                }
+            }
+        },
+    }
+
+    @staticmethod
+    def summary_view(doc: dict):
+        """Serialise a document produced with ``SUMMARY_PROJECTION``."""
+        manager_id = doc.get("manager_id")
+        created_at = doc.get("created_at")
+        updated_at = doc.get("updated_at")
+        return {
+            "id": str(doc["_id"]),
+            "title": doc.get("title"),
+            "status": doc.get("status"),
+            "manager_id": str(manager_id) if isinstance(manager_id, ObjectId) else manager_id,
+            "manager_firstName": doc.get("manager_firstName"),
+            "manager_lastName": doc.get("manager_lastName"),
+            "organization": doc.get("organization"),
+            "location": doc.get("location"),
+            "page_count": doc.get("page_count", 0),
+            "question_count": doc.get("question_count", 0),
+            "created_at": created_at.isoformat() if created_at else None,
+            "updated_at": updated_at.isoformat() if updated_at else None,
+        }
+
 
 template_schema = TemplateSchema()
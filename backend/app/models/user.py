@@ -1,12 +1,14 @@
 from datetime import datetime
 from bson import ObjectId
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
 from marshmallow import Schema, fields, validate, ValidationError
 import re
 
-# Initialize password hasher
-ph = PasswordHasher()
+from ..utils.password_pool import argon2_params, password_pool
+from ..utils.user_search import search_keys, search_tokens
+
+# Initialize password hasher (in-process; request paths go through password_pool)
+ph = PasswordHasher(**argon2_params())
 
 class UserSchema(Schema):
     """Marshmallow schema for user validation"""
@@ -64,17 +66,13 @@ class User:
     
     @staticmethod
     def hash_password(password):
-        """Hash password using Argon2"""
-        return ph.hash(password)
+        """Hash password using Argon2 (in the bounded password pool)"""
+        return password_pool.hash(password)
     
     @staticmethod
     def verify_password(password_hash, password):
-        """Verify password against hash"""
-        try:
-            ph.verify(password_hash, password)
-            return True
-        except VerifyMismatchError:
-            return False
+        """Verify password against hash; returns (matches, needs_rehash)"""
+        return password_pool.verify(password_hash, password)
     
     def to_dict(self, include_id=True):
         """Convert user object to dictionary for MongoDB.
@@ -106,7 +104,10 @@ class User:
             'last_login': self.last_login,
             'login_attempts': self.login_attempts,
             'account_locked': self.account_locked,
-            'lockout_until': self.lockout_until
+            'lockout_until': self.lockout_until,
+            # Prefix tokens and exact keys for the indexed picker search (utils.user_search)
+            'search_tokens': search_tokens(self.firstName, self.lastName, self.email),
+            'search_keys': search_keys(self.firstName, self.lastName, self.email),
         }
 
         # Only include the identifier when explicitly requested. This keeps
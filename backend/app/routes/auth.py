@@ -2,18 +2,70 @@ from flask import Blueprint, request, jsonify, current_app
 from marshmallow import ValidationError
 from bson import ObjectId
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
 
 from ..models.user import User, user_schema
 from ..utils.auth import AuthUtils, require_auth
 from ..utils.database import get_db
-from ..utils.audit import log_user_event
+from ..utils.audit import audit_buffer, log_user_event
+from ..utils.password_pool import PasswordPoolSaturated, password_pool
+from ..utils.token_revocation import token_revocation
+from ..utils.user_profiles import user_profiles
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+
+def _server_busy():
+    """Fast back-pressure response when the password pool is saturated."""
+    response = jsonify({
+        'success': False,
+        'message': 'Server is busy, please retry shortly',
+        'error': 'SERVER_BUSY'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _record_failed_login(users_collection, user):
+    """Count a failed attempt and lock the account at the limit, atomically.
+
+    The increment and the lockout decision happen server-side in a single
+    pipeline update, so parallel attempts cannot lose counts or each start
+    their own lockout window.
+    """
+    max_attempts = current_app.config['MAX_LOGIN_ATTEMPTS']
+    now = datetime.utcnow()
+    lockout_until = now + timedelta(seconds=current_app.config['ACCOUNT_LOCKOUT_DURATION'])
+    # BSON dates keep milliseconds; truncate so the value read back compares equal
+    lockout_until = lockout_until.replace(microsecond=lockout_until.microsecond // 1000 * 1000)
+    should_lock = {'$and': [
+        {'$gte': ['$login_attempts', max_attempts]},
+        # don't extend a lockout another attempt already started
+        {'$not': [{'$gt': ['$lockout_until', now]}]}
+    ]}
+    result = users_collection.find_one_and_update(
+        {'_id': user._id},
+        [
+            {'$set': {
+                'login_attempts': {'$add': [{'$ifNull': ['$login_attempts', 0]}, 1]},
+                'updated_at': now
+            }},
+            {'$set': {
+                'account_locked': {'$cond': [should_lock, True, {'$ifNull': ['$account_locked', False]}]},
+                'lockout_until': {'$cond': [should_lock, lockout_until, {'$ifNull': ['$lockout_until', None]}]}
+            }}
+        ],
+        projection={'login_attempts': 1, 'lockout_until': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if result and result.get('lockout_until') == lockout_until:
+        logger.warning(f"Account locked after {result['login_attempts']} failed logins: {user.email}")
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """User registration endpoint"""
@@ -113,6 +165,8 @@ def register():
             'mongo_notification': 'ACCOUNT_CREATED'
         }), 201
         
+    except PasswordPoolSaturated:
+        return _server_busy()
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({
@@ -180,23 +234,10 @@ def login():
                 'error': 'ACCOUNT_DEACTIVATED'
             }), 401
         
-        # Verify password
-        if not User.verify_password(user.password_hash, password):
-            # Increment login attempts
-            user.increment_login_attempts()
-            
-            # Check if account should be locked
-            if user.login_attempts >= current_app.config['MAX_LOGIN_ATTEMPTS']:
-                user.lock_account(current_app.config['ACCOUNT_LOCKOUT_DURATION'])
-            
-            # Update user in database
-            # Exclude `_id` when performing an update to avoid immutable
-            # field errors.
-            users_collection.update_one(
-                {'_id': user._id},
-                {'$set': user.to_dict(include_id=False)}
-            )
-            
+        # Verify password (off-thread, in the bounded password pool)
+        matches, needs_rehash = User.verify_password(user.password_hash, password)
+        if not matches:
+            _record_failed_login(users_collection, user)
             return jsonify({
                 'success': False,
                 'message': 'Invalid credentials',
@@ -211,16 +252,39 @@ def login():
                 'error': 'INVALID_ORGANIZATION_LOCATION'
             }), 401
         
-        # Reset login attempts and update last login
-        user.reset_login_attempts()
-        user.update_last_login()
-        
-        # Persist the reset login attempts and last login timestamp. Again
-        # we omit the immutable `_id` field.
-        users_collection.update_one(
-            {'_id': user._id},
-            {'$set': user.to_dict(include_id=False)}
+        # Reset login attempts and set last login in one write. The filter
+        # re-checks the lock, so a lockout set by a concurrent failed attempt
+        # since our read wins over this success.
+        now = datetime.utcnow()
+        updates = {
+            'login_attempts': 0,
+            'account_locked': False,
+            'lockout_until': None,
+            'last_login': now,
+            'updated_at': now
+        }
+        # Upgrade hashes created with older Argon2 parameters
+        if needs_rehash:
+            try:
+                updates['password_hash'] = User.hash_password(password)
+            except PasswordPoolSaturated:
+                pass  # keep the old hash; retried on the next login
+        
+        updated = users_collection.find_one_and_update(
+            {
+                '_id': user._id,
+                '$or': [{'account_locked': {'$ne': True}}, {'lockout_until': {'$lte': now}}]
+            },
+            {'$set': updates},
+            return_document=ReturnDocument.AFTER
         )
+        if updated is None:
+            return jsonify({
+                'success': False,
+                'message': 'Account is locked due to too many failed attempts',
+                'error': 'ACCOUNT_LOCKED'
+            }), 423
+        user = User.from_dict(updated)
         
         # Generate tokens
         tokens = AuthUtils.generate_tokens(
@@ -250,6 +314,8 @@ def login():
             'mongo_notification': 'LOGIN_SUCCESS'
         }), 200
         
+    except PasswordPoolSaturated:
+        return _server_busy()
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({
@@ -306,11 +372,12 @@ def refresh_token():
                 'error': 'ACCOUNT_DEACTIVATED'
             }), 401
         
-        # Generate new tokens
+        # Generate new tokens in the same session, so logout still revokes them
         tokens = AuthUtils.generate_tokens(
             user._id,
             user.email,
-            user.role
+            user.role,
+            sid=payload.get('sid')
         )
         
         return jsonify({
@@ -370,17 +437,26 @@ def logout():
     """User logout endpoint"""
     try:
         # Get user information for the logout message
-        db = get_db()
-        users_collection = db.get_collection('users')
-        
-        user_data = users_collection.find_one({'_id': ObjectId(request.current_user['user_id'])})
+        user_data = user_profiles.get(request.current_user['user_id'])
         user_name = "User"
         if user_data:
             user_name = user_data.get('firstName', 'User')
         
-        # In a stateless JWT system, logout is handled client-side
-        # by removing the token from storage
-        # However, you could implement a blacklist for additional security
+        # Revoke this session's access and refresh tokens, or with
+        # {"all_sessions": true} every token issued to the user so far
+        payload = request.current_user
+        data = request.get_json(silent=True) or {}
+        if data.get('all_sessions') or not payload.get('sid'):
+            token_revocation.revoke_user(payload['user_id'])
+        else:
+            # Any refresh token of this session was issued by now, so none
+            # outlives now + its lifetime; keep the entry until then
+            token_revocation.revoke_session(
+                payload['sid'],
+                payload['user_id'],
+                datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+            )
+        user_profiles.invalidate(payload['user_id'])
         
         return jsonify({
             'success': True,
@@ -393,4 +469,42 @@ def logout():
             'success': False,
             'message': 'Logout failed',
             'error': 'LOGOUT_ERROR'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@auth_bp.route('/password-pool/metrics', methods=['GET'])
+@require_auth
+def password_pool_metrics():
+    """Queue depth and throughput of the password hashing pool (IT only)"""
+    if request.current_user.get('role') != 'it':
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient permissions',
+            'error': 'INSUFFICIENT_PERMISSIONS'
+        }), 403
+    return jsonify({'success': True, 'data': password_pool.metrics()}), 200
+
+
+@auth_bp.route('/audit-buffer/metrics', methods=['GET'])
+@require_auth
+def audit_buffer_metrics():
+    """Queue depth, batch and drop counters of the audit log writer (IT only)"""
+    if request.current_user.get('role') != 'it':
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient permissions',
+            'error': 'INSUFFICIENT_PERMISSIONS'
+        }), 403
+    return jsonify({'success': True, 'data': audit_buffer.metrics()}), 200
+
+
+@auth_bp.route('/user-cache/metrics', methods=['GET'])
+@require_auth
+def user_cache_metrics():
+    """Hit rate and size of this worker's user profile cache (IT only)"""
+    if request.current_user.get('role') != 'it':
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient permissions',
+            'error': 'INSUFFICIENT_PERMISSIONS'
+        }), 403
+    return jsonify({'success': True, 'data': user_profiles.metrics()}), 200
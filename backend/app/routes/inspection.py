@@ -6,6 +6,9 @@ from flask import Blueprint, request, jsonify
 from flask import send_file
 from gridfs import GridFS
 from io import BytesIO
+from pymongo import ReturnDocument
+import heapq
+import secrets
 from pymongo.errors import DuplicateKeyError
 import logging
 
@@ -15,8 +18,20 @@ from ..models.inspection import Inspection
 from ..models.task import Task
 from ..models.template import Template  # for projection to inspector list
 from ..models.inspection_response import InspectionResponse
-from ..utils.aql import AQLResultProcessor
+from ..utils.aql import (
+    TOTAL_KEYS, AQLCalculator, DefectTally, SequentialVerdict, aql_config_for_template, compile_evaluator,
+    severity_for_key,
+)
+from ..utils.switching import (
+    DISCONTINUED, NORMAL, get_severity, lot_acceptance_number, record_lot_outcome, rebuild_states,
+    resume_events, resume_key, write_rebuilt_states,
+)
+from ..utils.template_versions import compile_live, template_versions
+from ..utils.defect_master import classify_sample_defects, defect_master_cache
 from ..utils.audit import log_inspection_audit
+from ..utils.user_profiles import full_name, user_profiles
+from ..utils.audit_storage import DEFAULT_PAGE_SIZE as AUDIT_PAGE_SIZE, query_audit
+from ..utils.sampling import simple_sample, stratified_sample
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +66,8 @@ def assign_inspection():
         "template_title": str (optional),
         "inspector_email": str,
         "date": "YYYY-MM-DD",  # optional – scheduled date
-        "time": "HH:MM"         # optional – scheduled time
+        "time": "HH:MM",        # optional – scheduled time
+        "supplier": str         # optional – supplier/factory for switching rules
     }
     """
     user = request.current_user
@@ -64,7 +80,6 @@ def assign_inspection():
 
     db = get_db()
     templates_coll = db.get_collection("templates")
-    users_coll = db.get_collection("users")
     inspections_coll = db.get_collection("inspections")
 
     # ------------------------------------------------------------------
@@ -94,7 +109,7 @@ def assign_inspection():
     # ------------------------------------------------------------------
     # Resolve inspector
     # ------------------------------------------------------------------
-    inspector_doc = users_coll.find_one({"email": payload["inspector_email"]})
+    inspector_doc = user_profiles.get_by_email(payload["inspector_email"])
     if not inspector_doc:
         return jsonify({"success": False, "message": f"Inspector with email '{payload['inspector_email']}' not found"}), 400
     if inspector_doc.get("role") != "inspector":
@@ -118,10 +133,23 @@ def assign_inspection():
     # ------------------------------------------------------------------
     # Create inspection
     # ------------------------------------------------------------------
+    # Pin the published version the inspector will work against; templates
+    # published before versions existed are frozen now
+    try:
+        template_version = template_doc.get("current_version") or template_versions.refresh_current(
+            template_doc, created_by=ObjectId(user["user_id"])
+        )
+    except Exception as e:
+        logger.error(f"Failed to store template version for {template._id}: {e}")
+        template_version = None
+
     inspection = Inspection(
         template_id=template._id,
+        template_version=template_version,
         inspector_id=inspector_doc["_id"],
         manager_id=ObjectId(user["user_id"]),
+        supplier=(payload.get("supplier") or "").strip() or None,
+        sampling_seed=secrets.randbits(53),
         scheduled_date=scheduled_date,
     )
 
@@ -218,7 +246,13 @@ def get_inspection(inspection_id):
     if user["role"] == "manager" and str(insp.manager_id) != str(user["user_id"]):
         return jsonify({"success": False, "message": "Access denied"}), 403
 
-    tpl_doc = templates_coll.find_one({"_id": insp.template_id})
+    # Pinned inspections show the version they were assigned; older ones the live template
+    compiled = template_versions.get_compiled(insp.template_version) if insp.template_version else None
+    if compiled is not None:
+        template_view = compiled.template.public_view()
+    else:
+        tpl_doc = templates_coll.find_one({"_id": insp.template_id})
+        template_view = Template.from_dict(tpl_doc).public_view() if tpl_doc else None
 
     # Get inspection view
     inspection_view = insp.public_view()
@@ -227,11 +261,292 @@ def get_inspection(inspection_id):
         "success": True,
         "data": {
             "inspection": inspection_view,
-            "template": Template.from_dict(tpl_doc).public_view() if tpl_doc else None,
+            "template": template_view,
         }
     })
 
 
+# -----------------------------------------------------------------------------
+# Inspector – stream answer changes and get a live AQL verdict
+# -----------------------------------------------------------------------------
+
+_LIVE_DELTA_MAX_RETRIES = 3
+
+
+def _seed_live_tally(inspections_coll, templates_coll, insp_id, template_id, units_inspected=0):
+    """Build the running tally from stored answers once, then persist it.
+
+    Only runs for inspections that have never been tallied (or whose tally
+    was reset); afterwards every delta adjusts the stored counts in place.
+    Counts follow submit, so explicit ``<severity>_defects`` totals win.
+    """
+    doc = inspections_coll.find_one({"_id": insp_id}, {"responses": 1, "live_tally": 1}) or {}
+    if doc.get("live_tally"):
+        return doc["live_tally"]
+
+    template_doc = templates_coll.find_one(
+        {"_id": template_id},
+        {"lot_size": 1, "aql_level": 1, "sample_size": 1, "critical_defects_allowed": 1,
+         "major_defects_allowed": 1, "minor_defects_allowed": 1},
+    )
+    aql_config = aql_config_for_template(Template.from_dict(template_doc)) if template_doc else None
+    live_tally = {
+        **DefectTally.submitted(doc.get("responses")).as_dict(),
+        "units_inspected": units_inspected,
+        "aql_config": aql_config,
+    }
+    # Another request may have seeded concurrently; keep whichever landed first.
+    inspections_coll.update_one({"_id": insp_id, "live_tally": None}, {"$set": {"live_tally": live_tally}})
+    return (inspections_coll.find_one({"_id": insp_id}, {"live_tally": 1}) or {}).get("live_tally") or live_tally
+
+
+def _live_verdict(live_tally):
+    aql_config = (live_tally or {}).get("aql_config")
+    if not aql_config:
+        return {"verdict": SequentialVerdict.PENDING, "decided": False, "aql_configured": False,
+                "defect_counts": DefectTally.from_dict(live_tally).as_dict()}
+    result = SequentialVerdict.evaluate(
+        DefectTally.from_dict(live_tally),
+        aql_config,
+        live_tally.get("units_inspected", 0),
+    )
+    result["aql_configured"] = True
+    return result
+
+
+@inspection_bp.route("/<inspection_id>/responses/delta", methods=["POST"])
+@require_auth
+def apply_response_delta(inspection_id):
+    """Apply changed answers and return the running AQL verdict.
+
+    Expected JSON payload: {
+        "changes": {"<question_id>__major_text": 2, ...},
+        "units_inspected": int   # optional – sample units finished so far
+    }
+
+    Only the changed keys are read and written; defect counts are adjusted
+    with ``$inc`` so the cost is independent of how many answers exist. A
+    severity with an explicit ``<severity>_defects`` total keeps that total;
+    only a change to a total itself re-seeds the tally from the answers. The
+    verdict is REJECT as soon as a reject number is reached, ACCEPT once the
+    whole sample is inspected within limits, otherwise PENDING.
+    """
+    user = request.current_user
+    if user["role"] != "inspector":
+        return jsonify({"success": False, "message": "Only inspectors can record answers"}), 403
+
+    try:
+        insp_id = ObjectId(inspection_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid inspection id"}), 400
+
+    payload = request.get_json() or {}
+    changes = payload.get("changes")
+    if not isinstance(changes, dict) or not changes:
+        return jsonify({"success": False, "message": "changes must be a non-empty JSON object"}), 400
+    for key in changes:
+        if not key or "." in key or key.startswith("$"):
+            return jsonify({"success": False, "message": f"Invalid response key '{key}'"}), 400
+    units_inspected = payload.get("units_inspected")
+    if units_inspected is not None and (not isinstance(units_inspected, int) or units_inspected < 0):
+        return jsonify({"success": False, "message": "units_inspected must be a non-negative integer"}), 400
+
+    db = get_db()
+    inspections_coll = db.get_collection("inspections")
+    templates_coll = db.get_collection("templates")
+
+    projection = {"inspector_id": 1, "template_id": 1, "status": 1, "live_tally": 1}
+    projection.update({f"responses.{key}": 1 for key in list(changes) + list(TOTAL_KEYS)})
+    insp_doc = inspections_coll.find_one({"_id": insp_id}, projection)
+    if not insp_doc:
+        return jsonify({"success": False, "message": "Inspection not found"}), 404
+    if str(insp_doc.get("inspector_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+    if insp_doc.get("status") == "completed":
+        return jsonify({"success": False, "message": "Inspection is already completed"}), 400
+
+    # A total sent in this request overrides per-question counts, which $inc
+    # cannot express: write the answers, reset the tally and re-seed it.
+    if any(key in TOTAL_KEYS for key in changes):
+        units = max((insp_doc.get("live_tally") or {}).get("units_inspected", 0), units_inspected or 0)
+        update = {"$set": {f"responses.{key}": value for key, value in changes.items()}}
+        update["$set"]["updated_at"] = datetime.utcnow()
+        update["$unset"] = {"live_tally": ""}
+        inspections_coll.update_one({"_id": insp_id}, update)
+        live_tally = _seed_live_tally(
+            inspections_coll, templates_coll, insp_id, insp_doc.get("template_id"), units_inspected=units
+        )
+        return jsonify({"success": True, "data": _live_verdict(live_tally)})
+
+    if not insp_doc.get("live_tally"):
+        _seed_live_tally(inspections_coll, templates_coll, insp_id, insp_doc.get("template_id"))
+
+    live_tally = None
+    for _attempt in range(_LIVE_DELTA_MAX_RETRIES):
+        current = (insp_doc.get("responses") or {})
+        # Guard on the previous value of every counted key so concurrent
+        # edits of the same answer cannot double-count.
+        # ...and on the tally still existing (a reset by a totals edit re-seeds it)
+        query = {"_id": insp_id, "live_tally": {"$ne": None}}
+        # Severities with an explicit stored total are counted by that total;
+        # guard on it so a concurrent totals edit forces a retry
+        fixed = set()
+        for total_key, severity in TOTAL_KEYS.items():
+            query[f"responses.{total_key}"] = current[total_key] if total_key in current else {"$exists": False}
+            if current.get(total_key):
+                fixed.add(severity)
+        inc = {}
+        for key, value in changes.items():
+            if not severity_for_key(key):
+                continue
+            old_value = current.get(key)
+            query[f"responses.{key}"] = old_value if key in current else {"$exists": False}
+            severity, diff = DefectTally.delta(key, old_value, value)
+            if diff and severity not in fixed:
+                inc[f"live_tally.{severity}"] = inc.get(f"live_tally.{severity}", 0) + diff
+
+        update = {"$set": {f"responses.{key}": value for key, value in changes.items()}}
+        update["$set"]["updated_at"] = datetime.utcnow()
+        if inc:
+            update["$inc"] = inc
+        if units_inspected is not None:
+            update["$max"] = {"live_tally.units_inspected": units_inspected}
+
+        updated = inspections_coll.find_one_and_update(
+            query, update, projection={"live_tally": 1}, return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            live_tally = updated.get("live_tally")
+            break
+        # Lost a race with another edit – re-read the touched keys and retry
+        insp_doc = inspections_coll.find_one({"_id": insp_id}, projection) or {}
+        if not insp_doc.get("live_tally"):
+            _seed_live_tally(inspections_coll, templates_coll, insp_id, insp_doc.get("template_id"))
+
+    if live_tally is None:
+        return jsonify({"success": False, "message": "Answers changed concurrently, please retry"}), 409
+
+    return jsonify({"success": True, "data": _live_verdict(live_tally)})
+
+
+@inspection_bp.route("/<inspection_id>/live-verdict", methods=["GET"])
+@require_auth
+def get_live_verdict(inspection_id):
+    """Return the running AQL verdict without changing any answers."""
+    user = request.current_user
+    try:
+        insp_id = ObjectId(inspection_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid inspection id"}), 400
+
+    db = get_db()
+    inspections_coll = db.get_collection("inspections")
+    insp_doc = inspections_coll.find_one(
+        {"_id": insp_id}, {"inspector_id": 1, "manager_id": 1, "template_id": 1, "live_tally": 1}
+    )
+    if not insp_doc:
+        return jsonify({"success": False, "message": "Inspection not found"}), 404
+    if user["role"] == "inspector" and str(insp_doc.get("inspector_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+    if user["role"] == "manager" and str(insp_doc.get("manager_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    live_tally = insp_doc.get("live_tally") or _seed_live_tally(
+        inspections_coll, db.get_collection("templates"), insp_id, insp_doc.get("template_id")
+    )
+    return jsonify({"success": True, "data": _live_verdict(live_tally)})
+
+
+# -----------------------------------------------------------------------------
+# Reproducible sample-unit selection
+# -----------------------------------------------------------------------------
+
+MAX_SAMPLE_UNITS = 5000
+
+
+@inspection_bp.route("/<inspection_id>/sample-units", methods=["GET"])
+@require_auth
+def get_sample_units(inspection_id):
+    """Return the unit (or carton/unit) numbers to pull for this inspection.
+
+    Query params (all optional, default from the template's AQL plan):
+      lot_size, sample_size – ints
+      units_per_carton      – int; stratify by carton when given
+      cartons               – int; how many cartons to open (default sqrt)
+
+    The selection is derived from ``sampling_seed`` stored on the inspection,
+    so the same parameters always return the same units.
+    """
+    user = request.current_user
+    try:
+        insp_id = ObjectId(inspection_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid inspection id"}), 400
+
+    db = get_db()
+    inspections_coll = db.get_collection("inspections")
+    insp_doc = inspections_coll.find_one(
+        {"_id": insp_id},
+        {"inspector_id": 1, "manager_id": 1, "template_id": 1, "sampling_seed": 1, "aql_results.plan": 1},
+    )
+    if not insp_doc:
+        return jsonify({"success": False, "message": "Inspection not found"}), 404
+    if user["role"] == "inspector" and str(insp_doc.get("inspector_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+    if user["role"] == "manager" and str(insp_doc.get("manager_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    def _int_arg(name):
+        value = request.args.get(name)
+        if value in (None, ""):
+            return None
+        return int(value)
+
+    try:
+        lot_size = _int_arg("lot_size")
+        sample_size = _int_arg("sample_size")
+        units_per_carton = _int_arg("units_per_carton")
+        cartons = _int_arg("cartons")
+    except ValueError:
+        return jsonify({"success": False, "message": "lot_size, sample_size, units_per_carton and cartons must be integers"}), 400
+
+    if lot_size is None or sample_size is None:
+        plan = (insp_doc.get("aql_results") or {}).get("plan") or {}
+        tpl = db.get_collection("templates").find_one(
+            {"_id": insp_doc.get("template_id")}, {"lot_size": 1, "sample_size": 1}
+        ) or {}
+        lot_size = lot_size or plan.get("lot_size") or tpl.get("lot_size")
+        sample_size = sample_size or plan.get("sample_size") or tpl.get("sample_size")
+    if not lot_size or not sample_size:
+        return jsonify({"success": False, "message": "lot_size and sample_size are required"}), 400
+    if lot_size < 1 or sample_size < 1 or sample_size > lot_size:
+        return jsonify({"success": False, "message": "sample_size must be between 1 and lot_size"}), 400
+    if sample_size > MAX_SAMPLE_UNITS:
+        return jsonify({"success": False, "message": f"sample_size may not exceed {MAX_SAMPLE_UNITS}"}), 400
+    if units_per_carton is not None and units_per_carton < 1:
+        return jsonify({"success": False, "message": "units_per_carton must be at least 1"}), 400
+    if cartons is not None and cartons < 1:
+        return jsonify({"success": False, "message": "cartons must be at least 1"}), 400
+
+    seed = insp_doc.get("sampling_seed")
+    if seed is None:
+        # Inspections created before seeds existed get one on first use
+        inspections_coll.update_one({"_id": insp_id, "sampling_seed": None}, {"$set": {"sampling_seed": secrets.randbits(53)}})
+        seed = (inspections_coll.find_one({"_id": insp_id}, {"sampling_seed": 1}) or {}).get("sampling_seed")
+
+    data = {
+        "seed": seed,
+        "lot_size": lot_size,
+        "sample_size": sample_size,
+        "units_per_carton": units_per_carton,
+    }
+    if units_per_carton:
+        data["cartons"] = stratified_sample(lot_size, sample_size, units_per_carton, seed, cartons)
+    else:
+        data["units"] = simple_sample(lot_size, sample_size, seed)
+    return jsonify({"success": True, "data": data})
+
+
 # -----------------------------------------------------------------------------
 # Inspector – submit responses
 # -----------------------------------------------------------------------------
@@ -264,12 +579,18 @@ def submit_inspection(inspection_id):
     if not isinstance(responses, dict):
         return jsonify({"success": False, "message": "responses must be a JSON object"}), 400
 
-    # Get template for AQL processing
-    template_doc = templates_coll.find_one({"_id": insp_doc["template_id"]})
-    if not template_doc:
-        return jsonify({"success": False, "message": "Template not found"}), 404
-
-    template = Template.from_dict(template_doc)
+    # Pinned version: compiled once per worker and cached by content hash.
+    # Inspections created before pinning fall back to the live template.
+    compiled = None
+    if insp_doc.get("template_version"):
+        compiled = template_versions.get_compiled(insp_doc["template_version"])
+    if compiled is None:
+        template_doc = templates_coll.find_one({"_id": insp_doc["template_id"]})
+        if not template_doc:
+            return jsonify({"success": False, "message": "Template not found"}), 404
+        compiled = compile_live(template_doc)
+
+    template = compiled.template
     
     # Process AQL results if template has AQL configuration
     aql_results = {}
@@ -277,41 +598,40 @@ def submit_inspection(inspection_id):
     aql_passed = True
     aql_rejection_reasons = []
     
-    if template.lot_size and template.aql_level:
-        aql_config = {
-            "aql_level": template.aql_level,
-            "lot_size": template.lot_size,
-            "sample_size": template.sample_size,
-            "major_defects_allowed": template.major_defects_allowed,
-            "minor_defects_allowed": template.minor_defects_allowed,
-            "critical_defects_allowed": template.critical_defects_allowed
-        }
-        # Ensure counts present: also aggregate from per-question numeric fields if globals missing
+    # One pass over the full answers; also re-seeds the live tally used by
+    # the streaming delta endpoint.
+    tally = DefectTally.from_responses(responses)
+    aql_config = dict(compiled.aql_config) if compiled.aql_config else None
+    evaluate = compiled.evaluate
+    plan_severity = NORMAL
+    if aql_config:
+        # Tightened/reduced plans come from the supplier's switching-rule state
         try:
-            def _sum_suffix(suffix: str) -> int:
-                total = 0
-                for k, v in (responses or {}).items():
-                    if isinstance(k, str) and k.endswith(suffix):
-                        try:
-                            total += int(str(v))
-                        except Exception:
-                            pass
-                return total
-            if not responses.get("critical_defects"):
-                responses["critical_defects"] = _sum_suffix("__critical_text")
-            if not responses.get("major_defects"):
-                responses["major_defects"] = _sum_suffix("__major_text")
-            if not responses.get("minor_defects"):
-                responses["minor_defects"] = _sum_suffix("__minor_text")
-        except Exception:
-            pass
-
-        aql_results = AQLResultProcessor.process_inspection_results(
-            responses, 
-            aql_config, 
-            template.defect_categories
-        )
-        
+            plan_severity = get_severity(template.organization, template._id, insp_doc.get("supplier"))
+        except Exception as e:  # noqa: BLE001 – fall back to the template's plan
+            logger.error(f"Failed to read switching state for inspection {inspection_id}: {e}")
+        if plan_severity == DISCONTINUED:
+            return jsonify({
+                "success": False,
+                "message": "Inspection of this supplier under this template is discontinued by the "
+                           "switching rules (5 lots rejected on tightened inspection); an IT admin "
+                           "must resume it after corrective action",
+            }), 409
+        if plan_severity != NORMAL:
+            aql_config.update(AQLCalculator.calculate_aql_criteria(
+                template.lot_size, template.aql_level, severity=plan_severity
+            ))
+            evaluate = compile_evaluator(aql_config, template.defect_categories)
+
+        # Missing totals are derived from per-question counts for the verdict only
+        aql_results = evaluate(responses, tally)
+
+        aql_results["plan"] = {**aql_config, "severity": plan_severity}
+        # Coded sample defects, classified against the cached master list
+        try:
+            aql_results["classified_defects"] = classify_sample_defects(responses, defect_master_cache.get())
+        except Exception as e:
+            logger.error(f"Failed to classify defect codes for inspection {inspection_id}: {e}")
         defect_counts = aql_results["defect_counts"]
         aql_passed = aql_results["passed"]
         aql_rejection_reasons = aql_results["rejection_reasons"]
@@ -347,56 +667,55 @@ def submit_inspection(inspection_id):
     matched_actions = []
     missing_evidence_errors = []
     try:
-        pages = (template.pages or [])
-        for page in pages:
-            for q in (page.get("questions") or []):
-                qid = q.get("id")
-                if not qid:
-                    continue
-                q_rules = q.get("rules") or []
-                if not q_rules:
-                    continue
-                ans = (responses or {}).get(str(qid))
-                for r in q_rules:
-                    if str(ans) == str(r.get("equals")):
-                        # Evidence checks
-                        if r.get("require_text"):
-                            txt_key = f"{qid}__evidence_text"
-                            if not (responses or {}).get(txt_key):
-                                missing_evidence_errors.append({"question_id": qid, "missing": "text"})
-                        if r.get("require_media"):
-                            media_key = f"{qid}__evidence_media"
-                            if not (responses or {}).get(media_key):
-                                missing_evidence_errors.append({"question_id": qid, "missing": "media"})
-
-                        # Record matched action
-                        matched_actions.append({
+        # Only questions that carry rules, precomputed with the template version
+        for q in compiled.rule_questions:
+            qid = q.get("id")
+            if not qid:
+                continue
+            q_rules = q.get("rules") or []
+            if not q_rules:
+                continue
+            ans = (responses or {}).get(str(qid))
+            for r in q_rules:
+                if str(ans) == str(r.get("equals")):
+                    # Evidence checks
+                    if r.get("require_text"):
+                        txt_key = f"{qid}__evidence_text"
+                        if not (responses or {}).get(txt_key):
+                            missing_evidence_errors.append({"question_id": qid, "missing": "text"})
+                    if r.get("require_media"):
+                        media_key = f"{qid}__evidence_media"
+                        if not (responses or {}).get(media_key):
+                            missing_evidence_errors.append({"question_id": qid, "missing": "media"})
+
+                    # Record matched action
+                    matched_actions.append({
+                        "question_id": qid,
+                        "value": ans,
+                        "require_text": bool(r.get("require_text")),
+                        "require_media": bool(r.get("require_media")),
+                        "notify": bool(r.get("notify")),
+                        "message": r.get("message") or None,
+                    })
+                    # Queue notification to manager if requested or if media evidence is required
+                    if r.get("notify") or r.get("require_media"):
+                        notify_msg = (
+                            r.get("message")
+                            or (f"Media evidence required for question '{q.get('text') or qid}' (value '{ans}')" if r.get("require_media") else None)
+                            or f"Rule matched for question {qid}: value '{ans}'"
+                        )
+                        rule_notifications.append({
+                            "template_id": insp_doc.get("template_id"),
+                            "inspection_id": insp_id,
+                            "manager_id": insp_doc.get("manager_id"),
+                            "inspector_id": insp_doc.get("inspector_id"),
                             "question_id": qid,
-                            "value": ans,
-                            "require_text": bool(r.get("require_text")),
-                            "require_media": bool(r.get("require_media")),
-                            "notify": bool(r.get("notify")),
-                            "message": r.get("message") or None,
+                            "question_text": q.get("text"),
+                            "message": notify_msg,
+                            "created_at": datetime.utcnow(),
+                            "type": "RULE_TRIGGER",
+                            "read": False,
                         })
-                        # Queue notification to manager if requested or if media evidence is required
-                        if r.get("notify") or r.get("require_media"):
-                            notify_msg = (
-                                r.get("message")
-                                or (f"Media evidence required for question '{q.get('text') or qid}' (value '{ans}')" if r.get("require_media") else None)
-                                or f"Rule matched for question {qid}: value '{ans}'"
-                            )
-                            rule_notifications.append({
-                                "template_id": insp_doc.get("template_id"),
-                                "inspection_id": insp_id,
-                                "manager_id": insp_doc.get("manager_id"),
-                                "inspector_id": insp_doc.get("inspector_id"),
-                                "question_id": qid,
-                                "question_text": q.get("text"),
-                                "message": notify_msg,
-                                "created_at": datetime.utcnow(),
-                                "type": "RULE_TRIGGER",
-                                "read": False,
-                            })
     except Exception as _e:
         logger.error(f"Rule evaluation failed for inspection {inspection_id}: {_e}")
 
@@ -431,6 +750,12 @@ def submit_inspection(inspection_id):
         "defect_counts": defect_counts,
         "aql_passed": aql_passed,
         "aql_rejection_reasons": aql_rejection_reasons,
+        # Full save/submit: re-seed the live tally with the counts judged here
+        "live_tally": {
+            **DefectTally.submitted(responses).as_dict(),
+            "units_inspected": (insp_doc.get("live_tally") or {}).get("units_inspected", 0),
+            "aql_config": aql_config,
+        },
         # Backward compatibility: keep rule_actions for any existing consumers
         "rule_actions": matched_actions,
         # New unified field name
@@ -478,11 +803,8 @@ def submit_inspection(inspection_id):
             # Get template title for display
             tpl = templates_coll.find_one({"_id": insp_doc.get("template_id")}) or {}
             # Resolve names for display
-            users_coll = db.get_collection("users")
-            mgr_doc = users_coll.find_one({"_id": insp_doc.get("manager_id")}) or {}
-            insp_user = users_coll.find_one({"_id": insp_doc.get("inspector_id")}) or {}
-            manager_name = f"{mgr_doc.get('firstName','')} {mgr_doc.get('lastName','')}".strip()
-            inspector_name = f"{insp_user.get('firstName','')} {insp_user.get('lastName','')}".strip()
+            manager_name = full_name(user_profiles.get(insp_doc.get("manager_id")))
+            inspector_name = full_name(user_profiles.get(insp_doc.get("inspector_id")))
             manager_task = Task(
                 title=f"Review: {tpl.get('title', 'Inspection')}",
                 description="From inspector",
@@ -571,13 +893,16 @@ def approve_inspection(inspection_id):
     if insp_doc.get("status") != "submitted":
         return jsonify({"success": False, "message": "Inspection is not pending review"}), 400
 
-    # Finalize inspection
+    # Finalize inspection; the status filter lets only one concurrent approval
+    # through, so the side effects below run once per inspection
     now = datetime.utcnow()
-    inspections_coll.update_one({"_id": insp_id}, {"$set": {
+    result = inspections_coll.update_one({"_id": insp_id, "status": "submitted"}, {"$set": {
         "status": "completed",
         "completed_at": now,
         "updated_at": now,
     }})
+    if result.modified_count != 1:
+        return jsonify({"success": False, "message": "Inspection is not pending review"}), 409
 
     # Store inspection response now
     try:
@@ -637,6 +962,24 @@ def approve_inspection(inspection_id):
     except Exception as e:
         logger.error(f"Failed to create CAR on approval for inspection {inspection_id}: {e}")
 
+    # Advance the switching-rule state for this supplier/template
+    try:
+        tpl = db.get_collection("templates").find_one({"_id": insp_doc.get("template_id")}, {
+            "organization": 1, "lot_size": 1, "aql_level": 1, "major_defects_allowed": 1,
+        }) or {}
+        acceptance_number = lot_acceptance_number(insp_doc, tpl)
+        if acceptance_number is not None:
+            record_lot_outcome(
+                tpl.get("organization"),
+                insp_doc.get("template_id"),
+                insp_doc.get("supplier"),
+                accepted=bool(insp_doc.get("aql_passed", True)),
+                acceptance_number=acceptance_number,
+                defects_found=int((insp_doc.get("defect_counts") or {}).get("major") or 0),
+            )
+    except Exception as e:
+        logger.error(f"Failed to update switching state on approval for inspection {inspection_id}: {e}")
+
     # Mark linked tasks as completed
     try:
         tasks_coll = db.get_collection("tasks")
@@ -674,6 +1017,141 @@ def approve_inspection(inspection_id):
     })
 
 
+# -----------------------------------------------------------------------------
+# Switching-rule state (normal / tightened / reduced / discontinued)
+# -----------------------------------------------------------------------------
+
+@inspection_bp.route("/switching-state", methods=["GET"])
+@require_auth
+def get_switching_state():
+    """Return the switching-rule state for ?template_id=&supplier=."""
+    user = request.current_user
+    if user["role"] not in ["it", "manager"]:
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    try:
+        tpl_id = ObjectId(request.args.get("template_id"))
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid template id"}), 400
+
+    db = get_db()
+    tpl = db.get_collection("templates").find_one({"_id": tpl_id}, {"organization": 1, "manager_id": 1})
+    if not tpl:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    if user["role"] == "manager" and str(tpl.get("manager_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    supplier = (request.args.get("supplier") or "").strip() or None
+    doc = db.get_collection("switching_states").find_one({
+        "organization": tpl.get("organization"), "template_id": tpl_id, "supplier": supplier
+    }) or {"state": NORMAL}
+    doc.pop("_id", None)
+    doc["template_id"] = str(tpl_id)
+    doc["supplier"] = supplier
+    if doc.get("updated_at"):
+        doc["updated_at"] = doc["updated_at"].isoformat()
+    return jsonify({"success": True, "data": doc})
+
+
+@inspection_bp.route("/switching-state/rebuild", methods=["POST"])
+@require_auth
+def rebuild_switching_states():
+    """IT – recompute every switching state from completed inspection history.
+
+    Optional JSON payload: {"organization": str} to limit the rebuild.
+    History is streamed once in completion order with a narrow projection and
+    all states are written back with a single unordered bulk write; stored
+    states in the rebuilt scope with no remaining history are deleted.
+    Inspections completed before plans were stored count against their
+    template's acceptance number. Resumes of discontinued keys are replayed
+    at the time they were made.
+    """
+    user = request.current_user
+    if user["role"] != "it":
+        return jsonify({"success": False, "message": "Only IT can rebuild switching states"}), 403
+
+    payload = request.get_json(silent=True) or {}
+    db = get_db()
+    inspections_coll = db.get_collection("inspections")
+    templates_coll = db.get_collection("templates")
+
+    query = {"status": "completed"}
+    scope = {}
+    tpl_query = {"_id": {"$in": inspections_coll.distinct("template_id", query)}}
+    if payload.get("organization"):
+        tpl_query["organization"] = scope["organization"] = payload["organization"]
+    template_by_id = {
+        doc["_id"]: doc
+        for doc in templates_coll.find(tpl_query, {
+            "organization": 1, "lot_size": 1, "aql_level": 1, "major_defects_allowed": 1,
+        })
+    }
+    query["template_id"] = {"$in": list(template_by_id.keys())}
+
+    cursor = inspections_coll.find(query, {
+        "template_id": 1, "supplier": 1, "aql_passed": 1, "completed_at": 1,
+        "defect_counts.major": 1, "aql_results.plan.major_defects_allowed": 1,
+    }).sort("completed_at", 1)
+
+    def outcomes():
+        for doc in cursor:
+            tpl = template_by_id.get(doc.get("template_id")) or {}
+            acceptance_number = lot_acceptance_number(doc, tpl)
+            if acceptance_number is None:
+                continue
+            yield {
+                "organization": tpl.get("organization"),
+                "template_id": doc.get("template_id"),
+                "supplier": doc.get("supplier"),
+                "accepted": doc.get("aql_passed", True),
+                "acceptance_number": acceptance_number,
+                "defects_found": (doc.get("defect_counts") or {}).get("major"),
+                "at": doc.get("completed_at") or datetime.min,
+            }
+
+    try:
+        history = heapq.merge(outcomes(), resume_events(scope), key=lambda item: item["at"] or datetime.min)
+        states = rebuild_states(history)
+        counts = write_rebuilt_states(states, scope)
+    except Exception as e:
+        logger.error(f"Failed to rebuild switching states: {e}")
+        return jsonify({"success": False, "message": "Failed to rebuild switching states"}), 500
+
+    summary = {}
+    for state in states.values():
+        summary[state["state"]] = summary.get(state["state"], 0) + 1
+    return jsonify({"success": True, "data": {
+        "keys": counts["written"], "removed": counts["removed"], "by_state": summary,
+    }})
+
+
+@inspection_bp.route("/switching-state/resume", methods=["POST"])
+@require_auth
+def resume_switching_state():
+    """IT – resume a discontinued supplier/template on tightened inspection.
+
+    JSON payload: {"template_id": str, "supplier": str | null}
+    """
+    user = request.current_user
+    if user["role"] != "it":
+        return jsonify({"success": False, "message": "Only IT can resume discontinued inspection"}), 403
+
+    payload = request.get_json(silent=True) or {}
+    try:
+        tpl_id = ObjectId(payload.get("template_id"))
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid template id"}), 400
+
+    tpl = get_db().get_collection("templates").find_one({"_id": tpl_id}, {"organization": 1})
+    if not tpl:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+
+    supplier = (payload.get("supplier") or "").strip() or None
+    if not resume_key(tpl.get("organization"), tpl_id, supplier, resumed_by=ObjectId(user["user_id"])):
+        return jsonify({"success": False, "message": "Inspection of this supplier is not discontinued"}), 409
+    return jsonify({"success": True, "message": "Inspection resumed on tightened severity"})
+
+
 # -----------------------------------------------------------------------------
 # Completed inspections list – role dependent
 # -----------------------------------------------------------------------------
@@ -773,6 +1251,52 @@ def get_aql_results(inspection_id):
     })
 
 
+# -----------------------------------------------------------------------------
+# Audit trail (IT and the owning manager)
+# -----------------------------------------------------------------------------
+
+@inspection_bp.route("/<inspection_id>/audit", methods=["GET"])
+@require_auth
+def get_inspection_audit(inspection_id):
+    """Audit entries for an inspection, newest first.
+
+    Query params: limit (max 200), cursor (from the previous page), action.
+    """
+    user = request.current_user
+    if user["role"] not in ("it", "manager"):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    try:
+        insp_id = ObjectId(inspection_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid inspection id"}), 400
+
+    db = get_db()
+    insp_doc = db.get_collection("inspections").find_one({"_id": insp_id}, {"manager_id": 1})
+    if not insp_doc:
+        return jsonify({"success": False, "message": "Inspection not found"}), 404
+    if user["role"] == "manager" and str(insp_doc.get("manager_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    query = {"inspection_id": insp_id}
+    if request.args.get("action"):
+        query["action"] = request.args["action"]
+    try:
+        entries, next_cursor = query_audit(
+            db.get_collection("inspection_audits"), query,
+            limit=request.args.get("limit", AUDIT_PAGE_SIZE, type=int),
+            cursor=request.args.get("cursor"),
+        )
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+    return jsonify({
+        "success": True,
+        "data": entries,
+        "pagination": {"next_cursor": next_cursor, "has_more": next_cursor is not None},
+    })
+
+
 # -----------------------------------------------------------------------------
 # Upload media for answers/evidence (GridFS-backed)
 # -----------------------------------------------------------------------------
@@ -8,6 +8,7 @@ import logging
 
 from ..utils.auth import require_auth
 from ..utils.database import get_db
+from ..utils.user_profiles import full_name, user_profiles
 from ..models.task import Task
 from ..models.inspection import Inspection
 
@@ -37,25 +38,21 @@ def get_user_tasks():
     else:
         query = {"assigned_to_id": ObjectId(user_id)}
     
-    users_coll = db.get_collection("users")
-    cursor = tasks_coll.find(query).sort("created_at", -1)
+    docs = list(tasks_coll.find(query).sort("created_at", -1))
+    # Enrich with role labels for assignee/assigner (cached, one query for misses)
+    profiles = user_profiles.get_many(
+        [doc.get("assigned_to_id") for doc in docs] + [doc.get("assigned_by_id") for doc in docs]
+    )
     results = []
-    for doc in cursor:
-        # Enrich with role labels for assignee/assigner
-        try:
-            assignee = users_coll.find_one({"_id": doc.get("assigned_to_id")}) or {}
-            assigner = users_coll.find_one({"_id": doc.get("assigned_by_id")}) or {}
-            doc["assigned_to_role"] = assignee.get("role")
-            doc["assigned_by_role"] = assigner.get("role")
-        except Exception:
-            pass
+    for doc in docs:
+        doc["assigned_to_role"] = (profiles.get(str(doc.get("assigned_to_id"))) or {}).get("role")
+        doc["assigned_by_role"] = (profiles.get(str(doc.get("assigned_by_id"))) or {}).get("role")
         results.append(Task.from_dict(doc).public_view())
 
     # For inspectors, backfill tasks from inspections if missing
     if role == "inspector":
         inspections_coll = db.get_collection("inspections")
         templates_coll = db.get_collection("templates")
-        users_coll = db.get_collection("users")
         # Include all statuses we need for inspector view
         insp_cursor = inspections_coll.find({
             "inspector_id": ObjectId(user_id),
@@ -109,8 +106,7 @@ def get_user_tasks():
                 # Optional: resolve manager name for role line on frontend
                 manager_name = ""
                 try:
-                    mgr = users_coll.find_one({"_id": insp.manager_id}) or {}
-                    manager_name = f"{mgr.get('firstName','')} {mgr.get('lastName','')}".strip()
+                    manager_name = full_name(user_profiles.get(insp.manager_id))
                 except Exception:
                     manager_name = ""
 
@@ -204,10 +200,9 @@ def create_task():
     
     db = get_db()
     tasks_coll = db.get_collection("tasks")
-    users_coll = db.get_collection("users")
     
     # Get assigned user details
-    assigned_user = users_coll.find_one({"_id": ObjectId(payload["assigned_to_id"])})
+    assigned_user = user_profiles.get(ObjectId(payload["assigned_to_id"]))
     if not assigned_user:
         return jsonify({
             "success": False, 
@@ -2,22 +2,51 @@
 
 from datetime import datetime
 from bson import ObjectId
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from marshmallow import ValidationError
 import logging
 
 from ..utils.auth import require_auth
 from ..utils.database import get_db
+from ..utils.user_profiles import user_profiles
 from ..models.template import Template, template_schema
 from ..utils.aql import AQLCalculator
+from ..utils.defect_master import defect_master_cache, update_master
+from ..utils.defect_search import get_index as get_defect_search_index
+from ..utils.reevaluation import job_public_view, start_job
+from ..utils.template_versions import inspector_view, template_versions, version_content
+from ..utils.template_import import import_templates
+from ..utils.template_validation import validate_pages
+from ..utils.template_patch import PatchError, PatchTestFailed, build_update as build_pages_update
+from ..utils.reference_data import aql_reference_files_cache, aql_workbook_cache, defects_library_cache
 import os
-import json
-from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 template_bp = Blueprint("template", __name__, url_prefix="/api/templates")
 
+DEFAULT_LIST_PAGE_SIZE = 50
+MAX_LIST_PAGE_SIZE = 200
+
+
+def _cached_response(entry):
+    """Serve a pre-serialised reference body, answering 304 when the ETag matches.
+
+    Clients that accept gzip get the precompressed variant (with its own ETag).
+    Both variants carry ``Vary: Accept-Encoding``.
+    """
+    # Quality-aware: "gzip;q=0" refuses gzip, "*" accepts it
+    if request.accept_encodings["gzip"] > 0:
+        resp = Response(entry.gzip_body, mimetype="application/json")
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.set_etag(f"{entry.etag}-gz")
+    else:
+        resp = Response(entry.body, mimetype="application/json")
+        resp.set_etag(entry.etag)
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
 # -----------------------------------------------------------------------------
 # List templates (role dependent)
 # -----------------------------------------------------------------------------
@@ -25,7 +54,12 @@ template_bp = Blueprint("template", __name__, url_prefix="/api/templates")
 @template_bp.route("/", methods=["GET"])
 @require_auth
 def list_templates():
-    """List templates based on user role."""
+    """List template summaries based on user role.
+
+    Query params: status, page (1-based, default 1), page_size (default 50,
+    max 200). Entries carry no ``pages``; fetch ``GET /api/templates/<id>``
+    for the full content.
+    """
     user = request.current_user
     db = get_db()
     collection = db.get_collection("templates")
@@ -46,13 +80,32 @@ def list_templates():
     if status:
         query["status"] = status
 
-    cursor = collection.find(query).sort("created_at", -1)
-    tpl_list = []
-    for doc in cursor:
-        tpl = Template.from_dict(doc)
-        tpl_list.append(tpl.public_view())
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        page_size = max(1, min(MAX_LIST_PAGE_SIZE, int(request.args.get("page_size", DEFAULT_LIST_PAGE_SIZE))))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "page and page_size must be integers"}), 400
+
+    total = collection.count_documents(query)
+    cursor = collection.aggregate([
+        {"$match": query},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$skip": (page - 1) * page_size},
+        {"$limit": page_size},
+        {"$project": Template.SUMMARY_PROJECTION},
+    ])
+    tpl_list = [Template.summary_view(doc) for doc in cursor]
 
-    return jsonify({"success": True, "data": tpl_list})
+    return jsonify({
+        "success": True,
+        "data": tpl_list,
+        "pagination": {
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "has_more": page * page_size < total,
+        },
+    })
 
 
 # -----------------------------------------------------------------------------
@@ -94,14 +147,10 @@ def defect_master_list():
     }
     """
     user = request.current_user
-    db = get_db()
-    coll = db.get_collection("defect_master")
 
     if request.method == "GET":
-        doc = coll.find_one({}) or {"critical": [], "major": [], "minor": []}
-        if doc.get("_id"):
-            doc["_id"] = str(doc["_id"])  # hide ObjectId
-        return jsonify({"success": True, "data": doc})
+        # Served from the per-worker cache; revalidated by version only
+        return jsonify({"success": True, "data": defect_master_cache.get().public_view()})
 
     # PUT
     if user["role"] != "it":
@@ -110,12 +159,9 @@ def defect_master_list():
     allowed = {"critical": list, "major": list, "minor": list}
     update_doc = {k: (payload.get(k) or []) for k in allowed.keys()}
 
-    # Upsert single master-list doc
-    coll.update_one({}, {"$set": update_doc}, upsert=True)
-    doc = coll.find_one({})
-    if doc.get("_id"):
-        doc["_id"] = str(doc["_id"])  # hide ObjectId
-    return jsonify({"success": True, "data": doc})
+    # Upsert single master-list doc and bump its version
+    snapshot = update_master(update_doc)
+    return jsonify({"success": True, "data": snapshot.public_view()})
 
 
 @template_bp.route("/", methods=["POST"])
@@ -127,40 +173,38 @@ def create_template():
         return jsonify({"success": False, "message": "Only IT staff can create templates."}), 403
 
     payload = request.get_json() or {}
-    print(f"Received template creation request from user {user['user_id']}: {payload}")
+    logger.info(f"Template creation request from user {user['user_id']}")
     
     # Basic validation before schema validation
     if not payload.get("title") or not payload["title"].strip():
-        print("Validation failed: Template title is required")
         return jsonify({"success": False, "message": "Template title is required"}), 400
     
     if not payload.get("manager_email"):
-        print("Validation failed: Manager email is required")
         return jsonify({"success": False, "message": "Manager email is required"}), 400
     
     if not payload.get("organization") or not payload["organization"].strip():
-        print("Validation failed: Organization is required")
         return jsonify({"success": False, "message": "Organization is required"}), 400
     
     if not payload.get("location") or not payload["location"].strip():
-        print("Validation failed: Location is required")
         return jsonify({"success": False, "message": "Location is required"}), 400
     
     if not payload.get("pages") or not isinstance(payload["pages"], list) or len(payload["pages"]) == 0:
-        print("Validation failed: Template must have at least one page")
         return jsonify({"success": False, "message": "Template must have at least one page"}), 400
     
+    # pages are checked by the single-pass structural validator; marshmallow
+    # only sees the small scalar fields
+    error_messages = validate_pages(payload["pages"])
     try:
-        validated = template_schema.load(payload)
-        print(f"Schema validation passed for template: {validated['title']}")
+        validated = template_schema.load({k: v for k, v in payload.items() if k != "pages"}, partial=("pages",))
+        validated["pages"] = payload["pages"]
     except ValidationError as e:
-        print(f"Schema validation failed: {e.messages}")
-        error_messages = []
         for field, errors in e.messages.items():
             if isinstance(errors, list):
                 error_messages.extend([f"{field}: {error}" for error in errors])
             else:
                 error_messages.append(f"{field}: {errors}")
+    if error_messages:
+        logger.warning(f"Template validation failed with {len(error_messages)} error(s)")
         return jsonify({
             "success": False, 
             "message": "Validation error", 
@@ -171,17 +215,12 @@ def create_template():
     collection = db.get_collection("templates")
 
     # ensure manager exists
-    users_coll = db.get_collection("users")
-    mgr_doc = users_coll.find_one({"email": validated["manager_email"]})
+    mgr_doc = user_profiles.get_by_email(validated["manager_email"])
     if not mgr_doc:
-        print(f"Manager not found: {validated['manager_email']}")
         return jsonify({"success": False, "message": f"Manager with email '{validated['manager_email']}' not found"}), 400
     if mgr_doc.get("role") != "manager":
-        print(f"User is not a manager: {validated['manager_email']}")
         return jsonify({"success": False, "message": f"User '{validated['manager_email']}' is not a manager"}), 400
 
-    print(f"Creating template for manager: {mgr_doc.get('firstName')} {mgr_doc.get('lastName')}")
-    
     # Calculate AQL criteria if lot_size is provided
     aql_criteria = None
     if validated.get("lot_size") and validated.get("aql_level"):
@@ -220,17 +259,49 @@ def create_template():
         template_dict = template.to_dict()
         result = collection.insert_one(template_dict)
         template._id = result.inserted_id
-        print(f"Template created successfully with ID: {result.inserted_id}")
+        logger.info(f"Template created with ID: {result.inserted_id}")
         return jsonify({
             "success": True, 
             "message": "Template created successfully",
             "data": template.public_view()
         })
     except Exception as e:
-        print(f"Database error creating template: {e}")
+        logger.error(f"Database error creating template: {e}")
         return jsonify({"success": False, "message": "Failed to create template"}), 500
 
 
+@template_bp.route("/import", methods=["POST"])
+@require_auth
+def import_templates_from_file():
+    """Bulk-create templates from an uploaded .xlsx or .csv (IT only).
+
+    Multipart form: file (required), sheet (optional), dry_run ("true" to
+    only parse and validate). One row per question; see
+    ``utils.template_import`` for the columns.
+    """
+    user = request.current_user
+    if user["role"] != "it":
+        return jsonify({"success": False, "message": "Only IT staff can import templates."}), 403
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"success": False, "message": "file is required"}), 400
+    dry_run = (request.form.get("dry_run") or "").lower() == "true"
+
+    try:
+        result = import_templates(
+            get_db(), upload.stream, upload.filename, ObjectId(user["user_id"]),
+            sheet=request.form.get("sheet") or None, dry_run=dry_run,
+        )
+    except (ValueError, KeyError) as e:
+        return jsonify({"success": False, "message": f"Could not read spreadsheet: {e}"}), 400
+    except Exception as e:
+        logger.error(f"Template import failed: {e}")
+        return jsonify({"success": False, "message": "Template import failed"}), 500
+
+    return jsonify({"success": bool(result["created"]) or not result["errors"], "data": result})
+
+
 @template_bp.route("/draft", methods=["POST"])
 @require_auth
 def create_draft_template():
@@ -255,6 +326,9 @@ def create_draft_template():
         return jsonify({"success": False, "message": "Template title is required"}), 400
     if not isinstance(pages, list) or len(pages) == 0:
         return jsonify({"success": False, "message": "Template must have at least one page"}), 400
+    errors = validate_pages(pages)
+    if errors:
+        return jsonify({"success": False, "message": "Validation error", "details": errors}), 400
 
     db = get_db()
     collection = db.get_collection("templates")
@@ -323,6 +397,7 @@ def delete_template(template_id):
         return jsonify({"success": False, "message": "Access denied"}), 403
 
     collection.delete_one({"_id": tpl_id})
+    template_versions.forget(tpl_id)
     return jsonify({"success": True, "message": "Template deleted"})
 
 # -----------------------------------------------------------------------------
@@ -340,12 +415,16 @@ def calculate_aql():
     payload = request.get_json() or {}
     lot_size = payload.get("lot_size")
     aql_level = payload.get("aql_level", 2.5)
+    # Optional switching-rule severity: normal (default), tightened, reduced
+    severity = payload.get("severity") or "normal"
 
     if not lot_size or not isinstance(lot_size, int) or lot_size < 1:
         return jsonify({"success": False, "message": "Valid lot_size is required"}), 400
+    if severity not in ["normal", "tightened", "reduced"]:
+        return jsonify({"success": False, "message": "severity must be normal, tightened or reduced"}), 400
 
     try:
-        aql_criteria = AQLCalculator.calculate_aql_criteria(lot_size, aql_level)
+        aql_criteria = AQLCalculator.calculate_aql_criteria(lot_size, aql_level, severity=severity)
         return jsonify({
             "success": True,
             "data": aql_criteria
@@ -360,42 +439,37 @@ def calculate_aql():
 def get_aql_reference_tables():
     """Return the first two sheets of the AQL Excel as tables for the UI Reference Tables modal.
 
-    Source path priority:
-      1. Query param ?path= (absolute path)
-      2. Env var AQL_EXCEL_PATH
+    The workbook at AQL_EXCEL_PATH is compiled once in the background and
+    served from memory with an ETag; while the first compile runs the
+    endpoint answers 202 and the client should retry.
     """
     user = request.current_user
     # Allow IT and manager to view; inspectors don't need this in the field
     if user["role"] not in ["it", "manager"]:
         return jsonify({"success": False, "message": "Access denied"}), 403
 
-    excel_path = request.args.get("path") or os.environ.get("AQL_EXCEL_PATH")
+    if request.args.get("path"):
+        return jsonify({"success": False, "message": "The path parameter is not supported; configure AQL_EXCEL_PATH"}), 400
+
+    excel_path = os.environ.get("AQL_EXCEL_PATH")
     if not excel_path:
         return jsonify({"success": False, "message": "AQL_EXCEL_PATH not configured"}), 400
 
     try:
-        # Lazy import so that app can start even if pandas is missing until installed
-        import pandas as pd  # type: ignore
-        xls = pd.ExcelFile(excel_path)
-        sheet_names = xls.sheet_names[:2]
-        out_sheets = []
-        for name in sheet_names:
-            df = pd.read_excel(excel_path, sheet_name=name, engine="openpyxl")
-            df = df.fillna("")
-            headers = [str(c) for c in df.columns]
-            rows = [[str(v) if v is not None else "" for v in row] for row in df.values.tolist()]
-            out_sheets.append({
-                "name": name,
-                "headers": headers,
-                "rows": rows,
-            })
-        return jsonify({"success": True, "data": {"sheets": out_sheets}})
+        entry = aql_workbook_cache.get(excel_path)
     except FileNotFoundError:
-        return jsonify({"success": False, "message": f"Excel not found: {excel_path}"}), 404
+        return jsonify({"success": False, "message": "AQL Excel file not found"}), 404
     except Exception as e:
         logger.error(f"Failed to read AQL Excel: {e}")
         return jsonify({"success": False, "message": "Failed to read AQL reference tables"}), 500
 
+    if entry is None:
+        resp = jsonify({"success": False, "message": "AQL reference tables are loading, retry shortly", "error": "WARMING_UP"})
+        resp.status_code = 202
+        resp.headers["Retry-After"] = "1"
+        return resp
+    return _cached_response(entry)
+
 
 @template_bp.route("/aql-reference-files", methods=["GET"])
 @require_auth
@@ -410,29 +484,9 @@ def get_aql_reference_from_files():
         return jsonify({"success": False, "message": "Access denied"}), 403
 
     try:
-        project_root = Path(__file__).resolve().parents[3]
-        output_dir = project_root / "aql_output"
-        s2_path = output_dir / "Sheet2.json"
-        s4_path = output_dir / "Sheet4.json"
-
-        if not s2_path.exists() or not s4_path.exists():
-            return jsonify({"success": False, "message": "AQL JSON files not found in aql_output"}), 404
-
-        def to_table(json_path: Path):
-            with json_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            if not isinstance(data, list) or not data:
-                return {"name": json_path.stem, "headers": [], "rows": []}
-            # Use the first object's keys as headers, preserving order
-            first = data[0]
-            headers = list(first.keys())
-            rows = [[str((row.get(h, ""))) for h in headers] for row in data]
-            return {"name": json_path.stem, "headers": headers, "rows": rows}
-
-        sheet2 = to_table(s2_path)
-        sheet4 = to_table(s4_path)
-
-        return jsonify({"success": True, "data": {"sheets": [sheet2, sheet4]}})
+        return _cached_response(aql_reference_files_cache.get())
+    except FileNotFoundError:
+        return jsonify({"success": False, "message": "AQL JSON files not found in aql_output"}), 404
     except Exception as e:
         logger.error(f"Failed to read AQL JSON files: {e}")
         return jsonify({"success": False, "message": "Failed to read AQL reference tables from files"}), 500
@@ -457,37 +511,43 @@ def get_defects_library_from_file():
         return jsonify({"success": False, "message": "Access denied"}), 403
 
     try:
-        project_root = Path(__file__).resolve().parents[3]
-        output_dir = project_root / "aql_output"
-        defects_path = output_dir / "garments_defects.json"
-
-        if not defects_path.exists():
-            return jsonify({"success": False, "message": "garments_defects.json not found in aql_output"}), 404
-
-        with defects_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        categories = {}
-        current_cat = None
-        for row in (data or []):
-            cat = row.get("Defect Category")
-            desc = row.get("Defect Description (English)")
-            if cat is not None and str(cat).strip() != "":
-                current_cat = str(cat).strip()
-                categories.setdefault(current_cat, [])
-            if desc is None:
-                continue
-            if current_cat is None:
-                # Skip descriptions until a first category appears
-                continue
-            categories.setdefault(current_cat, []).append(str(desc).strip())
-
-        return jsonify({"success": True, "data": {"categories": categories}})
+        return _cached_response(defects_library_cache.get())
+    except FileNotFoundError:
+        return jsonify({"success": False, "message": "garments_defects.json not found in aql_output"}), 404
     except Exception as e:
         logger.error(f"Failed to read defects library JSON: {e}")
         return jsonify({"success": False, "message": "Failed to read defects library"}), 500
 
 
+@template_bp.route("/defects-library/search", methods=["GET"])
+@require_auth
+def search_defects_library():
+    """Ranked typeahead over defect categories, descriptions and master codes.
+
+    Query params: q (search text), limit (default 10, max 50).
+    """
+    user = request.current_user
+    if user["role"] not in ["it", "manager"]:
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    q = (request.args.get("q") or "").strip()
+    try:
+        limit = max(1, min(50, int(request.args.get("limit", 10))))
+    except ValueError:
+        return jsonify({"success": False, "message": "limit must be an integer"}), 400
+    if not q:
+        return jsonify({"success": True, "data": {"results": []}})
+
+    try:
+        results = get_defect_search_index().search(q, limit)
+    except FileNotFoundError:
+        return jsonify({"success": False, "message": "garments_defects.json not found in aql_output"}), 404
+    except Exception as e:
+        logger.error(f"Defect search failed: {e}")
+        return jsonify({"success": False, "message": "Failed to search defects library"}), 500
+    return jsonify({"success": True, "data": {"results": results}})
+
+
 @template_bp.route("/<template_id>/aql-config", methods=["PUT"])
 @require_auth
 def update_aql_config(template_id):
@@ -571,16 +631,63 @@ def update_aql_config(template_id):
         # Return updated template
         updated_doc = collection.find_one({"_id": tpl_id})
         updated_template = Template.from_dict(updated_doc)
+        _refresh_published_version(updated_doc, user)
+
+        # Re-evaluate in-flight inspections against the new criteria in the background
+        job_id = None
+        try:
+            job_id = start_job(tpl_id, requested_by=ObjectId(user["user_id"]))
+        except Exception as e:
+            logger.error(f"Failed to start re-evaluation for template {template_id}: {e}")
         
         return jsonify({
             "success": True,
             "message": "AQL configuration updated",
-            "data": updated_template.public_view()
+            "data": updated_template.public_view(),
+            "reevaluation_job_id": str(job_id) if job_id else None,
         })
     
     return jsonify({"success": False, "message": "No valid fields to update"}), 400
 
 
+@template_bp.route("/<template_id>/reevaluation", methods=["GET", "POST"])
+@require_auth
+def template_reevaluation(template_id):
+    """GET returns the latest re-evaluation job for a template.
+
+    POST starts a new job, or resumes an unfinished one for the same AQL
+    configuration from its checkpoint.
+    """
+    user = request.current_user
+    if user["role"] not in ["it", "manager"]:
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    try:
+        tpl_id = ObjectId(template_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid template id"}), 400
+
+    db = get_db()
+    template_doc = db.get_collection("templates").find_one({"_id": tpl_id}, {"manager_id": 1})
+    if not template_doc:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    if user["role"] == "manager" and str(template_doc.get("manager_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+
+    jobs = db.get_collection("reevaluation_jobs")
+    if request.method == "POST":
+        try:
+            start_job(tpl_id, requested_by=ObjectId(user["user_id"]))
+        except Exception as e:
+            logger.error(f"Failed to start re-evaluation for template {template_id}: {e}")
+            return jsonify({"success": False, "message": "Failed to start re-evaluation"}), 500
+
+    job = jobs.find_one({"template_id": tpl_id}, sort=[("created_at", -1)])
+    if not job:
+        return jsonify({"success": False, "message": "No re-evaluation job found"}), 404
+    return jsonify({"success": True, "data": job_public_view(job)})
+
+
 # -----------------------------------------------------------------------------
 # Get single template
 # -----------------------------------------------------------------------------
@@ -588,7 +695,16 @@ def update_aql_config(template_id):
 @template_bp.route("/inspection/<template_id>", methods=["GET"])
 @require_auth
 def get_template_for_inspection(template_id):
-    """Get template for inspection/testing purposes (for inspectors and IT)."""
+    """Inspector view of a template (for inspectors and IT).
+
+    With ``?inspection_id=`` the version pinned on that inspection is
+    served, so an inspector keeps seeing what they were assigned after the
+    template is edited. Otherwise published templates are served at their
+    ``current_version``. Versions are served from the view precomputed at
+    freeze time, pre-serialised per worker and keyed by version hash, with
+    an ETag. IT previews of unpublished templates are built from the live
+    document.
+    """
     user = request.current_user
     
     # Only inspectors and IT can access this endpoint
@@ -600,20 +716,45 @@ def get_template_for_inspection(template_id):
     except Exception:
         return jsonify({"success": False, "message": "Invalid template ID"}), 400
     
-    db = get_db()
-    collection = db.get_collection("templates")
-    
+    if request.args.get("inspection_id"):
+        try:
+            insp_id = ObjectId(request.args["inspection_id"])
+        except Exception:
+            return jsonify({"success": False, "message": "Invalid inspection id"}), 400
+        insp_doc = get_db().get_collection("inspections").find_one(
+            {"_id": insp_id, "template_id": tpl_id}, {"inspector_id": 1, "template_version": 1}
+        )
+        if not insp_doc:
+            return jsonify({"success": False, "message": "Inspection not found"}), 404
+        if user["role"] == "inspector" and str(insp_doc.get("inspector_id")) != str(user["user_id"]):
+            return jsonify({"success": False, "message": "Access denied"}), 403
+        entry = template_versions.get_inspector_entry(insp_doc["template_version"]) \
+            if insp_doc.get("template_version") else None
+        if entry is not None:
+            return _cached_response(entry)
+        # Inspections assigned before pinning follow the published template
+
+    current = template_versions.current_version(tpl_id)
     # Find the template - only published templates for inspectors, any for IT
-    query = {"_id": tpl_id}
-    if user["role"] == "inspector":
-        query["status"] = "published"
-    
-    doc = collection.find_one(query)
+    if not current or (user["role"] == "inspector" and current[0] != "published"):
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    status, version_hash = current
+
+    if status == "published":
+        if not version_hash:
+            # Published before versions existed: freeze it now
+            doc = get_db().get_collection("templates").find_one({"_id": tpl_id})
+            if not doc:
+                return jsonify({"success": False, "message": "Template not found"}), 404
+            version_hash = template_versions.refresh_current(doc)
+        entry = template_versions.get_inspector_entry(version_hash)
+        if entry is not None:
+            return _cached_response(entry)
+
+    doc = get_db().get_collection("templates").find_one({"_id": tpl_id})
     if not doc:
         return jsonify({"success": False, "message": "Template not found"}), 404
-    
-    template = Template.from_dict(doc)
-    return jsonify({"success": True, "data": template.public_view()})
+    return jsonify({"success": True, "data": inspector_view(tpl_id, version_content(doc), None)})
 
 
 @template_bp.route("/<template_id>", methods=["GET"])
@@ -637,14 +778,112 @@ def get_template(template_id):
     template = Template.from_dict(template_doc)
     
     # Check access permissions
-    if user["role"] == "manager" and str(template.manager_id) != str(user["user_id"]):
+    denied = _template_access_error(user, template_doc)
+    if denied:
+        return denied
+
+    return jsonify({
+        "success": True,
+        "data": template.public_view()
+    })
+
+
+def _template_access_error(user, doc):
+    """Return an error response if ``user`` may not read the template ``doc``."""
+    if user["role"] == "manager" and str(doc.get("manager_id")) != str(user["user_id"]):
         return jsonify({"success": False, "message": "Access denied"}), 403
-    elif user["role"] == "inspector" and template.status != "published":
+    elif user["role"] == "inspector" and doc.get("status") != "published":
         return jsonify({"success": False, "message": "Template not available"}), 403
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Page-level loading – lets inspectors start before large templates download
+# -----------------------------------------------------------------------------
+
+@template_bp.route("/<template_id>/pages", methods=["GET"])
+@require_auth
+def get_template_page_index(template_id):
+    """Template metadata plus a page index (id, title, question count) – no questions."""
+    user = request.current_user
+    try:
+        tpl_id = ObjectId(template_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid template id"}), 400
+
+    db = get_db()
+    docs = list(db.get_collection("templates").aggregate([
+        {"$match": {"_id": tpl_id}},
+        {"$addFields": {
+            "page_index": {
+                "$map": {
+                    "input": {"$ifNull": ["$pages", []]},
+                    "as": "p",
+                    "in": {
+                        "id": "$$p.id",
+                        "title": "$$p.title",
+                        "question_count": {"$size": {"$ifNull": ["$$p.questions", []]}},
+                    },
+                }
+            }
+        }},
+        {"$project": {"pages": 0}},
+    ]))
+    if not docs:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    doc = docs[0]
+    denied = _template_access_error(user, doc)
+    if denied:
+        return denied
+
+    page_index = doc.pop("page_index")
+    data = Template.from_dict(doc).public_view()
+    data.pop("pages", None)
+    data["page_count"] = len(page_index)
+    data["page_index"] = [{"index": i, **entry} for i, entry in enumerate(page_index)]
+    return jsonify({"success": True, "data": data})
 
+
+@template_bp.route("/<template_id>/pages/<int:page_no>", methods=["GET"])
+@require_auth
+def get_template_page(template_id, page_no):
+    """Fetch a single page (0-based index into ``pages``) via ``$slice``."""
+    user = request.current_user
+    try:
+        tpl_id = ObjectId(template_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid template id"}), 400
+
+    db = get_db()
+    docs = list(db.get_collection("templates").aggregate([
+        {"$match": {"_id": tpl_id}},
+        {"$project": {
+            "status": 1,
+            "manager_id": 1,
+            "updated_at": 1,
+            "page_count": {"$size": {"$ifNull": ["$pages", []]}},
+            "page": {"$slice": [{"$ifNull": ["$pages", []]}, page_no, 1]},
+        }},
+    ]))
+    if not docs:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    doc = docs[0]
+    denied = _template_access_error(user, doc)
+    if denied:
+        return denied
+    if not doc.get("page"):
+        return jsonify({"success": False, "message": "Page not found"}), 404
+
+    updated_at = doc.get("updated_at")
     return jsonify({
         "success": True,
-        "data": template.public_view()
+        "data": {
+            "template_id": template_id,
+            "index": page_no,
+            "page_count": doc.get("page_count", 0),
+            "updated_at": updated_at.isoformat() if updated_at else None,
+            "page": doc["page"][0],
+        },
     })
 
 
@@ -652,6 +891,16 @@ def get_template(template_id):
 # Update template content (pages/title/description/image) – manager or IT
 # -----------------------------------------------------------------------------
 
+def _refresh_published_version(doc, user):
+    """Re-freeze a published template after a content write so new assignments pin it."""
+    if not doc:
+        return
+    try:
+        template_versions.refresh_current(doc, created_by=ObjectId(user["user_id"]))
+    except Exception as e:
+        logger.error(f"Failed to store template version for {doc.get('_id')}: {e}")
+
+
 @template_bp.route("/<template_id>", methods=["PUT"])
 @require_auth
 def update_template(template_id):
@@ -679,6 +928,9 @@ def update_template(template_id):
 
     update_fields = {}
     if isinstance(payload.get("pages"), list):
+        errors = validate_pages(payload["pages"])
+        if errors:
+            return jsonify({"success": False, "message": "Validation error", "details": errors}), 400
         update_fields["pages"] = payload["pages"]
     if isinstance(payload.get("title"), str):
         update_fields["title"] = payload["title"].strip()
@@ -692,12 +944,85 @@ def update_template(template_id):
         return jsonify({"success": False, "message": "No valid fields to update"}), 400
 
     update_fields["updated_at"] = datetime.utcnow()
-    collection.update_one({"_id": tpl_id}, {"$set": update_fields})
+    collection.update_one({"_id": tpl_id}, {"$set": update_fields, "$inc": {"revision": 1}})
 
     updated_doc = collection.find_one({"_id": tpl_id})
+    _refresh_published_version(updated_doc, user)
     return jsonify({"success": True, "data": Template.from_dict(updated_doc).public_view()})
 
 
+@template_bp.route("/<template_id>", methods=["PATCH"])
+@require_auth
+def patch_template_pages(template_id):
+    """Apply an RFC 6902 JSON Patch to ``pages`` – IT or the assigned manager.
+
+    Body is either the operations array (``application/json-patch+json``,
+    with the expected revision in ``If-Match``) or
+    ``{"revision": int, "operations": [...]}``. Paths are rooted at ``/pages``.
+    Responds 409 if the template changed since ``revision`` or a ``test``
+    operation fails.
+    """
+    user = request.current_user
+    if user["role"] not in ["it", "manager"]:
+        return jsonify({"success": False, "message": "Access denied"}), 403
+    try:
+        tpl_id = ObjectId(template_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid template id"}), 400
+
+    payload = request.get_json(force=True, silent=True)
+    if isinstance(payload, list):
+        operations, revision = payload, (request.headers.get("If-Match") or "").strip('" ')
+    elif isinstance(payload, dict):
+        operations, revision = payload.get("operations"), payload.get("revision")
+    else:
+        return jsonify({"success": False, "message": "Body must be a JSON Patch document"}), 400
+    try:
+        revision = int(revision)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "revision is required"}), 400
+
+    db = get_db()
+    collection = db.get_collection("templates")
+    doc = collection.find_one({"_id": tpl_id}, {"pages": 1, "revision": 1, "manager_id": 1})
+    if not doc:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    if user["role"] == "manager" and str(doc.get("manager_id")) != str(user["user_id"]):
+        return jsonify({"success": False, "message": "Access denied"}), 403
+    current = int(doc.get("revision") or 0)
+    if current != revision:
+        return jsonify({"success": False, "message": "Template was modified", "revision": current}), 409
+
+    try:
+        new_pages, update = build_pages_update(doc.get("pages") or [], operations)
+    except PatchTestFailed as e:
+        return jsonify({"success": False, "message": str(e), "revision": current}), 409
+    except PatchError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    errors = validate_pages(new_pages) if update else []
+    if errors:
+        return jsonify({"success": False, "message": "Validation error", "details": errors}), 400
+    if update is None:
+        return jsonify({"success": True, "data": {"id": template_id, "revision": current}})
+
+    now = datetime.utcnow()
+    update.setdefault("$set", {})["updated_at"] = now
+    update["$inc"] = {"revision": 1}
+    # Missing revision on legacy documents counts as 0
+    result = collection.update_one({"_id": tpl_id, "revision": revision if revision else {"$in": [0, None]}}, update)
+    if result.matched_count == 0:
+        latest = collection.find_one({"_id": tpl_id}, {"revision": 1}) or {}
+        return jsonify({
+            "success": False, "message": "Template was modified", "revision": int(latest.get("revision") or 0),
+        }), 409
+    _refresh_published_version(collection.find_one({"_id": tpl_id}), user)
+
+    return jsonify({
+        "success": True,
+        "data": {"id": template_id, "revision": revision + 1, "updated_at": now.isoformat()},
+    })
+
+
 # -----------------------------------------------------------------------------
 # Manager – publish a template
 # -----------------------------------------------------------------------------
@@ -739,6 +1064,15 @@ def publish_template(template_id):
             # ignore calc errors; publish anyway
             pass
 
+    # Freeze the published content as an immutable version for inspections to pin
+    try:
+        update_fields["current_version"] = template_versions.ensure(
+            {**doc, **update_fields}, created_by=ObjectId(user["user_id"])
+        )
+    except Exception as e:
+        logger.error(f"Failed to store template version for {template_id}: {e}")
+
     collection.update_one({"_id": tpl_id}, {"$set": update_fields})
+    template_versions.forget(tpl_id)
     updated = collection.find_one({"_id": tpl_id})
     return jsonify({"success": True, "data": Template.from_dict(updated).public_view()})
\ No newline at end of file
@@ -1,14 +1,36 @@
 from flask import Blueprint, request, jsonify
-from bson import ObjectId, regex
+from bson import ObjectId
+from ..utils.audit_storage import DEFAULT_PAGE_SIZE as AUDIT_PAGE_SIZE, query_audit
 from ..utils.auth import require_auth
 from ..utils.database import get_db
+from ..utils.password_pool import PasswordPoolSaturated
+from ..utils.user_import import HTTP_MAX_ROWS, import_users
+from ..utils.user_search import search_users
+from ..utils.user_profiles import user_profiles
 
 users_bp = Blueprint("users", __name__, url_prefix="/api/users")
 
+
+def _caller_organization(user_id):
+    return (user_profiles.get(user_id) or {}).get("organization")
+
+
+def _picker_view(doc):
+    return {
+        "id": str(doc["_id"]),
+        "firstName": doc.get("firstName"),
+        "lastName": doc.get("lastName"),
+        "fullName": f"{doc.get('firstName','')} {doc.get('lastName','')}",
+        "email": doc.get("email"),
+        "organization": doc.get("organization"),
+        "location": doc.get("location"),
+    }
+
+
 @users_bp.route("/managers", methods=["GET"])
 @require_auth
 def list_managers():
-    """Return list of manager users. Accepts ?q= search string."""
+    """Return manager users in the caller's organization. Accepts ?q= search string."""
     current_user = request.current_user
     if current_user.get("role") != "it":
         return jsonify({"success": False, "message": "Only IT role can list managers"}), 403
@@ -17,28 +39,9 @@ def list_managers():
     db = get_db()
     coll = db.get_collection("users")
 
-    query = {"role": "manager"}
-    if q:
-        regex_q = {"$regex": q, "$options": "i"}
-        # match on firstName, lastName, or email
-        query["$or"] = [
-            {"firstName": regex_q},
-            {"lastName": regex_q},
-            {"email": regex_q},
-        ]
-
-    cursor = coll.find(query).limit(20)
-    managers = []
-    for doc in cursor:
-        managers.append({
-            "id": str(doc["_id"]),
-            "firstName": doc.get("firstName"),
-            "lastName": doc.get("lastName"),
-            "fullName": f"{doc.get('firstName','')} {doc.get('lastName','')}",
-            "email": doc.get("email"),
-            "organization": doc.get("organization"),
-            "location": doc.get("location"),
-        })
+    # Prefix search over indexed name/email tokens, exact and prefix hits first
+    organization = _caller_organization(current_user["user_id"])
+    managers = [_picker_view(doc) for doc in search_users(coll, "manager", organization, q)]
 
     return jsonify({"success": True, "data": managers})
 
@@ -48,7 +51,7 @@ def list_managers():
 @users_bp.route("/inspectors", methods=["GET"])
 @require_auth
 def list_inspectors():
-    """Return list of inspector users (for manager assignment). Accepts ?q= search string."""
+    """Return inspector users in the caller's organization (for manager assignment). Accepts ?q= search string."""
     current_user = request.current_user
     if current_user.get("role") != "manager":
         return jsonify({"success": False, "message": "Only manager role can list inspectors"}), 403
@@ -57,25 +60,96 @@ def list_inspectors():
     db = get_db()
     coll = db.get_collection("users")
 
-    query = {"role": "inspector"}
-    if q:
-        regex_q = {"$regex": q, "$options": "i"}
-        query["$or"] = [
-            {"firstName": regex_q},
-            {"lastName": regex_q},
-            {"email": regex_q},
-        ]
-
-    cursor = coll.find(query).limit(20)
-    inspectors = []
-    for doc in cursor:
-        inspectors.append({
-            "id": str(doc["_id"]),
-            "firstName": doc.get("firstName"),
-            "lastName": doc.get("lastName"),
-            "fullName": f"{doc.get('firstName','')} {doc.get('lastName','')}",
-            "email": doc.get("email"),
-            "organization": doc.get("organization"),
-            "location": doc.get("location"),
+    organization = _caller_organization(current_user["user_id"])
+    inspectors = [_picker_view(doc) for doc in search_users(coll, "inspector", organization, q)]
+    return jsonify({"success": True, "data": inspectors})
+
+
+# -----------------------------------------------------------------------------
+# Bulk provisioning (IT)
+# -----------------------------------------------------------------------------
+@users_bp.route("/import", methods=["POST"])
+@require_auth
+def import_users_from_csv():
+    """Create many inspector/manager accounts from an uploaded CSV (IT only).
+
+    Multipart form: file (required), dry_run ("true" to validate only).
+    Users are created in the caller's organization. At most
+    ``HTTP_MAX_ROWS`` rows are imported; use the CLI for larger files.
+    """
+    current_user = request.current_user
+    if current_user.get("role") != "it":
+        return jsonify({"success": False, "message": "Only IT role can import users"}), 403
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"success": False, "message": "file is required"}), 400
+
+    db = get_db()
+    organization = _caller_organization(current_user["user_id"])
+    try:
+        result = import_users(
+            db, upload.stream, organization=organization,
+            dry_run=(request.form.get("dry_run") or "").lower() == "true",
+            max_rows=HTTP_MAX_ROWS,
+        )
+    except (UnicodeDecodeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Could not read CSV: {e}"}), 400
+    except PasswordPoolSaturated:
+        # Nothing was written; the whole file can be retried
+        response = jsonify({
+            "success": False, "message": "Server is busy hashing passwords, please retry shortly",
+            "error": "SERVER_BUSY",
         })
-    return jsonify({"success": True, "data": inspectors})
\ No newline at end of file
+        response.headers["Retry-After"] = "5"
+        return response, 503
+
+    return jsonify({"success": bool(result["created"]) or not result["errors"], "data": result})
+
+
+# -----------------------------------------------------------------------------
+# Audit trail (IT)
+# -----------------------------------------------------------------------------
+AUDIT_SOURCES = {"events": "user_logs", "inspections": "inspection_audits"}
+
+
+@users_bp.route("/<user_id>/audit", methods=["GET"])
+@require_auth
+def get_user_audit(user_id):
+    """Audit entries for a user in the caller's organization, newest first (IT only).
+
+    Query params: source ("events" for account/login events, default, or
+    "inspections" for inspection actions), limit (max 200), cursor.
+    """
+    current_user = request.current_user
+    if current_user.get("role") != "it":
+        return jsonify({"success": False, "message": "Only IT role can read audit logs"}), 403
+
+    source = AUDIT_SOURCES.get(request.args.get("source", "events"))
+    if not source:
+        return jsonify({"success": False, "message": "source must be events or inspections"}), 400
+    try:
+        target_id = ObjectId(user_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid user id"}), 400
+
+    db = get_db()
+    coll = db.get_collection("users")
+    target = coll.find_one({"_id": target_id}, {"organization": 1})
+    if not target or target.get("organization") != _caller_organization(current_user["user_id"]):
+        return jsonify({"success": False, "message": "User not found"}), 404
+
+    try:
+        entries, next_cursor = query_audit(
+            db.get_collection(source), {"user_id": target_id},
+            limit=request.args.get("limit", AUDIT_PAGE_SIZE, type=int),
+            cursor=request.args.get("cursor"),
+        )
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+    return jsonify({
+        "success": True,
+        "data": entries,
+        "pagination": {"next_cursor": next_cursor, "has_more": next_cursor is not None},
+    })
@@ -11,12 +11,16 @@ This module provides two simple helpers used by the rest of the app:
   configuration. The current implementation returns a conservative summary and
   pass/fail decision using counts supplied; it is deliberately minimal to avoid
   breaking existing routes when detailed logic is not yet required.
+
+- DefectTally / SequentialVerdict: running per-severity defect counts that can
+  be updated one answer at a time, plus an early verdict that is returned as
+  soon as the outcome can no longer change (e.g. the reject number is hit).
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 
 def _safe_int(value: Any, default: int = 0) -> int:
@@ -27,6 +31,38 @@ def _safe_int(value: Any, default: int = 0) -> int:
         return default
 
 
+SEVERITIES = ("critical", "major", "minor")
+
+# Explicit per-severity totals; when truthy they replace the per-question sum
+TOTAL_KEYS = {f"{sev}_defects": sev for sev in SEVERITIES}
+
+# Per-question numeric answers carry their severity in the key suffix, e.g.
+# "q17__major_text" -> "major".
+_SUFFIX_TO_SEVERITY = {
+    "__critical_text": "critical",
+    "__major_text": "major",
+    "__minor_text": "minor",
+}
+
+
+def _count_value(value: Any) -> int:
+    """Parse a per-question defect count the same way submit always has."""
+    try:
+        return int(str(value))
+    except Exception:
+        return 0
+
+
+def severity_for_key(key: Any) -> Optional[str]:
+    """Return the severity a response key contributes to, or None."""
+    if not isinstance(key, str):
+        return None
+    for suffix, severity in _SUFFIX_TO_SEVERITY.items():
+        if key.endswith(suffix):
+            return severity
+    return None
+
+
 class AQLCalculator:
     """Lightweight calculator for sampling criteria.
 
@@ -50,13 +86,36 @@ class AQLCalculator:
                 return sample
         return 1250
 
+    # Preferred AQL series; tightened inspection uses the next stricter value.
+    PREFERRED_AQLS = [0.065, 0.1, 0.15, 0.25, 0.4, 0.65, 1.0, 1.5, 2.5, 4.0, 6.5, 10.0, 15.0]
+
+    # Reduced inspection draws roughly 2/5 of the normal sample.
+    REDUCED_SAMPLE_RATIO = 0.4
+
+    @classmethod
+    def _tightened_aql(cls, aql: float) -> float:
+        stricter = [level for level in cls.PREFERRED_AQLS if level < aql]
+        return stricter[-1] if stricter else cls.PREFERRED_AQLS[0]
+
     @classmethod
-    def calculate_aql_criteria(cls, lot_size: int, aql_level: float = 2.5) -> Dict[str, int]:
+    def calculate_aql_criteria(
+        cls, lot_size: int, aql_level: float = 2.5, severity: str = "normal"
+    ) -> Dict[str, Any]:
+        """Return the sampling plan for a lot.
+
+        ``severity`` is the switching-rule state of the supplier/template
+        ("normal", "tightened", "reduced" or "discontinued"); see
+        ``utils.switching``. A discontinued key keeps the tightened plan.
+        """
         sample_size = cls._estimate_sample_size(lot_size)
 
         # Derive allowed defects from AQL percentage. The constants provide a
         # reasonable spread for major/minor bands while keeping critical at 0.
         aql = float(aql_level or 2.5)
+        if severity in ("tightened", "discontinued"):
+            aql = cls._tightened_aql(aql)
+        elif severity == "reduced":
+            sample_size = max(2, int(round(sample_size * cls.REDUCED_SAMPLE_RATIO)))
         major_allowed = max(0, int(round(sample_size * (aql / 100.0))))
         minor_allowed = max(0, int(round(sample_size * ((aql * 1.6) / 100.0))))
         critical_allowed = 0
@@ -66,9 +125,24 @@ class AQLCalculator:
             "major_defects_allowed": major_allowed,
             "minor_defects_allowed": minor_allowed,
             "critical_defects_allowed": critical_allowed,
+            "severity": severity,
         }
 
 
+def aql_config_for_template(template: Any) -> Optional[Dict[str, Any]]:
+    """AQL acceptance criteria of a Template, or None when AQL is not configured."""
+    if not (template.lot_size and template.aql_level):
+        return None
+    return {
+        "aql_level": template.aql_level,
+        "lot_size": template.lot_size,
+        "sample_size": template.sample_size,
+        "major_defects_allowed": template.major_defects_allowed,
+        "minor_defects_allowed": template.minor_defects_allowed,
+        "critical_defects_allowed": template.critical_defects_allowed
+    }
+
+
 class AQLResultProcessor:
     """Minimal processor for inspection results against AQL config.
 
@@ -119,3 +193,134 @@ class AQLResultProcessor:
         }
 
 
+def compile_evaluator(aql_config: Dict[str, Any], defect_categories: Dict[str, Any] | None = None):
+    """Bind a template's AQL criteria once and return ``evaluate(responses, tally=None)``.
+
+    ``evaluate`` judges the responses with missing ``<severity>_defects``
+    totals filled from the per-question counts and returns the
+    ``AQLResultProcessor`` result. The filled totals are derived, so
+    ``responses`` itself is left as the client sent it; a stored total always
+    means the inspector entered it. Pass a precomputed ``tally`` to skip the
+    scan over the answers.
+    """
+    config = dict(aql_config)
+
+    def evaluate(responses: Dict[str, Any], tally: "DefectTally" | None = None) -> Dict[str, Any]:
+        if tally is None:
+            tally = DefectTally.from_responses(responses)
+        filled = dict(responses)
+        for sev, count in tally.as_dict().items():
+            if not filled.get(f"{sev}_defects"):
+                filled[f"{sev}_defects"] = count
+        return AQLResultProcessor.process_inspection_results(filled, config, defect_categories)
+
+    return evaluate
+
+
+@dataclass
+class DefectTally:
+    """Running defect counts per severity.
+
+    ``from_responses`` is the only full scan of a responses dict; afterwards
+    the tally is kept current with ``delta`` which costs O(1) per changed key.
+    """
+
+    critical: int = 0
+    major: int = 0
+    minor: int = 0
+
+    @classmethod
+    def from_responses(cls, responses: Dict[str, Any] | None) -> "DefectTally":
+        tally = cls()
+        for key, value in (responses or {}).items():
+            severity = severity_for_key(key)
+            if severity:
+                setattr(tally, severity, getattr(tally, severity) + _count_value(value))
+        return tally
+
+    @classmethod
+    def submitted(cls, responses: Dict[str, Any] | None) -> "DefectTally":
+        """Counts as submit judges them: an explicit ``<severity>_defects``
+        total overrides the per-question sum for that severity."""
+        tally = cls.from_responses(responses)
+        for key, severity in TOTAL_KEYS.items():
+            if (responses or {}).get(key):
+                setattr(tally, severity, _count_value(responses[key]))
+        return tally
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any] | None) -> "DefectTally":
+        data = data or {}
+        return cls(**{sev: _count_value(data.get(sev, 0)) for sev in SEVERITIES})
+
+    @staticmethod
+    def delta(key: Any, old_value: Any, new_value: Any) -> Optional[Tuple[str, int]]:
+        """Return ``(severity, diff)`` for replacing ``old_value`` by ``new_value``.
+
+        Keys that do not carry a severity suffix return None.
+        """
+        severity = severity_for_key(key)
+        if not severity:
+            return None
+        old = _count_value(old_value) if old_value is not None else 0
+        new = _count_value(new_value) if new_value is not None else 0
+        return severity, new - old
+
+    def apply(self, key: Any, old_value: Any, new_value: Any) -> None:
+        change = self.delta(key, old_value, new_value)
+        if change:
+            severity, diff = change
+            setattr(self, severity, getattr(self, severity) + diff)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"critical": self.critical, "major": self.major, "minor": self.minor}
+
+
+class SequentialVerdict:
+    """Decide a lot as early as the running tally allows.
+
+    A lot is rejected the moment any severity exceeds its acceptance number,
+    because later samples can only add defects. Acceptance can only be decided
+    once the full sample has been inspected.
+    """
+
+    PENDING = "PENDING"
+    ACCEPT = "ACCEPT"
+    REJECT = "REJECT"
+
+    @classmethod
+    def evaluate(
+        cls,
+        tally: DefectTally,
+        aql_config: Dict[str, Any],
+        units_inspected: int = 0,
+    ) -> Dict[str, Any]:
+        counts = tally.as_dict()
+        allowed = {
+            sev: _safe_int(aql_config.get(f"{sev}_defects_allowed"), 0)
+            for sev in SEVERITIES
+        }
+        rejection_reasons = [
+            f"{sev.upper()}_EXCEEDED" for sev in SEVERITIES if counts[sev] > allowed[sev]
+        ]
+        sample_size = _safe_int(aql_config.get("sample_size"), 0)
+        units = _safe_int(units_inspected, 0)
+
+        if rejection_reasons:
+            verdict = cls.REJECT
+        elif sample_size and units >= sample_size:
+            verdict = cls.ACCEPT
+        else:
+            verdict = cls.PENDING
+
+        return {
+            "verdict": verdict,
+            "decided": verdict != cls.PENDING,
+            "defect_counts": counts,
+            "allowed": allowed,
+            # Further defects of each severity that would reject the lot
+            "defects_until_reject": {sev: max(0, allowed[sev] - counts[sev] + 1) for sev in SEVERITIES},
+            "rejection_reasons": rejection_reasons,
+            "units_inspected": units,
+            "sample_size": sample_size,
+        }
@@ -1,9 +1,206 @@
+"""Audit logging for users (``user_logs``) and inspections (``inspection_audits``).
+
+Entries are not written inside the request. ``log_user_event`` and
+``log_inspection_audit`` stamp the entry and put it on a bounded in-process
+queue; a background thread writes the queue with ``insert_many`` (w=1) once
+``AUDIT_BATCH_SIZE`` entries are waiting or ``AUDIT_FLUSH_INTERVAL`` seconds
+have passed, and drains it at interpreter exit. When the queue is full the
+new entry is dropped and counted rather than blocking the request; see
+``audit_buffer.metrics()``. Written batches are also handed to the
+``AUDIT_ARCHIVE_HOOK``, if configured (see ``audit_storage``).
+
+Bulk jobs that log one entry per created record (``log_user_events``) write
+through ``audit_buffer.write`` instead, so a large import cannot overflow the
+queue; those writes go through the same counters and archive hook.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+from ..config import Config
+from .audit_storage import archive_hook
 from .database import get_db
 
+logger = logging.getLogger(__name__)
+
+
+def _db_collection(name):
+    return get_db().get_collection(name)
+
+
+class AuditBuffer:
+    """Bounded queue of ``(collection, document)`` pairs with a batching writer."""
+
+    def __init__(self, get_collection=_db_collection, max_size=None, batch_size=None, flush_interval=None):
+        self._get_collection = get_collection
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0, "archive_errors": 0}
+        self._archive = archive_hook()
+
+    @property
+    def max_size(self):
+        return self._max_size or Config.AUDIT_QUEUE_SIZE
+
+    @property
+    def batch_size(self):
+        return self._batch_size or Config.AUDIT_BATCH_SIZE
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval or Config.AUDIT_FLUSH_INTERVAL
+
+    def _ensure_started(self):
+        # The writer thread does not survive a fork; each worker starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def add(self, collection, doc):
+        """Queue ``doc`` for ``collection``; returns False if it was dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((collection, doc))
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+                dropped = self._stats["dropped"]
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Audit queue full, {dropped} entries dropped so far")
+            return False
+        with self._lock:
+            self._stats["enqueued"] += 1
+        return True
+
+    def write(self, collection, docs):
+        """Write ``docs`` to ``collection`` now, in ``batch_size`` chunks, bypassing the queue."""
+        docs = list(docs)
+        with self._lock:
+            self._stats["enqueued"] += len(docs)
+        for start in range(0, len(docs), self.batch_size):
+            self._write([(collection, doc) for doc in docs[start:start + self.batch_size]])
+
+    def _take_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        by_collection = {}
+        for collection, doc in batch:
+            by_collection.setdefault(collection, []).append(doc)
+        for collection, docs in by_collection.items():
+            try:
+                coll = self._get_collection(collection).with_options(write_concern=WriteConcern(w=1))
+                coll.insert_many(docs, ordered=False)
+                written = len(docs)
+                if self._archive is not None:
+                    self._archive_batch(collection, docs)
+            except BulkWriteError as e:
+                written = e.details.get("nInserted", 0)
+                logger.error(f"Audit write to {collection}: {len(docs) - written} of {len(docs)} entries failed")
+            except Exception as e:
+                written = 0
+                logger.error(f"Audit write to {collection} failed ({len(docs)} entries): {e}")
+            with self._lock:
+                self._stats["written"] += written
+                self._stats["failed"] += len(docs) - written
+                self._stats["batches"] += 1
+
+    def _archive_batch(self, collection, docs):
+        try:
+            self._archive(collection, docs)
+        except Exception as e:
+            logger.error(f"Audit archive hook failed for {len(docs)} {collection} entries: {e}")
+            with self._lock:
+                self._stats["archive_errors"] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                self._write(batch)
+        self._drain()
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        """Stop the writer after flushing everything queued (called at exit)."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def metrics(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "pending": self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+                "max_size": self.max_size,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+            }
+
+
+audit_buffer = AuditBuffer()
+atexit.register(audit_buffer.close)
+
+
+def _object_id(value):
+    if isinstance(value, str):
+        try:
+            return ObjectId(value)
+        except Exception:
+            # leave as string if it cannot be parsed
+            pass
+    return value
+
+
 def log_user_event(user_id: ObjectId | str, email: str, first_name: str | None, last_name: str | None, event: str):
-    """Persist a simple user-centric audit log entry to MongoDB.
+    """Queue a simple user-centric audit log entry for ``user_logs``.
 
     Parameters
     ----------
@@ -17,23 +214,27 @@ def log_user_event(user_id: ObjectId | str, email: str, first_name: str | None,
     event : str
         Short event label, e.g. "ACCOUNT_CREATED", "LOGIN_SUCCESS".
     """
-    if isinstance(user_id, str):
-        try:
-            user_id = ObjectId(user_id)
-        except Exception:
-            # leave as string if it cannot be parsed
-            pass
+    audit_buffer.add("user_logs", _user_event(user_id, email, first_name, last_name, event, datetime.utcnow()))
+
+
+def log_user_events(users, event: str):
+    """Write one ``user_logs`` entry per user document (``_id``, ``email``,
+    ``firstName``, ``lastName``) synchronously, for bulk imports."""
+    now = datetime.utcnow()
+    audit_buffer.write("user_logs", [
+        _user_event(u["_id"], u.get("email"), u.get("firstName"), u.get("lastName"), event, now) for u in users
+    ])
 
-    db = get_db()
-    logs = db.get_collection("user_logs")
-    logs.insert_one({
-        "user_id": user_id,
+
+def _user_event(user_id, email, first_name, last_name, event, timestamp):
+    return {
+        "user_id": _object_id(user_id),
         "email": email,
         "first_name": first_name,
         "last_name": last_name,
         "event": event,
-        "timestamp": datetime.utcnow(),
-    }) 
+        "timestamp": timestamp,
+    }
 
 
 def log_inspection_audit(
@@ -42,29 +243,14 @@ def log_inspection_audit(
     action: str,
     details: dict | None = None,
 ):
-    """Persist an inspection-specific audit log entry.
+    """Queue an inspection-specific audit log entry for ``inspection_audits``.
 
     action examples: SUBMIT, EDIT, PHOTO_UPLOAD, DEFECT_ADD, DEFECT_EDIT, DEFECT_DELETE, OVERRIDE_DECISION
     """
-    try:
-        if isinstance(inspection_id, str):
-            inspection_id = ObjectId(inspection_id)
-    except Exception:
-        # keep as string if cannot be parsed
-        pass
-
-    try:
-        if isinstance(user_id, str):
-            user_id = ObjectId(user_id)
-    except Exception:
-        pass
-
-    db = get_db()
-    logs = db.get_collection("inspection_audits")
-    logs.insert_one({
-        "inspection_id": inspection_id,
-        "user_id": user_id,
+    audit_buffer.add("inspection_audits", {
+        "inspection_id": _object_id(inspection_id),
+        "user_id": _object_id(user_id),
         "action": action,
         "details": details or {},
         "timestamp": datetime.utcnow(),
-    })
\ No newline at end of file
+    })
@@ -0,0 +1,144 @@
+"""Storage layout, retention and keyset queries for the audit collections.
+
+``ensure_audit_storage`` runs with the other index builds. It creates
+``user_logs`` and ``inspection_audits`` as time-series collections when
+``AUDIT_TIMESERIES`` is set and the collection does not exist yet. It adds
+the ``(<owner>, timestamp, _id)`` indexes that history queries use and
+applies ``AUDIT_RETENTION_DAYS``. Regular collections get retention from a
+TTL index. Time-series collections get it from ``expireAfterSeconds``. A
+value of 0 keeps entries forever.
+
+``AUDIT_ARCHIVE_HOOK`` (``"package.module:function"``) is called as
+``hook(collection, docs)`` with each batch after it is written. That gives
+cold storage a copy before retention removes the entries from MongoDB.
+
+``query_audit`` pages newest-first on ``(timestamp, _id)`` with an opaque
+cursor, so deep pages cost the same as the first one.
+"""
+
+from __future__ import annotations
+
+import base64
+import importlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+# Collection -> fields that identify whose history an entry belongs to
+AUDIT_COLLECTIONS = {
+    "user_logs": ("user_id",),
+    "inspection_audits": ("inspection_id", "user_id"),
+}
+TTL_INDEX_NAME = "timestamp_ttl"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _is_timeseries(db, name: str) -> Optional[bool]:
+    """True/False for an existing collection, None if it does not exist."""
+    for info in db.list_collections(filter={"name": name}):
+        return info.get("type") == "timeseries"
+    return None
+
+
+def _apply_retention(db, name: str, timeseries: bool, seconds: int) -> None:
+    if timeseries:
+        db.command("collMod", name, expireAfterSeconds=seconds or "off")
+        return
+    coll = db[name]
+    existing = coll.index_information().get(TTL_INDEX_NAME)
+    if not seconds:
+        if existing:
+            coll.drop_index(TTL_INDEX_NAME)
+    elif existing is None:
+        coll.create_index("timestamp", name=TTL_INDEX_NAME, expireAfterSeconds=seconds)
+    elif existing.get("expireAfterSeconds") != seconds:
+        db.command("collMod", name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds})
+
+
+def ensure_audit_storage(db) -> None:
+    retention = Config.AUDIT_RETENTION_DAYS * 86400
+    for name, owners in AUDIT_COLLECTIONS.items():
+        timeseries = _is_timeseries(db, name)
+        if timeseries is None and Config.AUDIT_TIMESERIES:
+            options: Dict[str, Any] = {"timeseries": {"timeField": "timestamp", "granularity": "seconds"}}
+            if retention:
+                options["expireAfterSeconds"] = retention
+            db.create_collection(name, **options)
+            timeseries = True
+        elif timeseries and not Config.AUDIT_TIMESERIES:
+            logger.warning(f"{name} is a time-series collection; AUDIT_TIMESERIES only applies to new collections")
+
+        for owner in owners:
+            db[name].create_index([(owner, 1), ("timestamp", -1), ("_id", -1)])
+        _apply_retention(db, name, bool(timeseries), retention)
+
+
+def archive_hook() -> Optional[Callable[[str, List[Dict[str, Any]]], None]]:
+    """Resolve ``AUDIT_ARCHIVE_HOOK``; None when unset or unloadable."""
+    target = Config.AUDIT_ARCHIVE_HOOK
+    if not target:
+        return None
+    module_name, _, attr = target.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError, ValueError) as e:
+        logger.error(f"Cannot load AUDIT_ARCHIVE_HOOK {target!r}: {e}")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Keyset pagination
+# ---------------------------------------------------------------------------
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    ms = (doc["timestamp"] - _EPOCH) // timedelta(milliseconds=1)
+    raw = json.dumps([ms, str(doc["_id"])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Raise ValueError for a cursor not produced by ``encode_cursor``."""
+    try:
+        ms, oid = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return _EPOCH + timedelta(milliseconds=int(ms)), ObjectId(oid)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def _public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    view = _jsonable(doc)
+    view["id"] = view.pop("_id")
+    return view
+
+
+def query_audit(coll, query: Dict[str, Any], limit: int = DEFAULT_PAGE_SIZE,
+                cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of entries matching ``query``, newest first, and the next cursor."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        ts, oid = decode_cursor(cursor)
+        query = {**query, "$or": [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": oid}}]}
+    docs = list(coll.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return [_public(doc) for doc in docs[:limit]], next_cursor
@@ -1,25 +1,35 @@
 import jwt
 import logging
+import secrets
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app
 from bson import ObjectId
 
+from .token_revocation import token_revocation
+
 logger = logging.getLogger(__name__)
 
 class AuthUtils:
     """JWT Authentication utilities"""
     
     @staticmethod
-    def generate_tokens(user_id, email, role):
-        """Generate access and refresh tokens"""
+    def generate_tokens(user_id, email, role, sid=None):
+        """Generate access and refresh tokens
+
+        Both tokens carry the session id ``sid`` (new unless given, e.g. on
+        refresh) so that logout can revoke the whole session.
+        """
         try:
+            sid = sid or secrets.token_urlsafe(16)
+            
             # Access token payload
             access_payload = {
                 'user_id': str(user_id),
                 'email': email,
                 'role': role,
                 'type': 'access',
+                'sid': sid,
                 'exp': datetime.utcnow() + current_app.config['JWT_ACCESS_TOKEN_EXPIRES'],
                 'iat': datetime.utcnow()
             }
@@ -29,6 +39,7 @@ class AuthUtils:
                 'user_id': str(user_id),
                 'email': email,
                 'type': 'refresh',
+                'sid': sid,
                 'exp': datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES'],
                 'iat': datetime.utcnow()
             }
@@ -76,6 +87,10 @@ class AuthUtils:
             if datetime.utcnow() > datetime.fromtimestamp(payload['exp']):
                 raise jwt.ExpiredSignatureError("Token has expired")
             
+            # Logged out / revoked (in-memory lookup, no database round trip)
+            if token_revocation.is_revoked(payload):
+                raise jwt.InvalidTokenError("Token has been revoked")
+            
             return payload
             
         except jwt.ExpiredSignatureError:
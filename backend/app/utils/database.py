@@ -1,85 +1,129 @@
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import logging
+import threading
+import time
 from flask import current_app  # noqa: F401 (imported for potential future use)
 import certifi
+
+from .audit_storage import ensure_audit_storage
+from .user_search import backfill_search_tokens
 import os
 
 logger = logging.getLogger(__name__)
 
 class Database:
-    """MongoDB database connection manager"""
+    """MongoDB database connection manager
+
+    ``configure`` only records settings. The ``MongoClient`` is created on
+    first use, once per process. Under a pre-fork server (gunicorn
+    ``--preload``) no client exists before the fork, and each worker opens
+    its own. Index management is not part of boot: run
+    ``python manage_indexes.py`` on deploy, or set ``ENSURE_INDEXES_ON_START``
+    (on by default for the development server).
+    """
     
     def __init__(self):
-        self.client = None
-        self.db = None
+        self._settings = None
+        self._client = None
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
     
-    def connect(self, app):
-        """Connect to MongoDB"""
-        try:
-            # Get MongoDB URI from config
-            mongo_uri = app.config.get('MONGODB_URI')
-            db_name = app.config.get('MONGODB_DB', 'streamlineer')
-            
-            if not mongo_uri:
-                raise ValueError("MONGODB_URI not configured")
-            
-            # Optional insecure TLS for development/troubleshooting (DO NOT USE IN PROD)
-            allow_insecure_tls = os.environ.get('ALLOW_INSECURE_TLS', '').lower() == 'true'
-
-            # Create MongoDB client with improved connection settings for Atlas
-            self.client = MongoClient(
-                mongo_uri,
-                maxPoolSize=50,  # Maximum number of connections in the pool
-                minPoolSize=5,   # Minimum number of connections in the pool
-                maxIdleTimeMS=30000,  # Close connections after 30 seconds of inactivity
-                serverSelectionTimeoutMS=10000,  # 10 second timeout for server selection
-                connectTimeoutMS=60000,  # 20 second timeout for connection
-                socketTimeoutMS=60000,  # 10 second timeout for socket operations
-                retryWrites=True,  # Retry write operations
-                retryReads=True,   # Retry read operations
-                # SSL/TLS configuration for Atlas
-                tls=True,
-                tlsAllowInvalidCertificates=allow_insecure_tls,
-                tlsAllowInvalidHostnames=allow_insecure_tls,
-                tlsCAFile=certifi.where(),
-                # Heartbeat settings
-                heartbeatFrequencyMS=10000,
-            )
-            
-            # Test the connection with retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    self.client.admin.command('ping')
-                    logger.info("Successfully connected to MongoDB")
-                    print("✅ MongoDB connected")
-                    break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        raise e
-                    logger.warning(f"MongoDB connection attempt {attempt + 1} failed, retrying...")
-                    import time
-                    time.sleep(2 ** attempt)  # Exponential backoff
-            
-            # Get database
-            self.db = self.client[db_name]
-            
-            # Create indexes for better performance
-            self._create_indexes()
-            
-            return True
-            
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            logger.error(f"Failed to connect to MongoDB: {e}")
-            print("❌ MongoDB connection failed – check URI / network")
-            print("💡 If you're behind a corporate proxy/SSL interception, try setting ALLOW_INSECURE_TLS=true for local dev only.")
-            print("💡 Ensure your current IP is whitelisted in MongoDB Atlas Network Access.")
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error connecting to MongoDB: {e}")
-            print(f"❌ MongoDB error: {e}")
-            return False
+    def configure(self, config):
+        """Record connection settings from a Flask config mapping"""
+        mongo_uri = config.get('MONGODB_URI')
+        if not mongo_uri:
+            raise ValueError("MONGODB_URI not configured")
+        max_pool = config.get('MONGODB_MAX_POOL_SIZE') or 50
+        self._settings = {
+            'uri': mongo_uri,
+            'db_name': config.get('MONGODB_DB', 'streamlineer'),
+            'max_pool_size': max_pool,
+            'min_pool_size': min(config.get('MONGODB_MIN_POOL_SIZE', 0), max_pool),
+        }
+        # Drop a client made with older settings; the next access reconnects
+        self._client = self._db = None
+        self._pid = None
+    
+    def _connect(self):
+        settings = self._settings
+        if settings is None:
+            raise Exception("Database not configured")
+        
+        # Optional insecure TLS for development/troubleshooting (DO NOT USE IN PROD)
+        allow_insecure_tls = os.environ.get('ALLOW_INSECURE_TLS', '').lower() == 'true'
+
+        # Create MongoDB client with improved connection settings for Atlas
+        client = MongoClient(
+            settings['uri'],
+            maxPoolSize=settings['max_pool_size'],  # per process: worker threads + background threads
+            minPoolSize=settings['min_pool_size'],
+            maxIdleTimeMS=30000,  # Close connections after 30 seconds of inactivity
+            serverSelectionTimeoutMS=10000,  # 10 second timeout for server selection
+            connectTimeoutMS=60000,  # 20 second timeout for connection
+            socketTimeoutMS=60000,  # 10 second timeout for socket operations
+            retryWrites=True,  # Retry write operations
+            retryReads=True,   # Retry read operations
+            # SSL/TLS configuration for Atlas
+            tls=True,
+            tlsAllowInvalidCertificates=allow_insecure_tls,
+            tlsAllowInvalidHostnames=allow_insecure_tls,
+            tlsCAFile=certifi.where(),
+            # Heartbeat settings
+            heartbeatFrequencyMS=10000,
+            # Don't connect until the first operation
+            connect=False,
+        )
+        logger.info(f"MongoDB client created in pid {os.getpid()} (maxPoolSize={settings['max_pool_size']})")
+        return client, client[settings['db_name']]
+    
+    def _ensure_client(self):
+        # A client inherited across fork() is unsafe to use; the child opens
+        # its own and leaves the parent's alone (closing it here could
+        # disturb sockets the parent still owns)
+        if self._client is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client, self._db = self._connect()
+                self._pid = os.getpid()
+    
+    @property
+    def client(self):
+        self._ensure_client()
+        return self._client
+    
+    @property
+    def db(self):
+        self._ensure_client()
+        return self._db
+    
+    def ping(self, retries=3):
+        """Check connectivity, retrying with exponential backoff"""
+        for attempt in range(retries):
+            try:
+                self.client.admin.command('ping')
+                logger.info("Successfully connected to MongoDB")
+                return True
+            except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+                if attempt == retries - 1:
+                    logger.error(f"Failed to connect to MongoDB: {e}")
+                    print("❌ MongoDB connection failed – check URI / network")
+                    print("💡 If you're behind a corporate proxy/SSL interception, try setting ALLOW_INSECURE_TLS=true for local dev only.")
+                    print("💡 Ensure your current IP is whitelisted in MongoDB Atlas Network Access.")
+                    return False
+                logger.warning(f"MongoDB connection attempt {attempt + 1} failed, retrying...")
+                time.sleep(2 ** attempt)  # Exponential backoff
+        return False
+    
+    def ensure_indexes(self, backfill=True):
+        """Create all indexes (idempotent) and optionally backfill derived fields"""
+        self._create_indexes()
+        if backfill:
+            backfilled = backfill_search_tokens(self.db.users)
+            if backfilled:
+                logger.info(f"Backfilled search tokens/keys for {backfilled} users")
     
     def _create_indexes(self):
         """Create database indexes for better performance"""
@@ -98,6 +142,10 @@ class Database:
             
             # Create index on created_at for time-based queries
             users_collection.create_index("created_at")
+            # Picker search: equality on role/org, then multikey prefix tokens
+            users_collection.create_index([("role", 1), ("organization", 1), ("search_tokens", 1)])
+            # Exact/prefix tier of the picker search
+            users_collection.create_index([("role", 1), ("organization", 1), ("search_keys", 1)])
 
             # Tasks collection indexes
             tasks_collection = self.db.tasks
@@ -120,33 +168,74 @@ class Database:
             templates_collection.create_index("manager_id")
             templates_collection.create_index("status")
             templates_collection.create_index("updated_at")
+            # Paginated list: role filter + newest first
+            templates_collection.create_index([("manager_id", 1), ("created_at", -1)])
+            templates_collection.create_index([("status", 1), ("created_at", -1)])
+
+            # Inspections: re-evaluation streams in-flight inspections per template
+            self.db.inspections.create_index([("template_id", 1), ("status", 1), ("_id", 1)])
+
+            # Template versions are looked up by hash (_id); list per template
+            self.db.template_versions.create_index([("template_id", 1), ("created_at", -1)])
+
+            # Re-evaluation jobs: latest job per template
+            self.db.reevaluation_jobs.create_index([("template_id", 1), ("created_at", -1)])
+
+            # Switching-rule state: one document per (organization, template, supplier)
+            self.db.switching_states.create_index(
+                [("organization", 1), ("template_id", 1), ("supplier", 1)], unique=True
+            )
+            # Manual switching events (resumes), replayed by rebuilds in time order
+            self.db.switching_events.create_index([("organization", 1), ("at", 1)])
+
+            # Token revocations: expire with the last token they can match;
+            # workers poll for new entries by created_at
+            self.db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+            self.db.revoked_tokens.create_index("created_at")
+
+            # Audit history per inspection / user, retention and storage layout
+            ensure_audit_storage(self.db)
             
             logger.info("Database indexes created successfully")
             
         except Exception as e:
             logger.error(f"Error creating indexes: {e}")
+            raise
     
     def get_collection(self, collection_name):
         """Get a collection from the database"""
-        # A `pymongo.database.Database` instance does *not* support truth-value
-        # testing (i.e. `bool(self.db)` raises the error the user saw).  We
-        # therefore check explicitly for *None* instead.
-        if self.db is None:
-            raise Exception("Database not connected")
         return self.db[collection_name]
     
     def close(self):
-        """Close the database connection"""
-        if self.client:
-            self.client.close()
+        """Close this process's database connection"""
+        if self._client is not None and self._pid == os.getpid():
+            self._client.close()
             logger.info("MongoDB connection closed")
+        self._client = self._db = None
+        self._pid = None
 
 # Global database instance
 db = Database()
 
 def init_db(app):
-    """Initialize database connection"""
-    return db.connect(app)
+    """Configure the database connection (the client itself is created lazily)"""
+    try:
+        db.configure(app.config)
+    except ValueError as e:
+        logger.error(f"Failed to configure MongoDB: {e}")
+        return False
+    if app.config.get('ENSURE_INDEXES_ON_START'):
+        # Connects in this process; keep it off under pre-fork servers
+        try:
+            if not db.ping():
+                return False
+            print("✅ MongoDB connected")
+            db.ensure_indexes()
+        except Exception as e:
+            logger.error(f"Unexpected error connecting to MongoDB: {e}")
+            print(f"❌ MongoDB error: {e}")
+            return False
+    return True
 
 def get_db():
     """Get database instance"""
@@ -0,0 +1,170 @@
+"""Per-worker cache of the defect master list (defect code -> severity).
+
+The single ``defect_master`` document carries a monotonically increasing
+``version`` that every PUT increments. Workers keep the decoded list and a
+code -> severity dict in memory and revalidate with a projection of just
+``version`` at most every ``REVALIDATE_INTERVAL`` seconds; the full document
+is only re-read when the version moved.
+
+Invalidation is pushed in two ways: the worker handling a PUT primes its own
+cache with the written document immediately, and where the deployment
+supports change streams (replica sets, Atlas) each worker watches the
+collection and drops its cache on any change. Without change streams the
+version poll bounds staleness to ``REVALIDATE_INTERVAL``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .database import get_db
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("critical", "major", "minor")
+REVALIDATE_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class DefectMasterSnapshot:
+    version: int
+    codes: Dict[str, List[str]]
+    severity_by_code: Dict[str, str] = field(default_factory=dict)
+    doc_id: Optional[str] = None
+
+    def classify(self, code: Any) -> Optional[str]:
+        return self.severity_by_code.get(str(code)) if code is not None else None
+
+    def public_view(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {sev: list(self.codes.get(sev) or []) for sev in SEVERITIES}
+        out["version"] = self.version
+        if self.doc_id:
+            out["_id"] = self.doc_id
+        return out
+
+
+def _snapshot(doc: Optional[Dict[str, Any]]) -> DefectMasterSnapshot:
+    doc = doc or {}
+    codes = {sev: list(doc.get(sev) or []) for sev in SEVERITIES}
+    severity_by_code: Dict[str, str] = {}
+    # Most severe wins if a code is listed twice
+    for sev in reversed(SEVERITIES):
+        for code in codes[sev]:
+            severity_by_code[str(code)] = sev
+    return DefectMasterSnapshot(
+        version=int(doc.get("version") or 0),
+        codes=codes,
+        severity_by_code=severity_by_code,
+        doc_id=str(doc["_id"]) if doc.get("_id") else None,
+    )
+
+
+class DefectMasterCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[DefectMasterSnapshot] = None
+        self._checked_at = 0.0
+        self._watcher_pid: Optional[int] = None
+
+    def _collection(self):
+        return get_db().get_collection("defect_master")
+
+    def get(self) -> DefectMasterSnapshot:
+        self._ensure_watcher()
+        snap = self._snapshot
+        if snap is not None and time.monotonic() - self._checked_at < REVALIDATE_INTERVAL:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is not None and time.monotonic() - self._checked_at < REVALIDATE_INTERVAL:
+                return snap
+            coll = self._collection()
+            head = coll.find_one({}, {"version": 1})
+            if snap is None or int((head or {}).get("version") or 0) != snap.version or \
+                    (head is None) != (snap.doc_id is None):
+                snap = _snapshot(coll.find_one({}))
+                self._snapshot = snap
+            self._checked_at = time.monotonic()
+            return snap
+
+    def prime(self, doc: Optional[Dict[str, Any]]) -> DefectMasterSnapshot:
+        """Install a freshly written document (used by the PUT handler)."""
+        snap = _snapshot(doc)
+        with self._lock:
+            if self._snapshot is None or snap.version >= self._snapshot.version:
+                self._snapshot = snap
+                self._checked_at = time.monotonic()
+        return snap
+
+    def invalidate(self) -> None:
+        self._checked_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Change-stream push (best effort, one watcher thread per process)
+    # ------------------------------------------------------------------
+
+    def _ensure_watcher(self) -> None:
+        pid = os.getpid()
+        if self._watcher_pid == pid:
+            return
+        self._watcher_pid = pid  # also set after fork, so each worker starts its own
+        threading.Thread(target=self._watch, name="defect-master-watch", daemon=True).start()
+
+    def _watch(self) -> None:
+        try:
+            with self._collection().watch() as stream:
+                for _change in stream:
+                    self.invalidate()
+        except Exception as e:
+            # Standalone servers have no change streams; the version poll covers it
+            logger.info(f"Defect master change stream unavailable, using version polling: {e}")
+
+
+defect_master_cache = DefectMasterCache()
+
+
+def update_master(codes: Dict[str, List[str]]) -> DefectMasterSnapshot:
+    """Replace the master lists, bump the version and prime this worker's cache."""
+    from pymongo import ReturnDocument
+
+    doc = get_db().get_collection("defect_master").find_one_and_update(
+        {},
+        {"$set": {sev: list(codes.get(sev) or []) for sev in SEVERITIES}, "$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return defect_master_cache.prime(doc)
+
+
+def classify_sample_defects(responses: Dict[str, Any], snapshot: DefectMasterSnapshot) -> Dict[str, Any]:
+    """Count ``responses.samples[].defects[]`` by master-list severity.
+
+    Pure dict lookups against an already-loaded snapshot, so it is safe to
+    call on every submit.
+    """
+    counts = {sev: 0 for sev in SEVERITIES}
+    unclassified = 0
+    for sample in (responses or {}).get("samples") or []:
+        if not isinstance(sample, dict):
+            continue
+        for d in sample.get("defects") or []:
+            if not isinstance(d, dict):
+                continue
+            code = d.get("code") or d.get("defect_code")
+            if not code:
+                continue
+            try:
+                n = int(d.get("count") or 1)
+            except (TypeError, ValueError):
+                n = 1
+            sev = snapshot.classify(code)
+            if sev:
+                counts[sev] += n
+            else:
+                unclassified += n
+    return {**counts, "unclassified": unclassified, "master_version": snapshot.version}
@@ -0,0 +1,137 @@
+"""Typeahead search over the defect library and the defect master codes.
+
+The index is built once from ``garments_defects.json`` (via the compiled
+reference cache) plus the codes in ``defect_master`` and rebuilt only when
+either source changes. Lookups combine a sorted token list (bisect for
+prefixes) with a trigram posting map, so a query touches only matching
+entries and returns ranked top-k results in well under a millisecond for
+library-sized inputs.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+import heapq
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .defect_master import defect_master_cache
+from .reference_data import defects_library_cache
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: Any) -> str:
+    return _NON_ALNUM.sub(" ", str(text or "").lower()).strip()
+
+
+def trigrams(text: str) -> set:
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class DefectSearchIndex:
+    """Immutable search index; build a new one when the sources change."""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+        self._norm = [normalize(e["text"]) for e in entries]
+        self._grams: Dict[str, List[int]] = {}
+        tokens = []
+        for idx, norm in enumerate(self._norm):
+            for gram in trigrams(norm):
+                self._grams.setdefault(gram, []).append(idx)
+            tokens.extend((tok, idx) for tok in set(norm.split()))
+        tokens.sort()
+        self._tokens = [t for t, _ in tokens]
+        self._token_ids = [i for _, i in tokens]
+
+    def _prefix_ids(self, prefix: str) -> set:
+        ids = set()
+        pos = bisect_left(self._tokens, prefix)
+        while pos < len(self._tokens) and self._tokens[pos].startswith(prefix):
+            ids.add(self._token_ids[pos])
+            pos += 1
+        return ids
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        q = normalize(query)
+        if not q:
+            return []
+        q_tokens = q.split()
+
+        # Entries whose tokens start with every query token
+        prefix_hits: Optional[set] = None
+        for tok in q_tokens:
+            ids = self._prefix_ids(tok)
+            prefix_hits = ids if prefix_hits is None else prefix_hits & ids
+
+        overlap: Counter = Counter()
+        q_grams = trigrams(q) if len(q) >= 3 else set()
+        for gram in q_grams:
+            overlap.update(self._grams.get(gram, ()))
+
+        scored = []
+        for idx in set(overlap) | (prefix_hits or set()):
+            norm = self._norm[idx]
+            if norm == q:
+                score = 1000.0
+            elif norm.startswith(q):
+                score = 500.0
+            elif prefix_hits and idx in prefix_hits:
+                score = 300.0
+            else:
+                score = 0.0
+            if q_grams:
+                score += 100.0 * overlap.get(idx, 0) / len(q_grams)
+            # Require a reasonable fuzzy match when nothing matched by prefix
+            if score < 40.0:
+                continue
+            scored.append((score, -len(norm), idx))
+
+        best = heapq.nlargest(limit, scored)
+        return [{**self.entries[idx], "score": round(score, 1)} for score, _neg_len, idx in best]
+
+
+def build_entries(categories: Dict[str, List[str]], master: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    entries = []
+    for category, descriptions in categories.items():
+        entries.append({"text": category, "kind": "category", "category": category})
+        entries.extend({"text": d, "kind": "description", "category": category} for d in descriptions)
+    for severity in ("critical", "major", "minor"):
+        entries.extend({"text": str(code), "kind": "code", "severity": severity} for code in master.get(severity) or [])
+    return entries
+
+
+_lock = threading.Lock()
+_index: Optional[DefectSearchIndex] = None
+_index_key: Optional[Tuple[str, int]] = None
+
+
+def get_index() -> DefectSearchIndex:
+    """Return the current index, rebuilding it only if a source changed."""
+    global _index, _index_key
+    library = defects_library_cache.get()
+    try:
+        master = defect_master_cache.get()
+    except Exception as e:
+        # Search still works over the library if the master list is unavailable
+        logger.warning(f"Defect master list unavailable for search: {e}")
+        master = None
+    key = (library.etag, master.version if master else -1)
+    if _index is not None and _index_key == key:
+        return _index
+    with _lock:
+        if _index is None or _index_key != key:
+            _index = DefectSearchIndex(build_entries(library.data["categories"], master.codes if master else {}))
+            _index_key = key
+            logger.info(f"Built defect search index ({len(_index.entries)} entries)")
+        return _index
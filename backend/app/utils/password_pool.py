@@ -0,0 +1,182 @@
+"""Bounded process pool for Argon2 hashing and verification.
+
+Argon2 is deliberately CPU- and memory-hard; running it in request threads
+lets a login storm starve every other endpoint on the worker. Jobs go to a
+small per-worker process pool instead, behind an admission limit: when
+``max_pending`` jobs are already queued or running, new ones fail fast with
+``PasswordPoolSaturated`` (mapped to 503 + Retry-After) rather than queueing
+without bound.
+
+Cost parameters come from ``Config.ARGON2_*``. ``verify`` also reports
+whether the stored hash used different parameters so login can rehash.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Tuple
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolSaturated(Exception):
+    """Too many password jobs queued (or one timed out); retry later."""
+
+
+def argon2_params() -> Dict[str, int]:
+    return {
+        "time_cost": Config.ARGON2_TIME_COST,
+        "memory_cost": Config.ARGON2_MEMORY_COST,
+        "parallelism": Config.ARGON2_PARALLELISM,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Worker-side functions (module level so they pickle)
+# ---------------------------------------------------------------------------
+
+_hashers: Dict[Tuple[int, int, int], PasswordHasher] = {}
+
+
+def _hasher(params: Dict[str, int]) -> PasswordHasher:
+    key = (params["time_cost"], params["memory_cost"], params["parallelism"])
+    hasher = _hashers.get(key)
+    if hasher is None:
+        hasher = _hashers[key] = PasswordHasher(**params)
+    return hasher
+
+
+def _hash(params: Dict[str, int], password: str) -> str:
+    return _hasher(params).hash(password)
+
+
+def _verify(params: Dict[str, int], password_hash: str, password: str) -> Tuple[bool, bool]:
+    hasher = _hasher(params)
+    try:
+        hasher.verify(password_hash, password)
+    except (VerifyMismatchError, VerificationError, InvalidHashError):
+        return False, False
+    return True, hasher.check_needs_rehash(password_hash)
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+
+class PasswordPool:
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self._workers = workers
+        self._max_pending = max_pending
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._pending = 0
+        self._stats = {"submitted": 0, "completed": 0, "rejected": 0, "timeouts": 0, "peak_pending": 0}
+        self._wait_total = 0.0
+        self._waits = 0
+
+    @property
+    def workers(self) -> int:
+        return self._workers or Config.PASSWORD_POOL_WORKERS
+
+    @property
+    def max_pending(self) -> int:
+        return self._max_pending or Config.PASSWORD_POOL_MAX_PENDING or self.workers * 4
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # One pool per process; a forked web worker must not reuse its parent's
+        # (nor count the parent's in-flight jobs, whose callbacks never run here)
+        if self._executor is None or self._pid != os.getpid():
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+            )
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._stats["completed"] += 1
+
+    def _run(self, fn, *args):
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise PasswordPoolSaturated("Password pool saturated")
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._stats["peak_pending"] = max(self._stats["peak_pending"], self._pending)
+        started = time.perf_counter()
+        try:
+            future = executor.submit(fn, argon2_params(), *args)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is held until the job actually finishes; a timed-out hash
+        # keeps its worker busy, so it keeps counting against max_pending
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self._timeout or Config.PASSWORD_POOL_TIMEOUT)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PasswordPoolSaturated("Password job timed out")
+        finally:
+            with self._lock:
+                self._waits += 1
+                self._wait_total += time.perf_counter() - started
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash ``passwords`` in order for bulk imports.
+
+        At most ``workers`` of these jobs are in flight at once, each through
+        the same admission limit as logins, so an import shares the pool
+        instead of taking it over. Raises ``PasswordPoolSaturated`` (and
+        cancels the rest) if a job is rejected or times out.
+        """
+        if not passwords:
+            return []
+        threads = ThreadPoolExecutor(max_workers=min(self.workers, len(passwords)),
+                                     thread_name_prefix="password-hash")
+        try:
+            futures = [threads.submit(self.hash, p) for p in passwords]
+            return [f.result() for f in futures]
+        finally:
+            threads.shutdown(cancel_futures=True)
+
+    def verify(self, password_hash: str, password: str) -> Tuple[bool, bool]:
+        """Return ``(matches, needs_rehash)``."""
+        return self._run(_verify, password_hash, password)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "pending": self._pending,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "avg_latency_ms": round(self._wait_total / self._waits * 1000, 2) if self._waits else None,
+                "argon2": argon2_params(),
+            }
+
+
+password_pool = PasswordPool()
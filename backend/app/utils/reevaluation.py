@@ -0,0 +1,306 @@
+"""Background re-evaluation of in-flight inspections after AQL changes.
+
+When a template's AQL configuration changes, inspections that are not yet
+completed still carry verdicts computed against the old criteria. A job
+walks those inspections in ``_id`` order with a narrow projection,
+re-evaluates each with an evaluator compiled once for the template, and
+writes only the documents whose results actually changed using unordered
+``bulk_write`` batches.
+
+Inspections pinned to a template version keep their questions but take the
+new configuration: each is re-pinned to its version's content with the
+template's current AQL fields (``template_versions.rebase_aql``) and judged
+against that, so its next submit agrees with the job. Assigned inspections
+are only re-pinned; there is no verdict to correct yet.
+
+Progress is checkpointed on the job document (``last_id``, counters) after
+every batch, so a job interrupted by a restart resumes where it stopped.
+Each job records the hash of the AQL configuration it applies; a job for
+an older configuration is superseded rather than resumed.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from ..models.template import Template
+from .aql import AQLCalculator, DefectTally, aql_config_for_template, compile_evaluator
+from .database import get_db
+from .template_versions import template_versions
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# A "running" job whose checkpoint is older than this is assumed to have died
+# with its worker and may be resumed.
+STALE_AFTER = timedelta(minutes=5)
+
+# Inspections whose verdict may still change; completed ones are final.
+IN_FLIGHT_STATUSES = ["assigned", "in_progress", "submitted"]
+UNFINISHED_JOB_STATUSES = ["queued", "running", "failed"]
+
+_PROJECTION = {
+    "responses": 1,
+    "updated_at": 1,
+    "aql_results": 1,
+    "defect_counts": 1,
+    "aql_passed": 1,
+    "aql_rejection_reasons": 1,
+    "live_tally.units_inspected": 1,
+    "template_version": 1,
+}
+
+_running_lock = threading.Lock()
+_running: Dict[str, threading.Thread] = {}
+
+
+def config_hash(base_config: Optional[Dict[str, Any]]) -> str:
+    canonical = json.dumps(base_config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _plan_for(template, base_config: Dict[str, Any], severity: str) -> Dict[str, Any]:
+    plan = dict(base_config)
+    if severity and severity != "normal":
+        plan.update(AQLCalculator.calculate_aql_criteria(template.lot_size, template.aql_level, severity=severity))
+    plan["severity"] = severity or "normal"
+    return plan
+
+
+def _reevaluate(doc: Dict[str, Any], template, base_config: Optional[Dict[str, Any]], evaluators: Dict[Any, Any],
+                version: Optional[str] = None):
+    """Return the ``$set`` document for one inspection, or None if unchanged.
+
+    ``evaluators`` caches compiled plans per ``(version, severity)``.
+    """
+    if "aql_results" not in doc:
+        # Never saved or submitted, so there is no verdict to correct
+        return None
+    previous = doc.get("aql_results") or {}
+    if previous.get("overridden"):
+        # An inspector's explicit decision stands until they submit again
+        return None
+
+    responses = dict(doc.get("responses") or {})
+    tally = DefectTally.from_responses(responses)
+    live = DefectTally.submitted(responses).as_dict()
+    units = (doc.get("live_tally") or {}).get("units_inspected", 0)
+
+    if base_config is None:
+        new = {
+            "aql_results": {},
+            "defect_counts": {"critical": 0, "major": 0, "minor": 0},
+            "aql_passed": True,
+            "aql_rejection_reasons": [],
+            "live_tally": {**live, "units_inspected": units, "aql_config": None},
+        }
+    else:
+        severity = (previous.get("plan") or {}).get("severity") or "normal"
+        if (version, severity) not in evaluators:
+            plan = _plan_for(template, base_config, severity)
+            evaluators[(version, severity)] = (plan, compile_evaluator(plan, template.defect_categories))
+        plan, evaluate = evaluators[(version, severity)]
+        results = evaluate(responses, tally)
+        results["plan"] = plan
+        results["overridden"] = previous.get("overridden", False)
+        results["override_meta"] = previous.get("override_meta")
+        new = {
+            "aql_results": results,
+            "defect_counts": results["defect_counts"],
+            "aql_passed": results["passed"],
+            "aql_rejection_reasons": results["rejection_reasons"],
+            "live_tally": {**live, "units_inspected": units, "aql_config": {
+                k: v for k, v in plan.items() if k != "severity"
+            }},
+        }
+
+    unchanged = (
+        new["defect_counts"] == (doc.get("defect_counts") or {})
+        and new["aql_passed"] == doc.get("aql_passed", True)
+        and new["aql_rejection_reasons"] == (doc.get("aql_rejection_reasons") or [])
+        and (new["aql_results"].get("plan") == previous.get("plan"))
+    )
+    return None if unchanged else new
+
+
+def run_job(job_id: ObjectId) -> None:
+    """Process a re-evaluation job to completion (or failure)."""
+    db = get_db()
+    jobs = db.get_collection("reevaluation_jobs")
+    inspections = db.get_collection("inspections")
+    templates = db.get_collection("templates")
+
+    job = jobs.find_one({"_id": job_id})
+    if not job:
+        return
+    try:
+        tpl_doc = templates.find_one({"_id": job["template_id"]})
+        if not tpl_doc:
+            raise ValueError("Template not found")
+        template = Template.from_dict(tpl_doc)
+        base_config = aql_config_for_template(template)
+        if job.get("config_hash") != config_hash(base_config):
+            # The template changed again; the job for the new configuration takes over
+            jobs.update_one({"_id": job_id}, {"$set": {"status": "superseded", "finished_at": datetime.utcnow()}})
+            return
+        evaluators: Dict[Any, Any] = {}
+        rebased: Dict[str, Any] = {}  # pinned hash -> (rebased hash, compiled) or None
+
+        def context(pinned):
+            """``(version, template, base_config)`` to judge an inspection with."""
+            if not pinned:
+                return None, template, base_config
+            if pinned not in rebased:
+                new_hash = template_versions.rebase_aql(pinned, tpl_doc, created_by=job.get("requested_by"))
+                compiled = template_versions.get_compiled(new_hash) if new_hash else None
+                rebased[pinned] = (new_hash, compiled) if compiled else None
+            if rebased[pinned] is None:
+                return None
+            new_hash, compiled = rebased[pinned]
+            return new_hash, compiled.template, compiled.aql_config
+
+        now = datetime.utcnow()
+        jobs.update_one({"_id": job_id}, {"$set": {
+            "status": "running", "started_at": job.get("started_at") or now, "updated_at": now,
+        }})
+        last_id = job.get("last_id")
+        while True:
+            query = {"template_id": job["template_id"], "status": {"$in": IN_FLIGHT_STATUSES}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = list(inspections.find(query, _PROJECTION).sort("_id", 1).limit(BATCH_SIZE))
+            if not batch:
+                break
+
+            ops, repins = [], []
+            for doc in batch:
+                pinned = doc.get("template_version")
+                ctx = context(pinned)
+                if ctx is None:
+                    logger.warning(f"Inspection {doc['_id']} is pinned to missing version {pinned}; skipped")
+                    continue
+                version, doc_template, doc_config = ctx
+                if version and version != pinned:
+                    # Unguarded: a concurrent answer edit must not keep the old criteria
+                    repins.append(UpdateOne(
+                        {"_id": doc["_id"], "template_version": pinned},
+                        {"$set": {"template_version": version}},
+                    ))
+                new = _reevaluate(doc, doc_template, doc_config, evaluators, version)
+                if new is not None:
+                    # Skip documents edited since we read them; their next
+                    # submit evaluates against the new criteria anyway.
+                    ops.append(UpdateOne(
+                        {"_id": doc["_id"], "updated_at": doc.get("updated_at")},
+                        {"$set": new},
+                    ))
+            modified = repinned = 0
+            if repins:
+                repinned = inspections.bulk_write(repins, ordered=False).modified_count
+            if ops:
+                modified = inspections.bulk_write(ops, ordered=False).modified_count
+
+            last_id = batch[-1]["_id"]
+            checkpoint = jobs.update_one({"_id": job_id, "status": "running"}, {
+                "$set": {"last_id": last_id, "updated_at": datetime.utcnow()},
+                "$inc": {"processed": len(batch), "modified": modified, "repinned": repinned},
+            })
+            if not checkpoint.matched_count:
+                logger.info(f"Re-evaluation job {job_id} was superseded; stopping")
+                return
+
+        jobs.update_one({"_id": job_id, "status": "running"},
+                        {"$set": {"status": "completed", "finished_at": datetime.utcnow()}})
+        logger.info(f"Re-evaluation job {job_id} completed")
+    except Exception as e:
+        logger.error(f"Re-evaluation job {job_id} failed: {e}")
+        jobs.update_one({"_id": job_id}, {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}})
+    finally:
+        with _running_lock:
+            _running.pop(str(job_id), None)
+
+
+def start_job(template_id: ObjectId, requested_by: Any = None) -> ObjectId:
+    """Create (or resume) the job for a template and run it in a background thread.
+
+    An unfinished job for the template's current AQL configuration is resumed
+    from its checkpoint instead of starting a second pass. Unfinished jobs
+    for any other configuration are superseded and a fresh job starts from
+    the first inspection.
+    """
+    db = get_db()
+    jobs = db.get_collection("reevaluation_jobs")
+
+    tpl_doc = db.get_collection("templates").find_one({"_id": template_id})
+    if not tpl_doc:
+        raise ValueError("Template not found")
+    current_hash = config_hash(aql_config_for_template(Template.from_dict(tpl_doc)))
+    jobs.update_many(
+        {"template_id": template_id, "status": {"$in": UNFINISHED_JOB_STATUSES},
+         "config_hash": {"$ne": current_hash}},
+        {"$set": {"status": "superseded", "finished_at": datetime.utcnow()}},
+    )
+
+    job = jobs.find_one(
+        {"template_id": template_id, "status": {"$in": UNFINISHED_JOB_STATUSES}, "config_hash": current_hash},
+        sort=[("created_at", -1)],
+    )
+    if job and job.get("status") == "running" and \
+            (job.get("updated_at") or job.get("started_at") or datetime.utcnow()) > datetime.utcnow() - STALE_AFTER:
+        # Still making progress (possibly in another worker)
+        return job["_id"]
+    if job is None:
+        total = db.get_collection("inspections").count_documents(
+            {"template_id": template_id, "status": {"$in": IN_FLIGHT_STATUSES}}
+        )
+        job_id = jobs.insert_one({
+            "template_id": template_id,
+            "config_hash": current_hash,
+            "requested_by": requested_by,
+            "status": "queued",
+            "total": total,
+            "processed": 0,
+            "modified": 0,
+            "repinned": 0,
+            "last_id": None,
+            "created_at": datetime.utcnow(),
+        }).inserted_id
+    else:
+        job_id = job["_id"]
+        jobs.update_one({"_id": job_id}, {"$set": {"status": "queued", "error": None}})
+
+    with _running_lock:
+        if str(job_id) in _running:
+            return job_id
+        thread = threading.Thread(target=run_job, args=(job_id,), name=f"reevaluate-{job_id}", daemon=True)
+        _running[str(job_id)] = thread
+    thread.start()
+    return job_id
+
+
+def job_public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    total = job.get("total") or 0
+    return {
+        "id": str(job["_id"]),
+        "template_id": str(job.get("template_id")),
+        "status": job.get("status"),
+        "total": total,
+        "processed": job.get("processed", 0),
+        "modified": job.get("modified", 0),
+        # Pinned inspections moved to their content with the new AQL fields
+        "repinned": job.get("repinned", 0),
+        "progress": round(min(1.0, job.get("processed", 0) / total), 4) if total else 1.0,
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None,
+        "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None,
+    }
@@ -0,0 +1,388 @@
+"""In-process cache of compiled reference data (AQL tables, defect library).
+
+Reference files change rarely but are expensive to parse. ``CompiledFileCache``
+compiles a file once into a ready-to-send JSON body, keyed by the file's path,
+mtime and size, and serves that body from memory with a strong ETag. A
+cheap ``os.stat`` per request is the only filesystem work on the hot path.
+
+Compilation runs on a background thread. Until the first compile of a file
+finishes callers get ``None`` (the route answers 202); when the file later
+changes, the previous body keeps being served until the new one is ready, so
+a request never waits for a workbook to be parsed.
+
+The small JSON files under ``aql_output/`` use ``ReferenceFilesCache``, which
+compiles synchronously on the first request after a change. Every compiled
+entry carries a gzip variant so responses never re-encode either.
+
+Those datasets are also written to a binary store (``reference_store``) that
+every worker ``mmap``s, so a worker whose sources match the store serves
+straight from the shared pages without parsing anything.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .reference_store import SharedStoreReader, StoredDataset, write_store
+
+logger = logging.getLogger(__name__)
+
+
+# Repository root; reference JSON lives in <root>/aql_output
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+AQL_OUTPUT_DIR = PROJECT_ROOT / "aql_output"
+DEFAULT_STORE_PATH = AQL_OUTPUT_DIR / "reference_store.bin"
+
+
+@dataclass(frozen=True)
+class CompiledEntry:
+    key: Any  # (path, mtime_ns, size), or a tuple of those for multi-file sources
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    compiled_at: datetime
+    # Compiled structure the body was built from; shared, treat as read-only
+    data: Any = None
+
+
+def build_entry(key: Any, data: Any) -> CompiledEntry:
+    """Serialise an API success payload once, with gzip variant and strong ETag."""
+    # sort_keys matches the key order jsonify has always produced
+    body = json.dumps({"success": True, "data": data}, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return CompiledEntry(
+        key=key,
+        body=body,
+        # mtime=0 keeps the compressed bytes stable across recompiles
+        gzip_body=gzip.compress(body, compresslevel=6, mtime=0),
+        etag=hashlib.sha256(body).hexdigest()[:32],
+        compiled_at=datetime.utcnow(),
+        data=data,
+    )
+
+
+class CompiledFileCache:
+    """Compile files in the background and serve the results from memory."""
+
+    def __init__(self, name: str, compile_fn: Callable[[str], Any]):
+        self.name = name
+        self._compile_fn = compile_fn
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CompiledEntry] = {}
+        self._pending: Dict[str, Tuple[str, int, int]] = {}
+        self._errors: Dict[str, Tuple[Tuple[str, int, int], Exception]] = {}
+
+    @staticmethod
+    def _key(path: str) -> Tuple[str, int, int]:
+        st = os.stat(path)  # FileNotFoundError propagates to the caller
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def get(self, path: str) -> Optional[CompiledEntry]:
+        """Return the compiled entry for ``path`` or None while it is warming up.
+
+        Raises FileNotFoundError if the file is missing, and re-raises the
+        compile error if the current version of the file failed to compile.
+        """
+        path = os.path.abspath(path)
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.key == key:
+                return entry
+            error = self._errors.get(path)
+            if error is not None and error[0] == key:
+                raise error[1]
+            if self._pending.get(path) != key:
+                self._pending[path] = key
+                threading.Thread(
+                    target=self._compile, args=(path, key), name=f"compile-{self.name}", daemon=True
+                ).start()
+        # Stale entry (file changed) is still served while recompiling
+        return entry
+
+    def _compile(self, path: str, key: Tuple[str, int, int]) -> None:
+        try:
+            entry = build_entry(key, self._compile_fn(path))
+            with self._lock:
+                current = self._entries.get(path)
+                # Keep whichever compile saw the newest file version
+                if current is None or current.key[1:] <= key[1:]:
+                    self._entries[path] = entry
+                self._errors.pop(path, None)
+            logger.info(f"Compiled {self.name} reference data from {path}")
+        except Exception as e:
+            logger.error(f"Failed to compile {self.name} reference data from {path}: {e}")
+            with self._lock:
+                self._errors[path] = (key, e)
+        finally:
+            with self._lock:
+                if self._pending.get(path) == key:
+                    del self._pending[path]
+
+    def warm(self, path: str) -> None:
+        """Start compiling ``path`` without waiting (e.g. at app startup)."""
+        try:
+            self.get(path)
+        except Exception as e:
+            logger.warning(f"Could not warm {self.name} reference data from {path}: {e}")
+
+
+class StoredEntry:
+    """``CompiledEntry`` look-alike backed by the shared mmap store.
+
+    An entry belongs to one mapping of the store (a new mapping yields a new
+    entry), so ``data`` is decoded once per entry and then reused.
+    """
+
+    def __init__(self, key: Any, dataset: StoredDataset, decode_fn: Callable[[List[Dict[str, Any]]], Any]):
+        self.key = key
+        self.etag = dataset.etag
+        self._dataset = dataset
+        self._decode_fn = decode_fn
+        self._lock = threading.Lock()
+        self._data: Any = None
+        self._decoded = False
+
+    @property
+    def body(self) -> bytes:
+        return self._dataset.body
+
+    @property
+    def gzip_body(self) -> bytes:
+        return self._dataset.gzip_body
+
+    @property
+    def data(self) -> Any:
+        if not self._decoded:
+            with self._lock:
+                if not self._decoded:
+                    self._data = self._decode_fn(self._dataset.tables())
+                    self._decoded = True
+        return self._data
+
+
+_shared_store: Optional[SharedStoreReader] = None
+_shared_caches: List["ReferenceFilesCache"] = []
+_refresh_lock = threading.Lock()
+
+
+def _source_key_str(key: Any) -> str:
+    return json.dumps(key)
+
+
+class ReferenceFilesCache:
+    """Compile a fixed set of files on demand; recompile when any of them changes.
+
+    ``to_tables``/``from_tables`` convert the compiled data to and from plain
+    string tables so it can live in the shared binary store.
+    """
+
+    def __init__(self, name: str, paths: Sequence[Path], compile_fn: Callable[[List[Path]], Any],
+                 to_tables: Callable[[Any], List[Dict[str, Any]]],
+                 from_tables: Callable[[List[Dict[str, Any]]], Any]):
+        self.name = name
+        self.paths = [Path(p) for p in paths]
+        self._compile_fn = compile_fn
+        self.to_tables = to_tables
+        self.from_tables = from_tables
+        self._lock = threading.Lock()
+        self._entry: Optional[Any] = None
+        _shared_caches.append(self)
+
+    def _key(self) -> Tuple[Tuple[str, int, int], ...]:
+        key = []
+        for path in self.paths:
+            st = path.stat()  # FileNotFoundError propagates to the caller
+            key.append((str(path), st.st_mtime_ns, st.st_size))
+        return tuple(key)
+
+    def get(self):
+        key = self._key()
+        entry = self._entry
+        if entry is not None and entry.key == key:
+            return entry
+        stale_store = False
+        with self._lock:
+            # Another thread may have compiled while we waited
+            if self._entry is None or self._entry.key != key:
+                stored = _shared_store.dataset(self.name, _source_key_str(key)) if _shared_store else None
+                if stored is not None:
+                    self._entry = StoredEntry(key, stored, self.from_tables)
+                else:
+                    self._entry = self.compile(key)
+                    stale_store = _shared_store is not None
+            entry = self._entry
+        if stale_store:
+            # Sources changed since the store was written; rebuild it for
+            # every worker without holding up this request.
+            threading.Thread(target=refresh_shared_store, name="reference-store", daemon=True).start()
+        return entry
+
+    def compile(self, key: Any = None) -> CompiledEntry:
+        key = key if key is not None else self._key()
+        entry = build_entry(key, self._compile_fn(self.paths))
+        logger.info(f"Compiled {self.name} reference data")
+        return entry
+
+
+def refresh_shared_store() -> bool:
+    """Recompile every shared dataset and atomically replace the store file."""
+    if _shared_store is None:
+        return False
+    with _refresh_lock:
+        datasets = []
+        for cache in _shared_caches:
+            try:
+                entry = cache.compile()
+            except FileNotFoundError:
+                continue
+            datasets.append({
+                "name": cache.name,
+                "source_key": _source_key_str(entry.key),
+                "etag": entry.etag,
+                "body": entry.body,
+                "gzip_body": entry.gzip_body,
+                "tables": cache.to_tables(entry.data),
+            })
+        try:
+            write_store(_shared_store.path, datasets)
+            _shared_store.invalidate()
+        except Exception as e:
+            logger.error(f"Failed to write reference store {_shared_store.path}: {e}")
+            return False
+    logger.info(f"Wrote reference store {_shared_store.path}")
+    return True
+
+
+def init_shared_store(path: Optional[str] = None) -> None:
+    """Map the shared store, building it first if it is missing or stale.
+
+    Called at app creation; with a pre-forking server the build happens once
+    and every worker maps the same file.
+    """
+    global _shared_store
+    _shared_store = SharedStoreReader(str(path or DEFAULT_STORE_PATH))
+    for cache in _shared_caches:
+        try:
+            key = cache._key()
+        except FileNotFoundError:
+            continue
+        if _shared_store.dataset(cache.name, _source_key_str(key)) is None:
+            refresh_shared_store()
+            break
+
+
+# -----------------------------------------------------------------------------
+# AQL Excel workbook
+# -----------------------------------------------------------------------------
+
+def compile_aql_workbook(path: str) -> Dict[str, Any]:
+    """Read the first two sheets of the AQL workbook into {headers, rows} tables.
+
+    The workbook is opened once; both sheets are parsed from the same handle.
+    """
+    # Lazy import so that app can start even if pandas is missing until installed
+    import pandas as pd  # type: ignore
+
+    with pd.ExcelFile(path, engine="openpyxl") as xls:
+        sheets = []
+        for name in xls.sheet_names[:2]:
+            df = xls.parse(sheet_name=name).fillna("")
+            sheets.append({
+                "name": name,
+                "headers": [str(c) for c in df.columns],
+                "rows": [[str(v) if v is not None else "" for v in row] for row in df.values.tolist()],
+            })
+    return {"sheets": sheets}
+
+
+aql_workbook_cache = CompiledFileCache("aql-workbook", compile_aql_workbook)
+
+
+# -----------------------------------------------------------------------------
+# AQL reference JSON (Sheet2 / Sheet4) and garments defect library
+# -----------------------------------------------------------------------------
+
+def _json_to_table(json_path: Path) -> Dict[str, Any]:
+    with json_path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list) or not data:
+        return {"name": json_path.stem, "headers": [], "rows": []}
+    # Use the first object's keys as headers, preserving order
+    first = data[0]
+    headers = list(first.keys())
+    rows = [[str((row.get(h, ""))) for h in headers] for row in data]
+    return {"name": json_path.stem, "headers": headers, "rows": rows}
+
+
+def compile_aql_reference_files(paths: List[Path]) -> Dict[str, Any]:
+    """Tables in file order: page-1 => Sheet2, page-2 => Sheet4."""
+    return {"sheets": [_json_to_table(p) for p in paths]}
+
+
+def compile_defects_library(paths: List[Path]) -> Dict[str, Any]:
+    """Map defect categories -> list of defect descriptions.
+
+    Rows where the category is null inherit the most recent non-null category.
+    """
+    with paths[0].open("r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    categories: Dict[str, List[str]] = {}
+    current_cat = None
+    for row in (data or []):
+        cat = row.get("Defect Category")
+        desc = row.get("Defect Description (English)")
+        if cat is not None and str(cat).strip() != "":
+            current_cat = str(cat).strip()
+            categories.setdefault(current_cat, [])
+        if desc is None:
+            continue
+        if current_cat is None:
+            # Skip descriptions until a first category appears
+            continue
+        categories.setdefault(current_cat, []).append(str(desc).strip())
+    return {"categories": categories}
+
+
+def _categories_to_tables(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for category, descriptions in data["categories"].items():
+        # A "category" row keeps categories that have no descriptions
+        rows.append([category, "", "category"])
+        rows.extend([category, d, "defect"] for d in descriptions)
+    return [{"name": "categories", "headers": ["category", "description", "kind"], "rows": rows}]
+
+
+def _categories_from_tables(tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+    categories: Dict[str, List[str]] = {}
+    for category, description, kind in tables[0]["rows"]:
+        bucket = categories.setdefault(category, [])
+        if kind == "defect":
+            bucket.append(description)
+    return {"categories": categories}
+
+
+aql_reference_files_cache = ReferenceFilesCache(
+    "aql-reference-files",
+    [AQL_OUTPUT_DIR / "Sheet2.json", AQL_OUTPUT_DIR / "Sheet4.json"],
+    compile_aql_reference_files,
+    to_tables=lambda data: data["sheets"],
+    from_tables=lambda tables: {"sheets": tables},
+)
+
+defects_library_cache = ReferenceFilesCache(
+    "defects-library",
+    [AQL_OUTPUT_DIR / "garments_defects.json"],
+    compile_defects_library,
+    to_tables=_categories_to_tables,
+    from_tables=_categories_from_tables,
+)
@@ -0,0 +1,266 @@
+"""Binary reference-data store shared by all worker processes.
+
+Compiled reference datasets (see ``reference_data``) are written once to a
+compact file and ``mmap``ed read-only by every worker, so the pages are
+shared by the OS instead of each process parsing and holding its own copy.
+
+File layout (little endian)::
+
+    header       <4sHHIIIIII  magic, version, flags, n_strings, n_datasets,
+                              string_index_off, dataset_dir_off, pool_off, pool_len
+    string index n_strings x <II      (offset into pool, byte length)
+    dataset dir  n_datasets x <IIIIIIIII
+                 name_id, source_key_id, etag_id,
+                 body_off, body_len, gzip_off, gzip_len, n_tables, tables_off
+    tables       per dataset: n_tables x <IIII  (name_id, n_cols, n_rows, cells_off)
+    cells        u32 string ids: headers (n_cols) followed by rows (n_rows x n_cols)
+    blobs        pre-serialised JSON body and its gzip variant per dataset
+    string pool  UTF-8 bytes of every distinct string
+
+Writers build the file next to its final location and ``os.replace`` it, so
+readers see either the old or the new file, never a partial one. Readers
+notice replacement by inode/mtime and remap.
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SLRD"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIIIIII")
+_STRING = struct.Struct("<II")
+_DATASET = struct.Struct("<IIIIIIIII")
+_TABLE = struct.Struct("<IIII")
+_U32 = struct.Struct("<I")
+
+# How often readers stat the file to notice an atomic replacement
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+class _StringPool:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._encoded: List[bytes] = []
+
+    def add(self, value: Any) -> int:
+        value = "" if value is None else str(value)
+        sid = self._ids.get(value)
+        if sid is None:
+            sid = len(self._encoded)
+            self._ids[value] = sid
+            self._encoded.append(value.encode("utf-8"))
+        return sid
+
+    def __len__(self) -> int:
+        return len(self._encoded)
+
+    def encoded(self) -> List[bytes]:
+        return self._encoded
+
+
+def write_store(path: str, datasets: Iterable[Dict[str, Any]]) -> None:
+    """Atomically write a store file.
+
+    Each dataset is ``{"name", "source_key", "etag", "body", "gzip_body",
+    "tables": [{"name", "headers", "rows"}]}``.
+    """
+    datasets = list(datasets)
+    pool = _StringPool()
+
+    prepared = []
+    for ds in datasets:
+        tables = []
+        for table in ds["tables"]:
+            headers = [pool.add(h) for h in table["headers"]]
+            cells = list(headers)
+            for row in table["rows"]:
+                row = list(row) + [""] * (len(headers) - len(row))
+                cells.extend(pool.add(v) for v in row[:len(headers)])
+            tables.append((pool.add(table["name"]), len(headers), len(table["rows"]), cells))
+        prepared.append((pool.add(ds["name"]), pool.add(ds["source_key"]), pool.add(ds["etag"]),
+                         ds["body"], ds["gzip_body"], tables))
+
+    # Compute offsets
+    string_index_off = _HEADER.size
+    dataset_dir_off = string_index_off + _STRING.size * len(pool)
+    cursor = dataset_dir_off + _DATASET.size * len(prepared)
+    layout = []
+    for _name, _src, _etag, body, gzip_body, tables in prepared:
+        tables_off = cursor
+        cursor += _TABLE.size * len(tables)
+        cell_offs = []
+        for _tname, _ncols, _nrows, cells in tables:
+            cell_offs.append(cursor)
+            cursor += _U32.size * len(cells)
+        body_off = cursor
+        cursor += len(body)
+        gzip_off = cursor
+        cursor += len(gzip_body)
+        layout.append((tables_off, cell_offs, body_off, gzip_off))
+    pool_off = cursor
+    pool_len = sum(len(b) for b in pool.encoded())
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".reference-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, len(pool), len(prepared),
+                                 string_index_off, dataset_dir_off, pool_off, pool_len))
+            offset = 0
+            for encoded in pool.encoded():
+                f.write(_STRING.pack(offset, len(encoded)))
+                offset += len(encoded)
+            for (name_id, src_id, etag_id, body, gzip_body, tables), (tables_off, _c, body_off, gzip_off) in zip(prepared, layout):
+                f.write(_DATASET.pack(name_id, src_id, etag_id, body_off, len(body),
+                                      gzip_off, len(gzip_body), len(tables), tables_off))
+            for (_n, _s, _e, body, gzip_body, tables), (_t, cell_offs, _b, _g) in zip(prepared, layout):
+                for (tname, ncols, nrows, _cells), cells_off in zip(tables, cell_offs):
+                    f.write(_TABLE.pack(tname, ncols, nrows, cells_off))
+                for _tname, _ncols, _nrows, cells in tables:
+                    f.write(struct.pack(f"<{len(cells)}I", *cells))
+                f.write(body)
+                f.write(gzip_body)
+            for encoded in pool.encoded():
+                f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600; workers may run as another user of the group
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class StoredDataset:
+    """Read-only view of one dataset inside a mapped store."""
+
+    def __init__(self, store: "ReferenceStore", name: str, source_key: str, etag: str,
+                 body: Tuple[int, int], gzip_body: Tuple[int, int], tables: List[Tuple[int, int, int, int]]):
+        self._store = store
+        self.name = name
+        self.source_key = source_key
+        self.etag = etag
+        self._body = body
+        self._gzip = gzip_body
+        self._tables = tables
+
+    @property
+    def body(self) -> bytes:
+        off, length = self._body
+        return self._store.buf[off:off + length]
+
+    @property
+    def gzip_body(self) -> bytes:
+        off, length = self._gzip
+        return self._store.buf[off:off + length]
+
+    def tables(self) -> List[Dict[str, Any]]:
+        """Decode tables to ``{"name", "headers", "rows"}`` dicts."""
+        out = []
+        for name_id, ncols, nrows, cells_off in self._tables:
+            count = ncols * (nrows + 1)
+            cells = struct.unpack_from(f"<{count}I", self._store.buf, cells_off)
+            s = self._store.string
+            out.append({
+                "name": s(name_id),
+                "headers": [s(i) for i in cells[:ncols]],
+                "rows": [[s(i) for i in cells[ncols * (r + 1):ncols * (r + 2)]] for r in range(nrows)],
+            })
+        return out
+
+
+class ReferenceStore:
+    """A mapped store file; ``datasets`` is indexed by dataset name."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _flags, n_strings, n_datasets, string_index_off, dataset_dir_off, pool_off, _pool_len = \
+            _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported reference store format in {path}")
+        self._n_strings = n_strings
+        self._string_index_off = string_index_off
+        self._pool_off = pool_off
+
+        self.datasets: Dict[str, StoredDataset] = {}
+        for i in range(n_datasets):
+            name_id, src_id, etag_id, body_off, body_len, gzip_off, gzip_len, n_tables, tables_off = \
+                _DATASET.unpack_from(self.buf, dataset_dir_off + i * _DATASET.size)
+            tables = [_TABLE.unpack_from(self.buf, tables_off + t * _TABLE.size) for t in range(n_tables)]
+            name = self.string(name_id)
+            self.datasets[name] = StoredDataset(
+                self, name, self.string(src_id), self.string(etag_id),
+                (body_off, body_len), (gzip_off, gzip_len), tables,
+            )
+
+    def string(self, sid: int) -> str:
+        if sid >= self._n_strings:
+            raise IndexError(sid)
+        offset, length = _STRING.unpack_from(self.buf, self._string_index_off + sid * _STRING.size)
+        start = self._pool_off + offset
+        return self.buf[start:start + length].decode("utf-8")
+
+
+class SharedStoreReader:
+    """Per-process handle that remaps the store when the file is replaced."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._store: Optional[ReferenceStore] = None
+        self._checked_at = 0.0
+
+    def current(self) -> Optional[ReferenceStore]:
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return self._store
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._store = None
+                return None
+            identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if self._store is None or self._store.identity != identity:
+                try:
+                    # The previous map is released once no request holds it
+                    self._store = ReferenceStore(self.path)
+                except Exception as e:
+                    logger.error(f"Failed to map reference store {self.path}: {e}")
+                    self._store = None
+            return self._store
+
+    def invalidate(self) -> None:
+        """Force the next lookup to stat the file (e.g. right after writing it)."""
+        self._checked_at = 0.0
+
+    def dataset(self, name: str, source_key: str) -> Optional[StoredDataset]:
+        """Return the stored dataset if it was built from ``source_key``."""
+        store = self.current()
+        if store is None:
+            return None
+        ds = store.datasets.get(name)
+        if ds is None or ds.source_key != source_key:
+            return None
+        return ds
@@ -0,0 +1,88 @@
+"""Reproducible sample-unit selection for lots.
+
+Given a lot size, a sample size and a seed, the same units are always
+selected, so an auditor can re-derive exactly which units or cartons an
+inspector was told to pull. Selection uses Robert Floyd's algorithm, which
+draws ``k`` distinct indices out of ``n`` in O(k) time and memory – a
+500,000-unit lot never materialises a list of all units.
+
+All indices returned here are 1-based, matching how cartons and units are
+labelled on the floor.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import Dict, List, Optional
+
+
+def floyd_sample(n: int, k: int, rng: random.Random) -> List[int]:
+    """Return ``k`` distinct integers from ``1..n`` in ascending order."""
+    if k < 0 or k > n:
+        raise ValueError("sample size must be between 0 and the population size")
+    chosen = set()
+    for j in range(n - k + 1, n + 1):
+        t = rng.randint(1, j)
+        chosen.add(j if t in chosen else t)
+    return sorted(chosen)
+
+
+def simple_sample(lot_size: int, sample_size: int, seed: int) -> List[int]:
+    """Unit numbers to pull from an unstratified lot."""
+    return floyd_sample(lot_size, sample_size, random.Random(seed))
+
+
+def stratified_sample(
+    lot_size: int,
+    sample_size: int,
+    units_per_carton: int,
+    seed: int,
+    cartons_to_open: Optional[int] = None,
+) -> List[Dict[str, object]]:
+    """Pick cartons first, then units inside each opened carton.
+
+    By default ``ceil(sqrt(cartons))`` cartons are opened (never more than the
+    sample size), or more when fewer could not hold the sample. The sample is
+    spread as evenly as capacity allows across the opened cartons; the last
+    carton of the lot may be partially filled.
+    Returns ``[{"carton": c, "units": [u, ...]}, ...]`` ordered by carton.
+    """
+    if units_per_carton < 1:
+        raise ValueError("units_per_carton must be at least 1")
+    if sample_size < 0 or sample_size > lot_size:
+        raise ValueError("sample size must be between 0 and the lot size")
+
+    rng = random.Random(seed)
+    carton_count = math.ceil(lot_size / units_per_carton)
+    last_capacity = lot_size - units_per_carton * (carton_count - 1)
+    if cartons_to_open is None:
+        cartons_to_open = math.ceil(math.sqrt(carton_count))
+    # Open enough cartons to hold the sample even if the partial last carton
+    # is among them, and draw them all in one pass so every carton is equally
+    # likely to be opened.
+    shortfall = units_per_carton - last_capacity
+    needed = math.ceil((sample_size + shortfall) / units_per_carton) if sample_size else 0
+    cartons_to_open = min(max(cartons_to_open, 1), max(sample_size, 1), carton_count)
+    cartons_to_open = min(max(cartons_to_open, needed), carton_count)
+
+    def capacity(carton: int) -> int:
+        return units_per_carton if carton < carton_count else last_capacity
+
+    cartons = floyd_sample(carton_count, cartons_to_open, rng)
+
+    # Even allocation with spill-over into cartons that still have room
+    allocation = {c: 0 for c in cartons}
+    remaining = sample_size
+    while remaining:
+        open_cartons = [c for c in cartons if allocation[c] < capacity(c)]
+        share, extra = divmod(remaining, len(open_cartons))
+        for i, c in enumerate(open_cartons):
+            take = min(capacity(c) - allocation[c], share + (1 if i < extra else 0))
+            allocation[c] += take
+            remaining -= take
+
+    return [
+        {"carton": c, "units": floyd_sample(capacity(c), allocation[c], rng)}
+        for c in cartons if allocation[c]
+    ]
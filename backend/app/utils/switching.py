@@ -0,0 +1,240 @@
+"""ISO 2859-1 switching-rule state per (organization, template, supplier).
+
+Each key owns one small document in ``switching_states`` that is updated in
+O(1) whenever a manager approves an inspection, so the current inspection
+severity never needs a scan of the lot history:
+
+- normal -> tightened: 2 of the last 5 (or fewer) consecutive lots rejected
+- tightened -> normal: 5 consecutive lots accepted
+- tightened -> discontinued: 5 lots rejected while on tightened inspection
+- normal -> reduced: switching score reaches 30
+- reduced -> normal: any lot rejected
+- discontinued -> tightened: only by ``resume_key`` after corrective action;
+  until then submissions for the key are refused. Resumes are also logged in
+  ``switching_events`` so a rebuild from lot history replays them.
+
+The switching score follows the standard: with an acceptance number of 2 or
+more it grows by 3 when the lot would also have passed one step tighter
+(approximated as at least one defect to spare) and resets otherwise; with an
+acceptance number of 0 or 1 it grows by 2 per accepted lot.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from .database import get_db
+
+logger = logging.getLogger(__name__)
+
+NORMAL = "normal"
+TIGHTENED = "tightened"
+REDUCED = "reduced"
+DISCONTINUED = "discontinued"
+
+WINDOW = 5
+REDUCED_SCORE_THRESHOLD = 30
+MAX_UPDATE_RETRIES = 5
+
+
+def initial_state() -> Dict[str, Any]:
+    return {
+        "state": NORMAL,
+        "recent": [],  # last WINDOW outcomes on the current severity, newest last
+        "consecutive_accepted": 0,
+        "switching_score": 0,
+        "tightened_rejections": 0,
+        "lots": 0,
+    }
+
+
+def next_state(current: Dict[str, Any], accepted: bool, acceptance_number: int = 0,
+               defects_found: int = 0) -> Dict[str, Any]:
+    """Pure transition: fold one lot outcome into a switching-state document."""
+    state = {**initial_state(), **{k: current.get(k) for k in initial_state() if k in current}}
+    state["lots"] += 1
+    state["recent"] = (list(state["recent"]) + [bool(accepted)])[-WINDOW:]
+    state["consecutive_accepted"] = state["consecutive_accepted"] + 1 if accepted else 0
+
+    if state["state"] == NORMAL:
+        if not accepted:
+            state["switching_score"] = 0
+        elif acceptance_number >= 2:
+            spare = acceptance_number - defects_found
+            state["switching_score"] = state["switching_score"] + 3 if spare >= 1 else 0
+        else:
+            state["switching_score"] += 2
+
+        if state["recent"].count(False) >= 2:
+            return _enter(state, TIGHTENED)
+        if state["switching_score"] >= REDUCED_SCORE_THRESHOLD:
+            return _enter(state, REDUCED)
+    elif state["state"] == TIGHTENED:
+        if not accepted:
+            state["tightened_rejections"] += 1
+            if state["tightened_rejections"] >= WINDOW:
+                return _enter(state, DISCONTINUED)
+        elif state["consecutive_accepted"] >= WINDOW:
+            return _enter(state, NORMAL)
+    elif state["state"] == REDUCED:
+        if not accepted:
+            return _enter(state, NORMAL)
+    return state
+
+
+def _enter(state: Dict[str, Any], new_state: str) -> Dict[str, Any]:
+    state.update({
+        "state": new_state,
+        "recent": [],
+        "consecutive_accepted": 0,
+        "switching_score": 0,
+        "tightened_rejections": 0,
+    })
+    return state
+
+
+def _state_key(organization: Any, template_id: Any, supplier: Any) -> Dict[str, Any]:
+    if isinstance(template_id, str):
+        try:
+            template_id = ObjectId(template_id)
+        except Exception:
+            pass
+    return {"organization": organization, "template_id": template_id, "supplier": supplier or None}
+
+
+def get_severity(organization: Any, template_id: Any, supplier: Any = None) -> str:
+    """Return the inspection severity for a key (normal when no history)."""
+    coll = get_db().get_collection("switching_states")
+    doc = coll.find_one(_state_key(organization, template_id, supplier), {"state": 1})
+    return (doc or {}).get("state") or NORMAL
+
+
+def lot_acceptance_number(inspection: Dict[str, Any], template: Dict[str, Any]) -> Optional[int]:
+    """Major-defect acceptance number an inspection was judged against.
+
+    Inspections submitted before plans were stored on ``aql_results.plan``
+    fall back to the template's ``major_defects_allowed``. Returns None when
+    the lot was not AQL-inspected and so does not count toward switching.
+    """
+    plan = (inspection.get("aql_results") or {}).get("plan")
+    if plan:
+        return int(plan.get("major_defects_allowed") or 0)
+    if template.get("lot_size") and template.get("aql_level"):
+        return int(template.get("major_defects_allowed") or 0)
+    return None
+
+
+def _resumed(state: Dict[str, Any]) -> Dict[str, Any]:
+    return _enter(dict(state), TIGHTENED)
+
+
+def resume_key(organization: Any, template_id: Any, supplier: Any = None, resumed_by: Any = None) -> bool:
+    """Move a discontinued key back to tightened inspection.
+
+    The resume is logged as a ``switching_events`` entry so rebuilds replay
+    it. Returns False when the key is not discontinued.
+    """
+    db = get_db()
+    key = _state_key(organization, template_id, supplier)
+    now = datetime.utcnow()
+    fresh = _resumed(initial_state())
+    del fresh["lots"]
+    result = db.get_collection("switching_states").update_one(
+        {**key, "state": DISCONTINUED},
+        {"$set": {**fresh, "updated_at": now}, "$inc": {"version": 1}},
+    )
+    if not result.modified_count:
+        return False
+    db.get_collection("switching_events").insert_one({**key, "event": "resume", "at": now, "by": resumed_by})
+    return True
+
+
+def resume_events(scope: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Logged resumes in ``scope``, oldest first, as ``rebuild_states`` items."""
+    cursor = get_db().get_collection("switching_events").find(
+        {**scope, "event": "resume"}, {"organization": 1, "template_id": 1, "supplier": 1, "at": 1},
+    ).sort("at", 1)
+    for doc in cursor:
+        yield {**{k: doc.get(k) for k in ("organization", "template_id", "supplier", "at")}, "resume": True}
+
+
+def record_lot_outcome(organization: Any, template_id: Any, supplier: Any, accepted: bool,
+                       acceptance_number: int = 0, defects_found: int = 0) -> Dict[str, Any]:
+    """Apply one approved lot to the key's state document.
+
+    Uses a compare-and-set on ``version`` so concurrent approvals for the same
+    key serialize without a lock; each attempt is a single document read and
+    write.
+    """
+    coll = get_db().get_collection("switching_states")
+    key = _state_key(organization, template_id, supplier)
+
+    for _attempt in range(MAX_UPDATE_RETRIES):
+        current = coll.find_one(key)
+        now = datetime.utcnow()
+        new = next_state(current or {}, accepted, acceptance_number, defects_found)
+        if current is None:
+            try:
+                coll.insert_one({**key, **new, "version": 1, "updated_at": now})
+                return new
+            except DuplicateKeyError:
+                continue
+        result = coll.update_one(
+            {"_id": current["_id"], "version": current.get("version", 0)},
+            {"$set": {**new, "updated_at": now}, "$inc": {"version": 1}},
+        )
+        if result.modified_count:
+            if new["state"] != current.get("state"):
+                logger.info(f"Switching state for {key} changed {current.get('state')} -> {new['state']}")
+            return new
+    raise RuntimeError(f"Could not update switching state for {key} after {MAX_UPDATE_RETRIES} attempts")
+
+
+def rebuild_states(outcomes: Iterable[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+    """Fold an ordered stream of lot outcomes into states keyed by
+    ``(organization, template_id, supplier)``.
+
+    Each outcome carries the key fields plus ``accepted``,
+    ``acceptance_number`` and ``defects_found``. Items with ``resume`` set
+    (see ``resume_events``) move a discontinued key back to tightened.
+    """
+    states: Dict[tuple, Dict[str, Any]] = {}
+    for outcome in outcomes:
+        key = (outcome.get("organization"), outcome.get("template_id"), outcome.get("supplier") or None)
+        if outcome.get("resume"):
+            if key in states and states[key]["state"] == DISCONTINUED:
+                states[key] = _resumed(states[key])
+            continue
+        states[key] = next_state(
+            states.get(key, {}),
+            bool(outcome.get("accepted")),
+            int(outcome.get("acceptance_number") or 0),
+            int(outcome.get("defects_found") or 0),
+        )
+    return states
+
+
+def write_rebuilt_states(states: Dict[tuple, Dict[str, Any]], scope: Dict[str, Any]) -> Dict[str, int]:
+    """Make the stored state documents in ``scope`` equal to ``states``.
+
+    ``scope`` is the filter the rebuild covered (``{}`` for everything, or
+    ``{"organization": ...}``). Rebuilt keys are upserted in one bulk write;
+    any other document in the scope has no history left and is deleted.
+    """
+    coll = get_db().get_collection("switching_states")
+    now = datetime.utcnow()
+    ops = []
+    for (organization, template_id, supplier), state in states.items():
+        key = _state_key(organization, template_id, supplier)
+        ops.append(ReplaceOne(key, {**key, **state, "version": 1, "updated_at": now, "rebuilt_at": now},
+                              upsert=True))
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+    removed = coll.delete_many({**scope, "rebuilt_at": {"$ne": now}}).deleted_count
+    return {"written": len(ops), "removed": removed}
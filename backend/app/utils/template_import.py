@@ -0,0 +1,271 @@
+"""Bulk template import from spreadsheets (.xlsx via openpyxl read-only, or .csv).
+
+One row per question, header row first (names are case-insensitive)::
+
+    template_title | page_title | question_text | question_type | options |
+    required | rule_equals | rule_require_text | rule_require_media |
+    rule_notify | rule_message | description | organization | location |
+    manager_email | lot_size | aql_level
+
+``template_title``, ``page_title`` and ``question_text`` are required on
+every row. Template-level columns are taken from the first row of each
+template that fills them. ``options`` is pipe-separated. Rows are streamed
+one at a time, so memory tracks the templates being built, not the size of
+the workbook. A template with any row error is not created at all; its
+title is listed under ``skipped`` in the result.
+
+Templates with a manager are created as ``submitted`` (like
+``POST /api/templates/``); without one they become drafts.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from ..models.template import Template
+from .aql import AQLCalculator
+from .template_validation import validate_pages
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("template_title", "page_title", "question_text")
+TEMPLATE_COLUMNS = ("description", "organization", "location", "manager_email", "lot_size", "aql_level")
+INSERT_BATCH_SIZE = 200
+MAX_REPORTED_ERRORS = 1000
+
+_TRUE = {"1", "true", "yes", "y", "x"}
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_rows(stream, filename: str, sheet: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield ``(row_number, {column: text})`` for every data row.
+
+    ``stream`` is a binary file object (or a path for .xlsx). Row numbers are
+    1-based spreadsheet rows, so the header is row 1.
+    """
+    wb = None
+    if filename.lower().endswith(".csv"):
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="") if not isinstance(stream, io.TextIOBase) else stream
+        rows: Iterable = csv.reader(text)
+    elif filename.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(stream, read_only=True, data_only=True)
+    else:
+        raise ValueError("Unsupported file type; upload .xlsx or .csv")
+
+    header: Optional[List[str]] = None
+    try:
+        if wb is not None:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            rows = ws.iter_rows(values_only=True)
+        for row_no, row in enumerate(rows, start=1):
+            if header is None:
+                header = [_cell(c).lower().replace(" ", "_") for c in row]
+                missing = [c for c in REQUIRED_COLUMNS if c not in header]
+                if missing:
+                    raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+                continue
+            values = {header[i]: _cell(c) for i, c in enumerate(row) if i < len(header) and header[i]}
+            if any(values.values()):
+                yield row_no, values
+    finally:
+        # Read-only workbooks keep the file open until closed
+        if wb is not None:
+            wb.close()
+
+
+class TemplateImportBuilder:
+    """Accumulate rows into template documents, collecting per-row errors."""
+
+    def __init__(self):
+        self.templates: Dict[str, Dict[str, Any]] = {}
+        self.errors: List[Dict[str, Any]] = []
+        # Titles of templates with at least one error; these are never inserted
+        self.skipped: Dict[str, None] = {}
+
+    def error(self, row: Optional[int], message: str, template: Optional[str] = None) -> None:
+        if template:
+            self.skipped.setdefault(template)
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "template": template, "message": message})
+
+    def add(self, row_no: int, row: Dict[str, str]) -> None:
+        missing = [c for c in REQUIRED_COLUMNS if not row.get(c)]
+        if missing:
+            self.error(row_no, f"Missing value for {', '.join(missing)}", row.get("template_title") or None)
+            return
+        title = row["template_title"]
+        tpl = self.templates.get(title)
+        if tpl is None:
+            tpl = self.templates[title] = {
+                "title": title, "pages": [], "_page_by_title": {}, "_first_row": row_no, "_questions": 0,
+            }
+        for col in TEMPLATE_COLUMNS:
+            if row.get(col) and col not in tpl:
+                tpl[col] = row[col]
+
+        page = tpl["_page_by_title"].get(row["page_title"])
+        if page is None:
+            page = {"id": len(tpl["pages"]) + 1, "title": row["page_title"], "questions": []}
+            tpl["pages"].append(page)
+            tpl["_page_by_title"][row["page_title"]] = page
+
+        tpl["_questions"] += 1
+        question: Dict[str, Any] = {
+            "id": tpl["_questions"],
+            "text": row["question_text"],
+            "type": row.get("question_type") or "yesno",
+        }
+        if row.get("options"):
+            question["options"] = [o.strip() for o in row["options"].split("|") if o.strip()]
+        if row.get("required"):
+            question["required"] = row["required"].lower() in _TRUE
+        if row.get("rule_equals"):
+            question["rules"] = [{
+                "equals": row["rule_equals"],
+                "require_text": (row.get("rule_require_text") or "").lower() in _TRUE,
+                "require_media": (row.get("rule_require_media") or "").lower() in _TRUE,
+                "notify": (row.get("rule_notify") or "").lower() in _TRUE,
+                "message": row.get("rule_message") or None,
+            }]
+        page["questions"].append(question)
+
+    def build(self, creator_id: Any, managers: Dict[str, Dict[str, Any]]) -> List[Template]:
+        """Return ``Template`` objects ready to insert; invalid templates become errors.
+
+        Templates that already had a row error are validated (to report any
+        further problems) but not returned.
+        """
+        out: List[Template] = []
+        for title, tpl in self.templates.items():
+            row_no = tpl["_first_row"]
+            problems = validate_pages(tpl["pages"])
+            for p in problems:
+                self.error(row_no, p, title)
+            if problems or title in self.skipped:
+                continue
+
+            manager = None
+            if tpl.get("manager_email"):
+                manager = managers.get(tpl["manager_email"].lower())
+                if manager is None:
+                    self.error(row_no, f"Manager '{tpl['manager_email']}' not found", title)
+                    continue
+                if not tpl.get("organization") or not tpl.get("location"):
+                    self.error(row_no, "organization and location are required when a manager is set", title)
+                    continue
+
+            fields: Dict[str, Any] = {}
+            try:
+                if tpl.get("aql_level"):
+                    fields["aql_level"] = float(tpl["aql_level"])
+                if tpl.get("lot_size"):
+                    fields["lot_size"] = int(float(tpl["lot_size"]))
+                if fields.get("lot_size"):
+                    crit = AQLCalculator.calculate_aql_criteria(fields["lot_size"], fields.get("aql_level", 2.5))
+                    for key in ("sample_size", "major_defects_allowed", "minor_defects_allowed", "critical_defects_allowed"):
+                        fields[key] = crit[key]
+            except (TypeError, ValueError) as e:
+                self.error(row_no, f"Invalid AQL settings: {e}", title)
+                continue
+
+            out.append(Template(
+                title=title,
+                description=tpl.get("description", ""),
+                pages=tpl["pages"],
+                creator_id=creator_id,
+                status="submitted" if manager else "draft",
+                organization=tpl.get("organization"),
+                location=tpl.get("location"),
+                manager_id=manager["_id"] if manager else None,
+                manager_firstName=manager.get("firstName") if manager else None,
+                manager_lastName=manager.get("lastName") if manager else None,
+                **fields,
+            ))
+        return out
+
+
+def import_templates(db, stream, filename: str, creator_id: ObjectId,
+                     sheet: Optional[str] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """Parse ``stream`` and insert the resulting templates with unordered ``insert_many``.
+
+    ``db`` is anything with ``get_collection`` (the app's ``Database`` or a
+    pymongo database). Raises ``ValueError`` for unreadable files.
+    """
+    builder = TemplateImportBuilder()
+    rows = 0
+    for row_no, row in iter_rows(stream, filename, sheet):
+        rows += 1
+        builder.add(row_no, row)
+
+    # Emails are stored as registered; match either spelling, key by lowercase
+    emails = sorted({
+        e for t in builder.templates.values() if t.get("manager_email")
+        for e in (t["manager_email"], t["manager_email"].lower())
+    })
+    managers: Dict[str, Dict[str, Any]] = {}
+    if emails:
+        for doc in db.get_collection("users").find(
+            {"email": {"$in": emails}, "role": "manager"}, {"email": 1, "firstName": 1, "lastName": 1}
+        ):
+            managers[doc["email"].lower()] = doc
+
+    templates = builder.build(creator_id, managers)
+    created: List[Dict[str, Any]] = []
+    if not dry_run:
+        coll = db.get_collection("templates")
+        now = datetime.utcnow()
+        for start in range(0, len(templates), INSERT_BATCH_SIZE):
+            batch = templates[start:start + INSERT_BATCH_SIZE]
+            docs = []
+            for tpl in batch:
+                tpl.created_at = tpl.updated_at = now
+                docs.append(tpl.to_dict())
+            failed = set()
+            try:
+                result = coll.insert_many(docs, ordered=False)
+                inserted_ids = result.inserted_ids
+            except BulkWriteError as e:
+                # Unordered: the rest of the batch is still written
+                for err in e.details.get("writeErrors", []):
+                    failed.add(err["index"])
+                    builder.error(None, f"Insert failed: {err.get('errmsg')}", batch[err["index"]].title)
+                inserted_ids = [d.get("_id") for d in docs]
+            for i, (tpl, inserted_id) in enumerate(zip(batch, inserted_ids)):
+                if i in failed:
+                    continue
+                tpl._id = inserted_id
+                created.append({
+                    "id": str(inserted_id),
+                    "title": tpl.title,
+                    "status": tpl.status,
+                    "pages": len(tpl.pages),
+                    "questions": sum(len(p["questions"]) for p in tpl.pages),
+                })
+        logger.info(f"Template import: {rows} rows, {len(created)} templates created, {len(builder.errors)} errors")
+    else:
+        created = [
+            {"id": None, "title": t.title, "status": t.status, "pages": len(t.pages),
+             "questions": sum(len(p["questions"]) for p in t.pages)}
+            for t in templates
+        ]
+
+    return {
+        "rows": rows, "created": created, "skipped": list(builder.skipped),
+        "errors": builder.errors, "dry_run": dry_run,
+    }
@@ -0,0 +1,238 @@
+"""RFC 6902 JSON-Patch over ``template.pages`` translated to MongoDB updates.
+
+The patch is applied in memory first (for validation and ``test`` ops), then
+every touched location is reduced to the smallest sub-document that can be
+written positionally:
+
+* ``replace`` / object-key ``add`` -> ``$set`` of that exact dotted path
+* object-key ``remove``            -> ``$unset`` of that path
+* array ``add``/``remove``         -> ``$set`` of the enclosing array (indexes
+  shift), or ``$push`` when the only change to an array is an append
+
+Touched paths nested under another touched path collapse into the ancestor,
+and an append that overlaps any other write is folded into the enclosing
+``$set``, so the resulting update never has conflicting paths and its size
+tracks the edit, not the template.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_PATCH_OPERATIONS = 500
+
+_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+Path = Tuple[Any, ...]
+
+
+class PatchError(ValueError):
+    """The patch is malformed or does not apply to the current pages."""
+
+
+class PatchTestFailed(PatchError):
+    """A ``test`` operation did not match."""
+
+
+def parse_pointer(pointer: Any) -> List[str]:
+    """Split a JSON pointer rooted at ``/pages`` into unescaped tokens (without ``pages``)."""
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    tokens = [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+    if tokens[0] != "pages":
+        raise PatchError(f"Only paths under /pages may be patched: {pointer}")
+    return tokens[1:]
+
+
+def _array_index(token: str, arr: list, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(arr)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    idx = int(token)
+    if idx > len(arr) or (idx == len(arr) and not allow_end):
+        raise PatchError(f"Array index out of range: {idx}")
+    return idx
+
+
+def _resolve(root: Any, tokens: List[str]) -> Tuple[Any, Path]:
+    """Walk ``tokens`` returning the target value and its concrete path."""
+    node, path = root, ()
+    for tok in tokens:
+        if isinstance(node, list):
+            idx = _array_index(tok, node, allow_end=False)
+            node, path = node[idx], path + (idx,)
+        elif isinstance(node, dict):
+            if tok not in node:
+                raise PatchError(f"Path not found: /{'/'.join(['pages', *tokens])}")
+            node, path = node[tok], path + (tok,)
+        else:
+            raise PatchError(f"Path not found: /{'/'.join(['pages', *tokens])}")
+    return node, path
+
+
+class _Tracker:
+    def __init__(self):
+        self.touched: List[Path] = []   # paths whose final value must be written
+        self.appends: Dict[Path, int] = {}  # array path -> number of items appended
+
+    def touch(self, path: Path) -> None:
+        self.touched.append(path)
+
+    def array_changed(self, array_path: Path, appended: bool) -> None:
+        if appended and array_path not in self.touched:
+            self.appends[array_path] = self.appends.get(array_path, 0) + 1
+        else:
+            self.appends.pop(array_path, None)
+            self.touched.append(array_path)
+
+
+def _add(pages: list, tokens: List[str], value: Any, tracker: _Tracker) -> None:
+    if not tokens:
+        raise PatchError("Replacing the whole pages array is not a patch; use PUT")
+    parent, parent_path = _resolve(pages, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, list):
+        idx = _array_index(key, parent, allow_end=True)
+        appended = idx == len(parent)
+        parent.insert(idx, value)
+        tracker.array_changed(parent_path, appended)
+    elif isinstance(parent, dict):
+        parent[key] = value
+        tracker.touch(parent_path + (key,))
+    else:
+        raise PatchError(f"Cannot add to a scalar at /pages/{'/'.join(tokens[:-1])}")
+
+
+def _remove(pages: list, tokens: List[str], tracker: _Tracker) -> Any:
+    if not tokens:
+        raise PatchError("Cannot remove the pages array")
+    parent, parent_path = _resolve(pages, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, list):
+        idx = _array_index(key, parent, allow_end=False)
+        value = parent.pop(idx)
+        tracker.array_changed(parent_path, appended=False)
+        return value
+    if isinstance(parent, dict) and key in parent:
+        tracker.touch(parent_path + (key,))
+        return parent.pop(key)
+    raise PatchError(f"Path not found: /pages/{'/'.join(tokens)}")
+
+
+def apply_patch(pages: list, operations: Any) -> Tuple[list, _Tracker]:
+    """Apply ``operations`` to a copy of ``pages``; return the result and what changed."""
+    if not isinstance(operations, list) or not operations:
+        raise PatchError("operations must be a non-empty JSON array")
+    if len(operations) > MAX_PATCH_OPERATIONS:
+        raise PatchError(f"At most {MAX_PATCH_OPERATIONS} operations per patch")
+
+    result = copy.deepcopy(pages or [])
+    tracker = _Tracker()
+    for i, op in enumerate(operations):
+        if not isinstance(op, dict) or op.get("op") not in _OPS:
+            raise PatchError(f"Operation {i}: op must be one of {', '.join(_OPS)}")
+        name = op["op"]
+        tokens = parse_pointer(op.get("path"))
+        if name in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"Operation {i}: '{name}' requires a value")
+
+        if name == "add":
+            _add(result, tokens, copy.deepcopy(op["value"]), tracker)
+        elif name == "remove":
+            _remove(result, tokens, tracker)
+        elif name == "replace":
+            if not tokens:
+                raise PatchError("Replacing the whole pages array is not a patch; use PUT")
+            _, path = _resolve(result, tokens)
+            parent, _ = _resolve(result, tokens[:-1])
+            parent[path[-1]] = copy.deepcopy(op["value"])
+            tracker.touch(path)
+        elif name == "test":
+            current, _ = _resolve(result, tokens)
+            if current != op["value"]:
+                raise PatchTestFailed(f"Operation {i}: test failed at {op['path']}")
+        else:  # move / copy
+            from_tokens = parse_pointer(op.get("from"))
+            if name == "move":
+                if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                    raise PatchError(f"Operation {i}: cannot move a value into itself")
+                value = _remove(result, from_tokens, tracker)
+            else:
+                value = copy.deepcopy(_resolve(result, from_tokens)[0])
+            _add(result, tokens, value, tracker)
+    return result, tracker
+
+
+def _writable(path: Path) -> Path:
+    """Trim a path at the first key that cannot appear in a dotted field path."""
+    for i, part in enumerate(path):
+        if isinstance(part, str) and (not part or "." in part or part.startswith("$")):
+            return path[:i]
+    return path
+
+
+def _dotted(path: Path) -> str:
+    return ".".join(["pages", *(str(p) for p in path)])
+
+
+def _get(root: Any, path: Path) -> Tuple[bool, Any]:
+    node = root
+    for part in path:
+        if isinstance(node, list) and isinstance(part, int) and part < len(node):
+            node = node[part]
+        elif isinstance(node, dict) and part in node:
+            node = node[part]
+        else:
+            return False, None
+    return True, node
+
+
+def to_mongo_update(result: list, tracker: _Tracker) -> Dict[str, Dict[str, Any]]:
+    """Build ``$set``/``$unset``/``$push`` documents for the tracked changes."""
+    paths = {_writable(p) for p in tracker.touched}
+    appends = {_writable(p): n for p, n in tracker.appends.items()}
+    # An append that was trimmed, or that overlaps another write, becomes a
+    # $set of the patched array. Demoting one append can make another overlap,
+    # so repeat until no $push path touches any other path.
+    demoted = True
+    while demoted:
+        demoted = False
+        for p in list(appends):
+            if p not in tracker.appends or any(_overlaps(p, q) for q in paths) \
+                    or any(_overlaps(p, q) for q in appends if q != p):
+                paths.add(p)
+                del appends[p]
+                demoted = True
+
+    minimal = sorted(p for p in paths if not any(q != p and q == p[:len(q)] for q in paths))
+    update: Dict[str, Dict[str, Any]] = {}
+    for p in minimal:
+        if p == ():
+            update.setdefault("$set", {})["pages"] = result
+            continue
+        exists, value = _get(result, p)
+        if exists:
+            update.setdefault("$set", {})[_dotted(p)] = value
+        else:
+            update.setdefault("$unset", {})[_dotted(p)] = ""
+    for p, n in appends.items():
+        _, arr = _get(result, p)
+        update.setdefault("$push", {})[_dotted(p)] = {"$each": arr[-n:]}
+    return update
+
+
+def _overlaps(a: Path, b: Path) -> bool:
+    n = min(len(a), len(b))
+    return a[:n] == b[:n]
+
+
+def build_update(pages: list, operations: Any) -> Tuple[list, Optional[Dict[str, Dict[str, Any]]]]:
+    """Apply the patch and return ``(new_pages, mongo_update)``.
+
+    ``mongo_update`` is ``None`` when the patch only contained ``test`` ops.
+    """
+    result, tracker = apply_patch(pages, operations)
+    update = to_mongo_update(result, tracker)
+    return result, (update or None)
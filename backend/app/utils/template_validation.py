@@ -0,0 +1,131 @@
+"""Single-pass structural validation of template ``pages``.
+
+Checks the shape of pages, questions and rules and enforces size limits in
+one walk over the payload, collecting every error (up to ``MAX_ERRORS``)
+with its path instead of stopping at the first. Nothing is copied, so the
+cost is linear in the number of questions and independent of how large the
+individual answers or options are.
+"""
+
+from __future__ import annotations
+
+from typing import Any, List
+
+MAX_PAGES = 500
+MAX_QUESTIONS_PER_PAGE = 2000
+MAX_QUESTIONS = 50000
+MAX_RULES_PER_QUESTION = 50
+MAX_TEXT_LENGTH = 5000
+MAX_ERRORS = 100
+
+_RULE_FLAGS = ("require_text", "require_media", "notify")
+
+
+class _Errors(list):
+    def add(self, message: str, pi: int = None, qi: int = None, ri: int = None, field: str = None) -> bool:
+        """Record an error; returns False once the cap is reached.
+
+        The path string is only built here, so valid payloads never pay for it.
+        """
+        if len(self) < MAX_ERRORS:
+            path = "pages"
+            if pi is not None:
+                path += f"[{pi}]"
+            if qi is not None:
+                path += f".questions[{qi}]"
+            if ri is not None:
+                path += f".rules[{ri}]"
+            if field:
+                path += f".{field}"
+            self.append(f"{path}: {message}")
+        return len(self) < MAX_ERRORS
+
+
+def _text_error(value: Any):
+    if value is None or (value.__class__ is str and len(value) <= MAX_TEXT_LENGTH):
+        return None
+    if not isinstance(value, str):
+        return "must be a string"
+    return f"must be at most {MAX_TEXT_LENGTH} characters" if len(value) > MAX_TEXT_LENGTH else None
+
+
+def validate_pages(pages: Any) -> List[str]:
+    """Return a list of ``"<path>: <message>"`` errors (empty when valid)."""
+    errors = _Errors()
+    if not isinstance(pages, list) or not pages:
+        errors.add("must be a non-empty list")
+        return errors
+    if len(pages) > MAX_PAGES:
+        errors.add(f"at most {MAX_PAGES} pages are allowed")
+        return errors
+
+    seen_ids = {}
+    total_questions = 0
+    for pi, page in enumerate(pages):
+        if not isinstance(page, dict):
+            if not errors.add("must be an object", pi):
+                break
+            continue
+        err = _text_error(page.get("title"))
+        if err:
+            errors.add(err, pi, field="title")
+        questions = page.get("questions")
+        if questions is None:
+            continue
+        if not isinstance(questions, list):
+            errors.add("must be a list", pi, field="questions")
+            continue
+        if len(questions) > MAX_QUESTIONS_PER_PAGE:
+            errors.add(f"at most {MAX_QUESTIONS_PER_PAGE} questions per page", pi, field="questions")
+            continue
+        total_questions += len(questions)
+        if total_questions > MAX_QUESTIONS:
+            errors.add(f"at most {MAX_QUESTIONS} questions per template")
+            break
+
+        for qi, q in enumerate(questions):
+            if not isinstance(q, dict):
+                errors.add("must be an object", pi, qi)
+                continue
+            qid = q.get("id")
+            if qid is None or isinstance(qid, bool) or not isinstance(qid, (int, str)) or qid == "":
+                errors.add("is required (string or integer)", pi, qi, field="id")
+            else:
+                # Answers are keyed by str(id), so 1 and "1" collide
+                key = str(qid)
+                first = seen_ids.setdefault(key, (pi, qi))
+                if first != (pi, qi):
+                    errors.add(f"duplicates pages[{first[0]}].questions[{first[1]}]", pi, qi, field="id")
+            err = _text_error(q.get("text"))
+            if err:
+                errors.add(err, pi, qi, field="text")
+            qtype = q.get("type")
+            if qtype is not None and not isinstance(qtype, str):
+                errors.add("must be a string", pi, qi, field="type")
+
+            rules = q.get("rules")
+            if rules is None:
+                continue
+            if not isinstance(rules, list):
+                errors.add("must be a list", pi, qi, field="rules")
+                continue
+            if len(rules) > MAX_RULES_PER_QUESTION:
+                errors.add(f"at most {MAX_RULES_PER_QUESTION} rules per question", pi, qi, field="rules")
+                continue
+            for ri, r in enumerate(rules):
+                if not isinstance(r, dict):
+                    errors.add("must be an object", pi, qi, ri)
+                    continue
+                if "equals" not in r:
+                    errors.add("is required", pi, qi, ri, "equals")
+                elif isinstance(r["equals"], (dict, list)):
+                    errors.add("must be a scalar value", pi, qi, ri, "equals")
+                for flag in _RULE_FLAGS:
+                    if flag in r and not isinstance(r[flag], bool):
+                        errors.add("must be a boolean", pi, qi, ri, flag)
+                err = _text_error(r.get("message"))
+                if err:
+                    errors.add(err, pi, qi, ri, "message")
+        if len(errors) >= MAX_ERRORS:
+            break
+    return errors
@@ -0,0 +1,290 @@
+"""Immutable, content-hashed template versions.
+
+Publishing a template, and every later content edit while it is published,
+stores its content once in ``template_versions`` under
+``_id = sha256(template_id + canonical content)`` and records that hash as
+the template's ``current_version``. Assignment pins ``current_version`` on
+the inspection, so submit never has to re-read the live template
+and anything derived from a version can be cached for as long as the
+process lives: a hash always names the same content.
+
+Compiled artifacts (the Template object, AQL plan and evaluator, and the
+questions that carry rules) live in a bounded per-worker LRU keyed by hash,
+as does the pre-serialised inspector view that is generated at publish.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..models.template import Template
+from .aql import aql_config_for_template, compile_evaluator
+from .database import get_db
+from .reference_data import CompiledEntry, build_entry
+
+logger = logging.getLogger(__name__)
+
+# Fields that define what an inspector fills in and how it is judged.
+# Workflow state (status, timestamps, assignees) is deliberately excluded.
+CONTENT_FIELDS = (
+    "title", "description", "image_url", "pages", "organization", "location",
+    "aql_level", "aql_level_critical", "aql_level_major", "aql_level_minor",
+    "lot_size", "sample_size",
+    "critical_defects_allowed", "major_defects_allowed", "minor_defects_allowed",
+    "letter_of_code", "letter_of_code_critical", "letter_of_code_major", "letter_of_code_minor",
+    "defect_categories", "aql_tables",
+)
+
+# The part of the content the AQL configuration endpoint edits
+AQL_CONTENT_FIELDS = (
+    "aql_level", "aql_level_critical", "aql_level_major", "aql_level_minor",
+    "lot_size", "sample_size",
+    "critical_defects_allowed", "major_defects_allowed", "minor_defects_allowed",
+    "letter_of_code", "letter_of_code_critical", "letter_of_code_major", "letter_of_code_minor",
+    "defect_categories", "aql_tables",
+)
+
+COMPILED_CACHE_SIZE = 256
+# Hashes known to be in template_versions, and templates with a cached current version
+STORED_CACHE_SIZE = 4096
+CURRENT_CACHE_SIZE = 4096
+# How long a worker trusts its template_id -> current_version mapping
+CURRENT_VERSION_TTL = 5.0
+
+# Builder-only keys dropped from the inspector view (plus any "_"-prefixed key)
+BUILDER_ONLY_KEYS = frozenset({"rules", "collapsed", "expanded", "selected", "editing", "isEditing", "dragging", "ui"})
+
+
+def version_content(template_doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {f: template_doc.get(f) for f in CONTENT_FIELDS}
+
+
+def content_hash(template_id: Any, content: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {"template_id": str(template_id), "content": content},
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _strip(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in item.items() if k not in BUILDER_ONLY_KEYS and not str(k).startswith("_")}
+
+
+def inspector_view(template_id: Any, content: Dict[str, Any], version_hash: Optional[str]) -> Dict[str, Any]:
+    """What a device needs to run an inspection: questions, evidence prompts and the AQL plan.
+
+    Rule definitions are reduced to the answers that require evidence;
+    notification targets and messages stay server-side.
+    """
+    pages = []
+    for page in content.get("pages") or []:
+        questions = []
+        for q in page.get("questions") or []:
+            view = _strip(q)
+            evidence = [
+                {"equals": r.get("equals"), "require_text": bool(r.get("require_text")),
+                 "require_media": bool(r.get("require_media"))}
+                for r in (q.get("rules") or [])
+                if r.get("require_text") or r.get("require_media")
+            ]
+            if evidence:
+                view["evidence"] = evidence
+            questions.append(view)
+        pages.append({**_strip(page), "questions": questions})
+    return {
+        "id": str(template_id),
+        "version": version_hash,
+        "title": content.get("title"),
+        "description": content.get("description"),
+        "image_url": content.get("image_url"),
+        "organization": content.get("organization"),
+        "location": content.get("location"),
+        "aql": {
+            k: content.get(k)
+            for k in (
+                "aql_level", "aql_level_critical", "aql_level_major", "aql_level_minor",
+                "lot_size", "sample_size",
+                "critical_defects_allowed", "major_defects_allowed", "minor_defects_allowed",
+                "letter_of_code", "defect_categories",
+            )
+        },
+        "pages": pages,
+    }
+
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Any, Any]" = OrderedDict()
+        self._maxsize = maxsize
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def pop(self, key):
+        with self._lock:
+            return self._items.pop(key, None)
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+        return value
+
+
+@dataclass(frozen=True)
+class CompiledTemplateVersion:
+    hash: str
+    template: Template
+    aql_config: Optional[Dict[str, Any]]
+    evaluate: Optional[Callable[..., Dict[str, Any]]]
+    # Questions with at least one rule, in page order
+    rule_questions: List[Dict[str, Any]]
+
+
+def compile_content(version_hash: Optional[str], template_id: Any, content: Dict[str, Any]) -> CompiledTemplateVersion:
+    template = Template.from_dict({**content, "_id": template_id, "status": "published"})
+    aql_config = aql_config_for_template(template)
+    evaluate = compile_evaluator(aql_config, template.defect_categories) if aql_config else None
+    rule_questions = [
+        q
+        for page in (template.pages or [])
+        for q in (page.get("questions") or [])
+        if q.get("id") and q.get("rules")
+    ]
+    return CompiledTemplateVersion(version_hash, template, aql_config, evaluate, rule_questions)
+
+
+def compile_live(template_doc: Dict[str, Any]) -> CompiledTemplateVersion:
+    """Compile a live template document (inspections created before pinning). Not cached."""
+    compiled = compile_content(None, template_doc.get("_id"), version_content(template_doc))
+    # Keep the live document's own status and workflow fields
+    return CompiledTemplateVersion(
+        None, Template.from_dict(template_doc), compiled.aql_config, compiled.evaluate, compiled.rule_questions
+    )
+
+
+class _VersionStore:
+    def __init__(self, maxsize: int = COMPILED_CACHE_SIZE):
+        self._compiled = _LRU(maxsize)
+        self._inspector_views = _LRU(maxsize)
+        self._stored = _LRU(STORED_CACHE_SIZE)  # version hash -> True
+        self._current = _LRU(CURRENT_CACHE_SIZE)  # template_id -> (expires_at, status, version)
+
+    def _collection(self):
+        return get_db().get_collection("template_versions")
+
+    def ensure(self, template_doc: Dict[str, Any], created_by: Any = None) -> str:
+        """Store the template's current content as a version (once) and return its hash."""
+        content = version_content(template_doc)
+        version_hash = content_hash(template_doc["_id"], content)
+        if self._stored.get(version_hash):
+            return version_hash
+        self._collection().update_one(
+            {"_id": version_hash},
+            {"$setOnInsert": {
+                "template_id": template_doc["_id"],
+                "content": content,
+                "inspector_view": inspector_view(template_doc["_id"], content, version_hash),
+                "created_by": created_by,
+                "created_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+        self._stored.put(version_hash, True)
+        return version_hash
+
+    def rebase_aql(self, version_hash: str, template_doc: Dict[str, Any], created_by: Any = None) -> Optional[str]:
+        """Store ``version_hash``'s content with the AQL fields of ``template_doc``.
+
+        Used to move in-flight inspections onto a new AQL configuration
+        without changing the questions they were assigned. Returns the new
+        hash (the same one when the AQL fields already match), or None if
+        the version does not exist.
+        """
+        doc = self._collection().find_one({"_id": version_hash}, {"template_id": 1, "content": 1})
+        if not doc:
+            return None
+        content = {**(doc.get("content") or {}), **{f: template_doc.get(f) for f in AQL_CONTENT_FIELDS}}
+        return self.ensure({**content, "_id": doc.get("template_id")}, created_by=created_by)
+
+    def get_compiled(self, version_hash: str) -> Optional[CompiledTemplateVersion]:
+        compiled = self._compiled.get(version_hash)
+        if compiled is not None:
+            return compiled
+        doc = self._collection().find_one({"_id": version_hash}, {"template_id": 1, "content": 1})
+        if not doc:
+            return None
+        self._stored.put(version_hash, True)
+        return self._compiled.put(
+            version_hash, compile_content(version_hash, doc.get("template_id"), doc.get("content") or {})
+        )
+
+    def get_inspector_entry(self, version_hash: str) -> Optional[CompiledEntry]:
+        """Pre-serialised inspector view (body, gzip body, ETag) for a version."""
+        entry = self._inspector_views.get(version_hash)
+        if entry is not None:
+            return entry
+        doc = self._collection().find_one({"_id": version_hash}, {"template_id": 1, "inspector_view": 1, "content": 1})
+        if not doc:
+            return None
+        view = doc.get("inspector_view")
+        if view is None:  # versions stored before views were precomputed
+            view = inspector_view(doc.get("template_id"), doc.get("content") or {}, version_hash)
+        return self._inspector_views.put(version_hash, build_entry(version_hash, view))
+
+    def current_version(self, template_id: Any):
+        """``(status, current_version)`` of a template, trusted for ``CURRENT_VERSION_TTL``.
+
+        Returns ``None`` if the template does not exist.
+        """
+        cached = self._current.get(template_id)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                return cached[1:]
+            self._current.pop(template_id)
+        doc = get_db().get_collection("templates").find_one({"_id": template_id}, {"status": 1, "current_version": 1})
+        if not doc:
+            return None
+        self._current.put(template_id, (time.monotonic() + CURRENT_VERSION_TTL, doc.get("status"), doc.get("current_version")))
+        return doc.get("status"), doc.get("current_version")
+
+    def refresh_current(self, template_doc: Dict[str, Any], created_by: Any = None) -> Optional[str]:
+        """Freeze a published template's content and make it ``current_version``.
+
+        Called after every content write to a published template so that new
+        assignments pin what was just saved. The write is skipped if the
+        template changed again after ``template_doc`` was read, because that
+        writer refreshes it too. Returns None for unpublished templates.
+        """
+        if template_doc.get("status") != "published":
+            return None
+        version_hash = self.ensure(template_doc, created_by=created_by)
+        get_db().get_collection("templates").update_one(
+            {"_id": template_doc["_id"], "updated_at": template_doc.get("updated_at")},
+            {"$set": {"current_version": version_hash}},
+        )
+        self.forget(template_doc["_id"])
+        return version_hash
+
+    def forget(self, template_id: Any) -> None:
+        """Drop this worker's cached current version (e.g. right after publish)."""
+        self._current.pop(template_id)
+
+
+template_versions = _VersionStore()
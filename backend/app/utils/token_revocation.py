@@ -0,0 +1,178 @@
+"""Revocation of issued JWTs, checked in memory on every request.
+
+Every token pair carries a session id (``sid`` claim) that stays the same
+across refreshes. Two things can be revoked, each stored in
+``revoked_tokens``:
+
+* one session (``sid:<sid>``): what logout does
+* every session of a user issued before a moment (``user:<id>``, a
+  ``not_before`` epoch): for "log out everywhere" or deactivated accounts
+
+Each document expires via a TTL index once every token it could match has
+expired anyway, so the collection stays small. Each worker holds the whole
+list in a set/dict, loaded once and then kept current by a background
+thread that polls for entries newer than the last sync. ``is_revoked`` is
+therefore a dict lookup with no MongoDB round trip. Revocations made in a
+worker apply there immediately and in other workers within
+``REVOCATION_SYNC_INTERVAL`` seconds. Until a worker's first sync has
+succeeded, ``is_revoked`` raises instead of answering from an empty list, and
+the next request retries the load.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from ..config import Config
+from .database import get_db
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "revoked_tokens"
+# Revocations written by workers with slightly different clocks are re-read
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held through the first sync so no request sees a half-loaded list
+        self._load_lock = threading.Lock()
+        self._sessions: Dict[str, datetime] = {}  # sid -> expires_at
+        self._not_before: Dict[str, datetime] = {}  # user_id -> tokens issued before are revoked
+        self._expires: Dict[str, datetime] = {}  # user_id -> expiry of its not_before entry
+        self._synced_to: Optional[datetime] = None
+        self._pid: Optional[int] = None
+        if hasattr(os, "register_at_fork"):
+            # A fork can happen while another thread holds a lock; the child starts unlocked
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self) -> None:
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _collection(self):
+        return get_db().get_collection(COLLECTION)
+
+    # ------------------------------------------------------------------
+    # Lookups (request path)
+    # ------------------------------------------------------------------
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        self._ensure_loaded()
+        sid = payload.get("sid")
+        if sid and sid in self._sessions:
+            return True
+        not_before = self._not_before.get(str(payload.get("user_id")))
+        if not_before is not None:
+            issued = datetime.utcfromtimestamp(payload.get("iat", 0))
+            return issued < not_before
+        return False
+
+    # ------------------------------------------------------------------
+    # Revocation (logout, deactivation)
+    # ------------------------------------------------------------------
+
+    def revoke_session(self, sid: str, user_id: Any, expires_at: datetime) -> None:
+        """Revoke every token of session ``sid``; kept until ``expires_at``."""
+        now = datetime.utcnow()
+        self._collection().update_one(
+            {"_id": f"sid:{sid}"},
+            {"$set": {"sid": sid, "user_id": str(user_id), "expires_at": expires_at, "created_at": now}},
+            upsert=True,
+        )
+        with self._lock:
+            self._sessions[sid] = expires_at
+
+    def revoke_user(self, user_id: Any) -> None:
+        """Revoke every token issued to ``user_id`` up to now."""
+        now = datetime.utcnow()
+        # JWT iat has second resolution; a token issued this second is revoked too
+        not_before = now.replace(microsecond=0) + timedelta(seconds=1)
+        expires_at = now + Config.JWT_REFRESH_TOKEN_EXPIRES
+        self._collection().update_one(
+            {"_id": f"user:{user_id}"},
+            {"$set": {"user_id": str(user_id), "not_before": not_before,
+                      "expires_at": expires_at, "created_at": now}},
+            upsert=True,
+        )
+        with self._lock:
+            self._apply({"user_id": str(user_id), "not_before": not_before, "expires_at": expires_at})
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def _apply(self, doc: Dict[str, Any]) -> None:
+        if doc.get("sid"):
+            self._sessions[doc["sid"]] = doc["expires_at"]
+        elif doc.get("not_before"):
+            user_id = doc["user_id"]
+            current = self._not_before.get(user_id)
+            if current is None or doc["not_before"] > current:
+                self._not_before[user_id] = doc["not_before"]
+                self._expires[user_id] = doc["expires_at"]
+
+    def _prune(self, now: datetime) -> None:
+        for sid in [s for s, exp in self._sessions.items() if exp <= now]:
+            del self._sessions[sid]
+        for user_id in [u for u, exp in self._expires.items() if exp <= now]:
+            del self._expires[user_id]
+            self._not_before.pop(user_id, None)
+
+    def sync(self) -> None:
+        now = datetime.utcnow()
+        query: Dict[str, Any] = {"expires_at": {"$gt": now}}
+        if self._synced_to is not None:
+            query["created_at"] = {"$gte": self._synced_to - SYNC_OVERLAP}
+        docs = list(self._collection().find(query, {"sid": 1, "user_id": 1, "not_before": 1, "expires_at": 1}))
+        with self._lock:
+            for doc in docs:
+                self._apply(doc)
+            self._prune(now)
+            self._synced_to = now
+
+    def _ensure_loaded(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._load_lock:
+            if self._pid == pid:
+                return
+            # Fresh state per process; a forked worker starts its own poller
+            with self._lock:
+                self._sessions, self._not_before, self._expires = {}, {}, {}
+                self._synced_to = None
+            try:
+                self.sync()
+            except Exception as e:
+                # Fail closed: _pid stays unset so the next request retries the load
+                logger.error(f"Initial token revocation sync failed: {e}")
+                raise
+            # Published only after the first sync; other threads wait on _load_lock
+            self._pid = pid
+        threading.Thread(target=self._poll, args=(pid,), name="token-revocation-sync", daemon=True).start()
+
+    def _poll(self, pid: int) -> None:
+        while self._pid == pid:
+            time.sleep(Config.REVOCATION_SYNC_INTERVAL)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning(f"Token revocation sync failed: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "revoked_sessions": len(self._sessions),
+                "revoked_users": len(self._not_before),
+                "synced_to": self._synced_to.isoformat() if self._synced_to else None,
+            }
+
+
+token_revocation = RevocationList()
@@ -0,0 +1,146 @@
+"""Bulk user provisioning from CSV.
+
+Header row, then one user per row::
+
+    email, firstName, lastName, organization, location, phone, country_code,
+    password, role
+
+Rows are validated with the registration schema and password policy, then
+all passwords are hashed through the shared ``password_pool`` so an import
+competes with logins under the same admission limit; a saturated pool
+raises ``PasswordPoolSaturated`` before anything is written. Users are
+written with unordered
+``insert_many``, so a duplicate email only fails its own row: the unique
+email index reports it and the rest of the batch is still inserted.
+
+Hashing is the slow part, so uploads through the API are capped at
+``HTTP_MAX_ROWS``; larger files go through the ``import_users.py`` CLI,
+which allows up to ``MAX_ROWS``.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from marshmallow import ValidationError
+from pymongo.errors import BulkWriteError
+
+from ..models.user import User, user_schema
+from .audit import log_user_events
+from .password_pool import password_pool
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_ROLES = ("inspector", "manager")
+INSERT_BATCH_SIZE = 500
+MAX_ROWS = 10000
+HTTP_MAX_ROWS = 200
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY = 11000
+
+
+def _text_stream(stream):
+    return stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def import_users(db, stream, organization: Optional[str] = None, dry_run: bool = False,
+                 max_rows: int = MAX_ROWS) -> Dict[str, Any]:
+    """Validate, hash and insert the users in a CSV ``stream``.
+
+    When ``organization`` is given, rows default to it and rows naming a
+    different organization are rejected. Rows after ``max_rows`` are not
+    imported.
+    """
+    errors: List[Dict[str, Any]] = []
+
+    def error(row, email, message):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row, "email": email, "message": message})
+
+    valid: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    rows = 0
+    for row_no, raw in enumerate(csv.DictReader(_text_stream(stream)), start=2):
+        rows += 1
+        if rows > max_rows:
+            error(row_no, None, f"At most {max_rows} users per import; use the import_users.py CLI for larger files")
+            break
+        data = {k.strip(): (v or "").strip() for k, v in raw.items() if k}
+        email = data.get("email") or None
+        if organization:
+            data["organization"] = data.get("organization") or organization
+            if data["organization"] != organization:
+                error(row_no, email, "Users can only be provisioned into your organization")
+                continue
+        data["role"] = data.get("role") or "inspector"
+        if data["role"] not in ALLOWED_ROLES:
+            error(row_no, email, f"role must be one of {', '.join(ALLOWED_ROLES)}")
+            continue
+        try:
+            validated = user_schema.load({**data, "terms": True})
+            User.validate_password(validated["password"])
+        except ValidationError as e:
+            error(row_no, email, e.messages if isinstance(e.messages, dict) else str(e))
+            continue
+        key = validated["email"].lower()
+        if key in seen:
+            error(row_no, validated["email"], f"Duplicate of row {seen[key]}")
+            continue
+        seen[key] = row_no
+        valid.append({"row": row_no, **validated})
+
+    # Skip hashing for emails that are already registered
+    if valid:
+        existing = {
+            doc["email"].lower()
+            for doc in db.get_collection("users").find(
+                {"email": {"$in": [v["email"] for v in valid]}}, {"email": 1}
+            )
+        }
+        for v in [v for v in valid if v["email"].lower() in existing]:
+            error(v["row"], v["email"], "User with this email already exists")
+        valid = [v for v in valid if v["email"].lower() not in existing]
+
+    created: List[Dict[str, Any]] = []
+    if dry_run:
+        created = [{"row": v["row"], "email": v["email"], "role": v["role"], "id": None} for v in valid]
+        return {"rows": rows, "created": created, "errors": errors, "dry_run": True}
+
+    hashes = password_pool.hash_many([v.pop("password") for v in valid])
+    users_coll = db.get_collection("users")
+    now = datetime.utcnow()
+    for start in range(0, len(valid), INSERT_BATCH_SIZE):
+        batch = valid[start:start + INSERT_BATCH_SIZE]
+        users = [
+            User(
+                email=v["email"], firstName=v["firstName"], lastName=v["lastName"],
+                organization=v["organization"], location=v["location"], phone=v["phone"],
+                country_code=v["country_code"], password_hash=h, role=v["role"],
+                created_at=now, updated_at=now,
+            )
+            for v, h in zip(batch, hashes[start:start + INSERT_BATCH_SIZE])
+        ]
+        docs = [u.to_dict() for u in users]
+        failed = set()
+        try:
+            users_coll.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: only the conflicting rows fail (e.g. registered concurrently)
+            for err in e.details.get("writeErrors", []):
+                failed.add(err["index"])
+                v = batch[err["index"]]
+                message = ("User with this email already exists" if err.get("code") == DUPLICATE_KEY
+                           else f"Insert failed: {err.get('errmsg')}")
+                error(v["row"], v["email"], message)
+        batch_created = [(v, d) for i, (v, d) in enumerate(zip(batch, docs)) if i not in failed]
+        created.extend({"row": v["row"], "email": v["email"], "role": v["role"], "id": str(d["_id"])}
+                       for v, d in batch_created)
+        if batch_created:
+            log_user_events([d for _, d in batch_created], "ACCOUNT_CREATED")
+
+    logger.info(f"User import: {rows} rows, {len(created)} created, {len(errors)} errors")
+    return {"rows": rows, "created": created, "errors": errors, "dry_run": False}
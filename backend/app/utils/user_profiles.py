@@ -0,0 +1,160 @@
+"""Per-worker cache of the user fields used to label and authorise records.
+
+Task boards, assignment, template creation and the submit/approve paths
+only need a user's names, role, organization and location, usually for the
+same few managers and inspectors. ``user_profiles`` keeps those fields
+(``PROFILE_PROJECTION``) in a bounded LRU keyed by ``_id``. Each entry
+lives for ``USER_CACHE_TTL`` seconds, which also bounds how stale another
+worker's copy can be after an update. Email lookups go through a secondary
+email -> ``_id`` map. ``get_many`` fetches all misses with one ``$in``
+query.
+
+Code that changes these fields calls ``invalidate``. Logout does too.
+Missing users are not cached, so a user created a moment ago is found.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from bson import ObjectId
+
+from ..config import Config
+from .database import get_db
+
+PROFILE_PROJECTION = {
+    "firstName": 1, "lastName": 1, "email": 1, "role": 1,
+    "organization": 1, "location": 1, "is_active": 1,
+}
+
+
+def full_name(profile: Optional[Dict[str, Any]]) -> str:
+    profile = profile or {}
+    return f"{profile.get('firstName', '')} {profile.get('lastName', '')}".strip()
+
+
+class UserProfileCache:
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires, profile)
+        self._by_email: Dict[str, str] = {}
+        self._pid: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize or Config.USER_CACHE_SIZE
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl or Config.USER_CACHE_TTL
+
+    def _collection(self):
+        return get_db().get_collection("users")
+
+    def _check_process(self) -> None:
+        # Called with the lock held; a forked worker starts empty
+        if self._pid != os.getpid():
+            self._items.clear()
+            self._by_email.clear()
+            self._pid = os.getpid()
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._items.move_to_end(key)
+        return entry[1]
+
+    def _drop(self, key: str) -> None:
+        _, profile = self._items.pop(key, (None, None))
+        if profile is not None and self._by_email.get(profile.get("email")) == key:
+            del self._by_email[profile.get("email")]
+
+    def _store(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        key = str(doc["_id"])
+        with self._lock:
+            self._check_process()
+            self._drop(key)
+            self._items[key] = (time.monotonic() + self.ttl, doc)
+            if doc.get("email"):
+                self._by_email[doc["email"]] = key
+            while len(self._items) > self.maxsize:
+                self._drop(next(iter(self._items)))
+                self._stats["evictions"] += 1
+        return doc
+
+    def _cached(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._check_process()
+            profile = self._lookup(key)
+            self._stats["hits" if profile is not None else "misses"] += 1
+            return profile
+
+    def get(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        """Profile for ``user_id`` (ObjectId or str), or None if there is no such user."""
+        if user_id is None:
+            return None
+        profile = self._cached(str(user_id))
+        if profile is not None:
+            return profile
+        oid = user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
+        doc = self._collection().find_one({"_id": oid}, PROFILE_PROJECTION)
+        return self._store(doc) if doc else None
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._check_process()
+            key = self._by_email.get(email)
+        profile = self._cached(key) if key else None
+        if profile is not None:
+            return profile
+        if not key:
+            with self._lock:
+                self._stats["misses"] += 1
+        doc = self._collection().find_one({"email": email}, PROFILE_PROJECTION)
+        return self._store(doc) if doc else None
+
+    def get_many(self, user_ids: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Profiles keyed by ``str(_id)``; missing users are left out."""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for user_id in {str(u) for u in user_ids if u is not None}:
+            profile = self._cached(user_id)
+            if profile is not None:
+                found[user_id] = profile
+            elif ObjectId.is_valid(user_id):
+                missing.append(ObjectId(user_id))
+        if missing:
+            for doc in self._collection().find({"_id": {"$in": missing}}, PROFILE_PROJECTION):
+                found[str(doc["_id"])] = self._store(doc)
+        return found
+
+    def invalidate(self, user_id: Any) -> None:
+        with self._lock:
+            self._check_process()
+            self._drop(str(user_id))
+            self._stats["invalidations"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "size": len(self._items) if self._pid == os.getpid() else 0,
+                "max_size": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+user_profiles = UserProfileCache()
@@ -0,0 +1,119 @@
+"""Indexed prefix search over users for the manager/inspector pickers.
+
+Every user document carries ``search_tokens``: all prefixes (up to
+``MAX_PREFIX`` characters) of the accent-folded, lowercased words of the
+first name, last name and email. A query is split the same way and matched
+with ``{"search_tokens": {"$all": [...]}}`` behind equality on role and
+organization, so the compound index ``(role, organization, search_tokens)``
+answers it without scanning ``users``.
+
+Users also carry ``search_keys``: the normalized full name, first name,
+last name and email. Exact and prefix hits on those are fetched with their
+own indexed queries before the token candidates, so a capped candidate list
+never pushes them out. Results are ranked in Python: exact name/email hits
+first, then name prefixes, then email prefixes, then word-prefix matches.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+MAX_PREFIX = 15
+MAX_QUERY_WORDS = 4
+CANDIDATE_LIMIT = 200
+BACKFILL_BATCH_SIZE = 500
+
+_WORD = re.compile(r"[0-9a-z]+")
+
+SEARCH_PROJECTION = {
+    "firstName": 1, "lastName": 1, "email": 1, "organization": 1, "location": 1,
+}
+
+
+def normalize(text: Any) -> str:
+    folded = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in folded if not unicodedata.combining(c)).lower()
+
+
+def words(text: Any) -> List[str]:
+    return _WORD.findall(normalize(text))
+
+
+def search_tokens(first_name: Any, last_name: Any, email: Any) -> List[str]:
+    tokens = set()
+    for word in words(first_name) + words(last_name) + words(email):
+        for n in range(1, min(len(word), MAX_PREFIX) + 1):
+            tokens.add(word[:n])
+    return sorted(tokens)
+
+
+def search_keys(first_name: Any, last_name: Any, email: Any) -> List[str]:
+    first, last = normalize(first_name), normalize(last_name)
+    keys = (f"{first} {last}", first, last, normalize(email))
+    return sorted({" ".join(k.split()) for k in keys} - {""})
+
+
+def _rank(doc: Dict[str, Any], query: str, query_words: List[str]) -> int:
+    first, last, email = normalize(doc.get("firstName")), normalize(doc.get("lastName")), normalize(doc.get("email"))
+    full = f"{first} {last}".strip()
+    if query in (full, email, first, last):
+        return 0
+    if full.startswith(query) or first.startswith(query) or last.startswith(query):
+        return 1
+    if email.startswith(query):
+        return 2
+    name_words = words(first) + words(last)
+    if all(any(w.startswith(q) for w in name_words) for q in query_words):
+        return 3
+    return 4
+
+
+def search_users(coll, role: str, organization: Optional[str], q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Return up to ``limit`` user documents (``SEARCH_PROJECTION`` fields), best first."""
+    query: Dict[str, Any] = {"role": role, "organization": organization}
+    query_words = words(q)[:MAX_QUERY_WORDS]
+    if not query_words:
+        return list(coll.find(query, SEARCH_PROJECTION).sort([("firstName", 1), ("lastName", 1)]).limit(limit))
+
+    q_norm = " ".join(normalize(q).split())
+    found: Dict[Any, Dict[str, Any]] = {}
+    # Best tiers first: exact keys, then key prefixes, then the token candidates
+    for tier_query, cap in (
+        ({**query, "search_keys": q_norm}, limit),
+        ({**query, "search_keys": {"$regex": f"^{re.escape(q_norm)}"}}, CANDIDATE_LIMIT),
+        ({**query, "search_tokens": {"$all": [w[:MAX_PREFIX] for w in query_words]}}, CANDIDATE_LIMIT),
+    ):
+        for doc in coll.find(tier_query, SEARCH_PROJECTION).limit(cap):
+            found.setdefault(doc["_id"], doc)
+        if len(found) >= CANDIDATE_LIMIT:
+            break
+    ranked = sorted(found.values(), key=lambda d: (
+        _rank(d, q_norm, query_words), normalize(d.get("firstName")), normalize(d.get("lastName")),
+    ))
+    return ranked[:limit]
+
+
+def backfill_search_tokens(coll, docs: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+    """Set ``search_tokens``/``search_keys`` on users that predate them. Returns the count updated."""
+    if docs is None:
+        docs = coll.find(
+            {"$or": [{"search_tokens": {"$exists": False}}, {"search_keys": {"$exists": False}}]},
+            {"firstName": 1, "lastName": 1, "email": 1},
+        )
+    updated, ops = 0, []
+    for doc in docs:
+        names = (doc.get("firstName"), doc.get("lastName"), doc.get("email"))
+        ops.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"search_tokens": search_tokens(*names), "search_keys": search_keys(*names)}},
+        ))
+        if len(ops) >= BACKFILL_BATCH_SIZE:
+            updated += coll.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += coll.bulk_write(ops, ordered=False).modified_count
+    return updated
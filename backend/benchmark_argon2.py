@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Pick Argon2 cost parameters for a target login latency on this machine.
+
+For each (time_cost, memory_cost) candidate, times ``--samples`` password
+verifications while ``--concurrency`` of them run at once (as they would
+in the password pool during a login storm) and reports p50/p99. The
+strongest candidate whose p99 stays under ``--target-ms`` is printed as
+environment settings for app.config. Hashes made with older parameters
+are upgraded transparently on the next successful login.
+
+Usage:
+    python benchmark_argon2.py [--target-ms 250] [--concurrency 2] [--samples 40]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the backend directory to the path so we can import the app package
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from argon2 import PasswordHasher
+
+TIME_COSTS = (1, 2, 3, 4)
+MEMORY_COSTS_MIB = (19, 32, 64, 128)
+PARALLELISM = 4
+PASSWORD = "Benchmark-Passw0rd!"
+
+
+def _timed_verify(args):
+    time_cost, memory_cost, password_hash = args
+    hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=PARALLELISM)
+    start = time.perf_counter()
+    hasher.verify(password_hash, PASSWORD)
+    return (time.perf_counter() - start) * 1000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Argon2 cost parameters")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="p99 verify latency budget")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("PASSWORD_POOL_WORKERS", 0))
+                        or max(1, (os.cpu_count() or 2) // 2), help="Simultaneous verifications (pool size)")
+    parser.add_argument("--samples", type=int, default=40, help="Verifications per candidate")
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} concurrency={args.concurrency} samples={args.samples} "
+          f"target p99={args.target_ms:.0f} ms")
+    print(f"{'time':>4} {'mem MiB':>7} {'p50 ms':>8} {'p99 ms':>8}")
+
+    best = None
+    with ProcessPoolExecutor(max_workers=args.concurrency) as pool:
+        for memory_mib in MEMORY_COSTS_MIB:
+            for time_cost in TIME_COSTS:
+                memory_cost = memory_mib * 1024
+                hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=PARALLELISM)
+                password_hash = hasher.hash(PASSWORD)
+                latencies = list(pool.map(_timed_verify, [(time_cost, memory_cost, password_hash)] * args.samples))
+                p50, p99 = statistics.median(latencies), percentile(latencies, 99)
+                ok = p99 <= args.target_ms
+                print(f"{time_cost:>4} {memory_mib:>7} {p50:>8.1f} {p99:>8.1f}{'' if ok else '  over budget'}")
+                if ok and (best is None or memory_cost * time_cost > best[1] * best[0]):
+                    best = (time_cost, memory_cost, p99)
+                if not ok:
+                    break  # higher time costs at this memory size only get slower
+
+    if best is None:
+        print("\nNo candidate met the target; raise --target-ms or reduce PASSWORD_POOL_WORKERS.")
+        sys.exit(1)
+    print("\nRecommended settings:")
+    print(f"ARGON2_TIME_COST={best[0]}")
+    print(f"ARGON2_MEMORY_COST={best[1]}")
+    print(f"ARGON2_PARALLELISM={PARALLELISM}")
+    print(f"# p99 {best[2]:.1f} ms at concurrency {args.concurrency}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cost of audit logging on the request path.
+
+Runs ``--requests`` simulated requests from ``--threads`` threads. Each one
+writes a single inspection audit entry in one of two ways:
+  * sync     - insert_one inside the request, as audit.py used to do
+  * buffered - AuditBuffer.add, with a background writer doing insert_many
+
+Reports p50/p99 request latency and how long the buffered writer took to
+persist everything after the last request returned. Entries go to a scratch
+collection (``--collection``) that is dropped afterwards.
+
+Requires MONGODB_URI (and optionally MONGODB_DB) in the environment.
+
+Usage:
+    python benchmark_audit.py [--requests 2000] [--threads 8] [--batch-size 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add the backend directory to the path so we can import the app package
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from app.utils.audit import AuditBuffer
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def entry(i):
+    return {
+        "inspection_id": ObjectId(),
+        "user_id": ObjectId(),
+        "action": "PHOTO_UPLOAD",
+        "details": {"question_id": i, "size": 120_000},
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def run(label, write, args):
+    def request(i):
+        start = time.perf_counter()
+        write(entry(i))
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(request, range(args.requests)))
+    print(f"{label:>9} p50 {statistics.median(latencies):8.3f} ms   p99 {percentile(latencies, 99):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark synchronous vs buffered audit writes")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent request threads")
+    parser.add_argument("--batch-size", type=int, default=200, help="AuditBuffer batch size")
+    parser.add_argument("--collection", default="audit_benchmark", help="Scratch collection (dropped)")
+    args = parser.parse_args()
+
+    mongo_uri = os.environ.get("MONGODB_URI")
+    if not mongo_uri:
+        print("Error: MONGODB_URI environment variable not set")
+        sys.exit(1)
+
+    import certifi
+    from pymongo import MongoClient
+
+    db = MongoClient(mongo_uri, tlsCAFile=certifi.where())[os.environ.get("MONGODB_DB", "streamlineer")]
+    coll = db[args.collection]
+    coll.drop()
+    try:
+        print(f"requests={args.requests} threads={args.threads} batch={args.batch_size}")
+        run("sync", coll.insert_one, args)
+
+        buffer = AuditBuffer(get_collection=lambda name: db[name], max_size=args.requests,
+                             batch_size=args.batch_size, flush_interval=0.5)
+        run("buffered", lambda doc: buffer.add(args.collection, doc), args)
+        start = time.perf_counter()
+        buffer.close(timeout=60)
+        metrics = buffer.metrics()
+        print(f"buffered writer drained in {(time.perf_counter() - start) * 1000:.0f} ms after the last request: "
+              f"{metrics['written']} written in {metrics['batches']} batches, "
+              f"{metrics['dropped']} dropped, {metrics['failed']} failed")
+    finally:
+        coll.drop()
+
+
+if __name__ == "__main__":
+    main()
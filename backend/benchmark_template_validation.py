@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark template payload validation on large templates.
+
+Builds a synthetic template of roughly the requested size and compares:
+  * previous - what create_template used to do: print the whole payload
+               (to /dev/null here) and TemplateSchema.load(payload), whose
+               fields.List(fields.Dict()) never looks inside questions
+  * fastpath - validate_pages(pages), which checks every page, question and
+               rule, plus the schema on the scalar fields only
+
+Reports median wall time over untraced runs and peak traced memory
+(tracemalloc) from one extra run.
+
+Usage:
+    python benchmark_template_validation.py [--size-mb 5] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Add the backend directory to the path so we can import the app package
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.template import template_schema
+from app.utils.template_validation import validate_pages
+
+
+def build_payload(size_mb):
+    """Generate a template whose JSON encoding is about ``size_mb`` megabytes."""
+    target = int(size_mb * 1024 * 1024)
+    pages = []
+    payload = {
+        "title": "Benchmark template",
+        "description": "Synthetic large checklist",
+        "manager_email": "manager@example.com",
+        "organization": "Bench Org",
+        "location": "Line 1",
+        "pages": pages,
+    }
+    qid = 0
+    size = len(json.dumps(payload))
+    while size < target:
+        questions = []
+        for _ in range(250):
+            qid += 1
+            q = {
+                "id": qid,
+                "text": f"Check stitching density and seam alignment on panel {qid}",
+                "type": "yesno",
+                "options": ["Yes", "No", "N/A"],
+                "rules": [
+                    {"equals": "No", "require_text": True, "require_media": qid % 3 == 0,
+                     "notify": qid % 5 == 0, "message": "Seam defect found"},
+                ],
+            }
+            questions.append(q)
+            size += len(json.dumps(q)) + 2
+        pages.append({"id": len(pages) + 1, "title": f"Section {len(pages) + 1}", "questions": questions})
+    return payload, qid
+
+
+def measure(fn, runs):
+    """Median wall time (untraced runs) and peak traced memory (one traced run)."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark template validation")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Approximate payload size in MB")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per variant")
+    args = parser.parse_args()
+
+    payload, questions = build_payload(args.size_mb)
+    encoded = len(json.dumps(payload).encode("utf-8"))
+    print(f"Payload: {encoded / 1024 / 1024:.2f} MB, {len(payload['pages'])} pages, {questions} questions")
+
+    devnull = open(os.devnull, "w")
+
+    def previous():
+        print(f"Received template creation request from user bench: {payload}", file=devnull)
+        template_schema.load(payload)
+
+    def fastpath():
+        errors = validate_pages(payload["pages"])
+        assert not errors, errors[:3]
+        template_schema.load({k: v for k, v in payload.items() if k != "pages"}, partial=("pages",))
+
+    print(f"{'variant':<10} {'median ms':>10} {'peak MB':>9}")
+    for name, fn in (("previous", previous), ("fastpath", fastpath)):
+        seconds, peak = measure(fn, args.runs)
+        print(f"{name:<10} {seconds * 1000:>10.1f} {peak / 1024 / 1024:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
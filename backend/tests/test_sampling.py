@@ -0,0 +1,57 @@
+import random
+import time
+from collections import Counter
+
+import pytest
+
+from app.utils.sampling import floyd_sample, simple_sample, stratified_sample
+
+
+def _units(result):
+    return sum(len(c["units"]) for c in result)
+
+
+def test_floyd_sample_is_distinct_sorted_and_in_range():
+    picked = floyd_sample(50, 20, random.Random(3))
+    assert picked == sorted(set(picked))
+    assert len(picked) == 20 and picked[0] >= 1 and picked[-1] <= 50
+
+
+def test_same_seed_same_units():
+    assert simple_sample(1000, 50, 7) == simple_sample(1000, 50, 7)
+    assert stratified_sample(1000, 80, 24, 7) == stratified_sample(1000, 80, 24, 7)
+
+
+@pytest.mark.parametrize("args", [
+    (95, 95, 10, 1),        # whole lot, partial last carton
+    (95, 90, 10, 3, 2),     # caller asks for too few cartons
+    (7, 7, 3, 1, 1),
+    (10, 0, 3, 1),
+    (1000, 80, 24, 5),
+])
+def test_stratified_sample_returns_the_sample_size(args):
+    result = stratified_sample(*args)
+    assert _units(result) == args[1]
+    units_per_carton = args[2]
+    for carton in result:
+        assert len(set(carton["units"])) == len(carton["units"])
+        assert all(1 <= u <= units_per_carton for u in carton["units"])
+
+
+def test_extra_cartons_are_chosen_uniformly():
+    # 30 units from 10 cartons of 10 with one carton requested: 3 cartons are
+    # opened, so each carton should be picked about 2000 * 3 / 10 = 600 times
+    counts = Counter()
+    for seed in range(2000):
+        for carton in stratified_sample(100, 30, 10, seed, 1):
+            counts[carton["carton"]] += 1
+    assert set(counts) == set(range(1, 11))
+    assert all(480 <= n <= 720 for n in counts.values()), counts
+
+
+def test_large_lot_with_single_unit_cartons_is_fast():
+    started = time.perf_counter()
+    result = stratified_sample(500000, 5000, 1, 42)
+    assert time.perf_counter() - started < 2.0
+    assert _units(result) == 5000
+    assert len({c["carton"] for c in result}) == 5000
@@ -0,0 +1,112 @@
+import copy
+from itertools import combinations
+
+import pytest
+
+from app.utils.template_patch import PatchError, build_update
+
+
+def _pages():
+    return [
+        {"id": "p1", "title": "Outer carton", "questions": [{"id": "q1", "text": "Label"}]},
+        {"id": "p2", "title": "Product", "questions": [{"id": "q2", "text": "Colour"}]},
+    ]
+
+
+def _update_paths(update):
+    return [path for op in update.values() for path in op]
+
+
+def _assert_no_conflicts(update):
+    # MongoDB rejects an update where one path is a prefix of another
+    for a, b in combinations(_update_paths(update), 2):
+        pa, pb = a.split("."), b.split(".")
+        n = min(len(pa), len(pb))
+        assert pa[:n] != pb[:n], f"conflicting paths {a!r} and {b!r}"
+
+
+def _apply(pages, update):
+    """Apply a $set/$unset/$push update to ``{"pages": pages}`` the way MongoDB would."""
+    doc = {"pages": copy.deepcopy(pages)}
+
+    def walk(path):
+        node, parts = doc, path.split(".")
+        for part in parts[:-1]:
+            node = node[int(part)] if isinstance(node, list) else node[part]
+        last = parts[-1]
+        return node, int(last) if isinstance(node, list) else last
+
+    for path, value in update.get("$set", {}).items():
+        node, key = walk(path)
+        node[key] = copy.deepcopy(value)
+    for path in update.get("$unset", {}):
+        node, key = walk(path)
+        node.pop(key)
+    for path, value in update.get("$push", {}).items():
+        node, key = walk(path)
+        node[key].extend(copy.deepcopy(value["$each"]))
+    return doc["pages"]
+
+
+def _check(operations):
+    pages = _pages()
+    result, update = build_update(pages, operations)
+    _assert_no_conflicts(update)
+    assert _apply(pages, update) == result
+    return result, update
+
+
+def test_single_append_is_a_push():
+    _, update = _check([{"op": "add", "path": "/pages/0/questions/-", "value": {"id": "q3"}}])
+    assert update == {"$push": {"pages.0.questions": {"$each": [{"id": "q3"}]}}}
+
+
+def test_replace_is_a_positional_set():
+    _, update = _check([{"op": "replace", "path": "/pages/1/title", "value": "Item"}])
+    assert update == {"$set": {"pages.1.title": "Item"}}
+
+
+def test_nested_and_page_level_appends_in_one_patch():
+    result, update = _check([
+        {"op": "add", "path": "/pages/0/questions/-", "value": {"id": "q3"}},
+        {"op": "add", "path": "/pages/-", "value": {"id": "p3", "questions": []}},
+    ])
+    assert update == {"$set": {"pages": result}}
+    assert [p["id"] for p in result] == ["p1", "p2", "p3"]
+
+
+def test_page_level_append_before_nested_append():
+    result, update = _check([
+        {"op": "add", "path": "/pages/-", "value": {"id": "p3", "questions": []}},
+        {"op": "add", "path": "/pages/2/questions/-", "value": {"id": "q3"}},
+    ])
+    assert update == {"$set": {"pages": result}}
+
+
+def test_appends_to_sibling_arrays_stay_pushes():
+    _, update = _check([
+        {"op": "add", "path": "/pages/0/questions/-", "value": {"id": "q3"}},
+        {"op": "add", "path": "/pages/1/questions/-", "value": {"id": "q4"}},
+    ])
+    assert set(update) == {"$push"}
+    assert set(update["$push"]) == {"pages.0.questions", "pages.1.questions"}
+
+
+def test_append_and_edit_inside_the_same_page():
+    _, update = _check([
+        {"op": "add", "path": "/pages/0/questions/-", "value": {"id": "q3"}},
+        {"op": "replace", "path": "/pages/0/title", "value": "Carton"},
+        {"op": "add", "path": "/pages/-", "value": {"id": "p3", "questions": []}},
+    ])
+    assert "$push" not in update
+
+
+def test_remove_rewrites_the_array():
+    result, update = _check([{"op": "remove", "path": "/pages/0/questions/0"}])
+    assert update == {"$set": {"pages.0.questions": []}}
+    assert result[0]["questions"] == []
+
+
+def test_paths_outside_pages_are_rejected():
+    with pytest.raises(PatchError):
+        build_update(_pages(), [{"op": "replace", "path": "/title", "value": "x"}])
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Reuse the backend's parser/importer so the CLI and the API behave the same
+sys.path.append(str(Path(__file__).resolve().parent / "backend"))
+
+from app.utils.template_import import import_templates  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-create inspection templates from .xlsx or .csv")
+    parser.add_argument("path", help="Spreadsheet with one row per question")
+    parser.add_argument("--creator-email", required=True, help="IT user recorded as the templates' creator")
+    parser.add_argument("--sheet", help="Worksheet name (default: first sheet)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate only")
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"Error: File not found -> {path}")
+        sys.exit(1)
+
+    mongo_uri = os.environ.get("MONGODB_URI")
+    if not mongo_uri:
+        print("Error: MONGODB_URI environment variable not set")
+        sys.exit(1)
+
+    import certifi
+    from pymongo import MongoClient
+
+    db = MongoClient(mongo_uri, tlsCAFile=certifi.where())[os.environ.get("MONGODB_DB", "streamlineer")]
+    creator = db.users.find_one({"email": args.creator_email, "role": "it"}, {"_id": 1})
+    if not creator:
+        print(f"Error: IT user '{args.creator_email}' not found")
+        sys.exit(1)
+
+    try:
+        with path.open("rb") as fh:
+            result = import_templates(db, fh, path.name, creator["_id"], sheet=args.sheet, dry_run=args.dry_run)
+    except (ValueError, KeyError) as exc:
+        print(f"Failed to read spreadsheet: {exc}")
+        sys.exit(1)
+
+    verb = "Would create" if args.dry_run else "Created"
+    print(f"Rows read: {result['rows']}")
+    print(f"{verb} {len(result['created'])} template(s):")
+    for tpl in result["created"]:
+        print(f"  {tpl['title']} [{tpl['status']}] {tpl['pages']} pages, {tpl['questions']} questions"
+              + (f" -> {tpl['id']}" if tpl["id"] else ""))
+    if result["skipped"]:
+        print(f"Not created ({len(result['skipped'])}): {', '.join(result['skipped'])}")
+    if result["errors"]:
+        print(f"{len(result['errors'])} error(s):")
+        for err in result["errors"]:
+            where = f"row {err['row']}" if err["row"] else "insert"
+            print(f"  {where}: {err['template'] or '-'}: {err['message']}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
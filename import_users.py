@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Reuse the backend's importer so the CLI and the API behave the same
+sys.path.append(str(Path(__file__).resolve().parent / "backend"))
+
+from app.utils.password_pool import PasswordPoolSaturated  # noqa: E402
+from app.utils.user_import import import_users  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-create inspector/manager accounts from a CSV file")
+    parser.add_argument("path", help="CSV with email, firstName, lastName, organization, location, phone, "
+                                     "country_code, password, role")
+    parser.add_argument("--organization", help="Default organization; rows naming another one are rejected")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only")
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"Error: File not found -> {path}")
+        sys.exit(1)
+
+    mongo_uri = os.environ.get("MONGODB_URI")
+    if not mongo_uri:
+        print("Error: MONGODB_URI environment variable not set")
+        sys.exit(1)
+
+    import certifi
+    from pymongo import MongoClient
+
+    db = MongoClient(mongo_uri, tlsCAFile=certifi.where())[os.environ.get("MONGODB_DB", "streamlineer")]
+    with path.open("rb") as fh:
+        try:
+            result = import_users(db, fh, organization=args.organization, dry_run=args.dry_run)
+        except PasswordPoolSaturated as exc:
+            print(f"Error: password hashing is saturated ({exc}); nothing was imported, retry later")
+            sys.exit(3)
+
+    verb = "Would create" if args.dry_run else "Created"
+    print(f"Rows read: {result['rows']}")
+    print(f"{verb} {len(result['created'])} user(s)")
+    if result["errors"]:
+        print(f"{len(result['errors'])} error(s):")
+        for err in result["errors"]:
+            print(f"  row {err['row']}: {err['email'] or '-'}: {err['message']}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
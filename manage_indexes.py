@@ -0,0 +1,40 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Reuse the backend's index definitions so deploys and dev boots build the same set
+sys.path.append(str(Path(__file__).resolve().parent / "backend"))
+
+from app.config import config  # noqa: E402
+from app.utils.database import Database  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create/update MongoDB indexes, TTL retention and derived fields (run once per deploy)"
+    )
+    parser.add_argument("--config", default="production", choices=sorted(config), help="Config class to read")
+    parser.add_argument("--skip-backfill", action="store_true", help="Only build indexes; skip the user search-token backfill")
+    args = parser.parse_args()
+
+    database = Database()
+    try:
+        database.configure({key: getattr(config[args.config], key) for key in dir(config[args.config]) if key.isupper()})
+    except ValueError as exc:
+        print(f"Error: {exc}")
+        sys.exit(1)
+
+    if not database.ping():
+        sys.exit(1)
+    try:
+        database.ensure_indexes(backfill=not args.skip_backfill)
+    except Exception as exc:
+        print(f"Failed to ensure indexes: {exc}")
+        sys.exit(1)
+    finally:
+        database.close()
+    print("Indexes are up to date")
+
+
+if __name__ == "__main__":
+    main()